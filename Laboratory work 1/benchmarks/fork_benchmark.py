@@ -0,0 +1,77 @@
+"""
+What-if scenarios on copy-on-write forks against full copies of the base sheet.
+
+Every scenario changes `--changes` random inputs of a wide sheet and recalculates
+what depends on them; forks are recalculated concurrently on a thread pool.
+
+    python benchmarks/fork_benchmark.py --rows 100000 --scenarios 16 --workers 4
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from workbooks import wide
+
+from models import Grid, Cell
+from calculator import FormulaCalculator
+
+
+def run_scenario(calculator: FormulaCalculator, seed: int, changes: int) -> int:
+    """Change a few inputs, recalculate and return the number of changed cells"""
+    rng = random.Random(seed)
+    changed = [(row, 0) for row in rng.sample(range(calculator.grid.rows), changes)]
+    for row, col in changed:
+        calculator.grid.set_value(row, col, rng.random() * 1000)
+    calculator.recalculate(changed)
+    return len(changed)
+
+
+def full_copy(calculator: FormulaCalculator) -> FormulaCalculator:
+    grid = Grid(calculator.grid.rows, calculator.grid.columns)
+    for row, col, cell in calculator.grid.iter_cells():
+        grid.set_cell(row, col, Cell(value=cell.value, formula=cell.formula))
+    copy = FormulaCalculator(grid)
+    copy.rebuild_dependencies()
+    return copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--scenarios", type=int, default=16)
+    parser.add_argument("--changes", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    base = FormulaCalculator(wide(args.rows))
+    base.rebuild_dependencies()
+    base.recalculate_all()
+    print(f"{len(base.grid)} cells, {args.scenarios} scenarios of {args.changes} changed inputs")
+
+    start = time.perf_counter()
+    forks = [base.fork() for _ in range(args.scenarios)]
+    fork_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(run_scenario, forks, range(args.scenarios), [args.changes] * args.scenarios))
+    fork_recalc_seconds = time.perf_counter() - start
+    stored = sum(len(fork.grid._rows[row]) for fork in forks for row in fork.grid._rows)
+    differences = sum(len(fork.grid.diff()) for fork in forks)
+
+    start = time.perf_counter()
+    copies = [full_copy(base) for _ in range(args.scenarios)]
+    copy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for seed, copy in enumerate(copies):
+        run_scenario(copy, seed, args.changes)
+    copy_recalc_seconds = time.perf_counter() - start
+
+    print(f"{'':>12} {'create, s':>10} {'recalc, s':>10} {'cells stored':>13}")
+    print(f"{'forks':>12} {fork_seconds:>10.4f} {fork_recalc_seconds:>10.3f} {stored:>13}")
+    print(f"{'full copies':>12} {copy_seconds:>10.4f} {copy_recalc_seconds:>10.3f} {len(base.grid) * args.scenarios:>13}")
+    print(f"{differences} cells differ from the base across all forks")
+
+
+if __name__ == "__main__":
+    main()
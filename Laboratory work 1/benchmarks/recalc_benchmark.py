@@ -0,0 +1,55 @@
+"""
+Full recalculation speedup of RecalcEngine against the number of workers.
+
+Builds a wide sheet: one column of inputs and `--columns` columns of formulas
+that only read the inputs, so every formula is in the same dependency level.
+
+    python benchmarks/recalc_benchmark.py --rows 20000 --columns 5 --kind process
+"""
+import argparse
+import os
+import time
+
+from workbooks import wide
+
+from calculator import FormulaCalculator
+from recalc import RecalcEngine
+
+
+def build_wide_sheet(rows: int, columns: int) -> FormulaCalculator:
+    calculator = FormulaCalculator(wide(rows, columns))
+    calculator.rebuild_dependencies()
+    return calculator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--columns", type=int, default=5)
+    parser.add_argument("--kind", choices=["process", "thread"], default="process")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    calculator = build_wide_sheet(args.rows, args.columns)
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, *(n for n in (2, 4, 8, 16, 32) if n <= cores), cores})
+
+    print(f"{args.rows * args.columns} formulas, {args.kind} pool, {cores} cores")
+    print(f"{'workers':>8} {'best, s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        engine = RecalcEngine(calculator, workers=workers, kind=args.kind, min_parallel_level=1)
+        engine.recalculate_all()  # warm up the pool and compile caches
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            updated, errors = engine.recalculate_all()
+            timings.append(time.perf_counter() - start)
+        engine.shutdown()
+        best = min(timings)
+        baseline = baseline or best
+        print(f"{workers:>8} {best:>10.3f} {baseline / best:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark suite for Grid, FormulaCalculator and the storage backends.
+
+For every synthetic workbook it measures evaluate throughput, full and
+incremental recalculation latency, JSON and binary save/load time and peak
+memory, and writes the results as JSON so runs can be compared.
+
+    python benchmarks/run_benchmarks.py --scale 10000 --output results.json
+    python benchmarks/run_benchmarks.py --workbooks wide --profile wide.prof
+"""
+import argparse
+import cProfile
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from workbooks import WORKBOOKS
+
+from calculator import FormulaCalculator
+from storage import GridStorage, StreamingJsonLoader
+from binary_storage import BinaryGridStorage
+
+
+def timed(func: Callable, repeat: int = 1) -> float:
+    """Best wall time of `repeat` calls, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(func: Callable) -> int:
+    """Peak traced allocation, in bytes, while running `func`"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_workbook(name: str, scale: int, repeat: int) -> Dict:
+    build = WORKBOOKS[name]
+    result = {"workbook": name, "scale": scale}
+
+    result["build_peak_bytes"] = peak_memory(lambda: build(scale))
+    grid = build(scale)
+    calculator = FormulaCalculator(grid)
+    formulas = [(row, col, cell.formula[1:]) for row, col, cell in grid.iter_formula_cells()]
+    result["cells"] = len(grid)
+    result["formulas"] = len(formulas)
+
+    def evaluate_all():
+        for row, col, formula in formulas:
+            try:
+                calculator.evaluate(formula, row, col)
+            except ValueError:
+                pass
+    seconds = timed(evaluate_all, repeat)
+    result["evaluate_per_second"] = len(formulas) / seconds if seconds else None
+
+    result["rebuild_dependencies_s"] = timed(calculator.rebuild_dependencies)
+    result["full_recalc_s"] = timed(calculator.recalculate_all, repeat)
+
+    # Incremental: change the first input cell the formulas depend on
+    inputs = sorted(calculator.dependencies.dependents)
+    if inputs:
+        row, col = inputs[0]
+        value = grid.get_value(row, col)
+        result["incremental_recalc_s"] = timed(lambda: calculator.recalculate([(row, col)]), repeat)
+        result["incremental_affected"] = len(calculator.dependencies.affected([(row, col)]))
+        grid.set_value(row, col, value)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "table.json")
+        binary_path = os.path.join(directory, "table.lwb")
+        result["json_save_s"] = timed(lambda: GridStorage.save_to_json(json_path, grid))
+        result["json_bytes"] = os.path.getsize(json_path)
+        result["json_load_s"] = timed(lambda: GridStorage.load_from_json(json_path))
+        result["json_load_peak_bytes"] = peak_memory(lambda: GridStorage.load_from_json(json_path))
+        result["json_stream_load_s"] = timed(lambda: StreamingJsonLoader(json_path).load_until())
+        result["json_stream_load_peak_bytes"] = peak_memory(lambda: StreamingJsonLoader(json_path).load_until())
+
+        result["binary_save_s"] = timed(lambda: BinaryGridStorage.save_full(binary_path, grid))
+        result["binary_bytes"] = os.path.getsize(binary_path)
+
+        def open_and_read_first_row():
+            lazy = BinaryGridStorage.open(binary_path)
+            lazy.get_value(0, 0)
+            lazy.close()
+
+        def open_and_read_all():
+            lazy = BinaryGridStorage.open(binary_path)
+            len(lazy)
+            lazy.close()
+        result["binary_open_first_row_s"] = timed(open_and_read_first_row, repeat)
+        result["binary_load_all_s"] = timed(open_and_read_all)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=5000, help="rows (or cells) per synthetic workbook")
+    parser.add_argument("--workbooks", nargs="+", choices=sorted(WORKBOOKS), default=sorted(WORKBOOKS))
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of the timed steps (best is kept)")
+    parser.add_argument("--output", help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--profile", help="dump cProfile statistics of the whole run to this file")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    results = [benchmark_workbook(name, args.scale, args.repeat) for name in args.workbooks]
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    else:
+        json.dump(report, sys.stdout, indent=4)
+        print()
+
+
+if __name__ == "__main__":
+    main()
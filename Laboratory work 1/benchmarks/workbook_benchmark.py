@@ -0,0 +1,71 @@
+"""
+Opening a workbook of many sheets lazily against reading every sheet.
+
+A summary sheet reads two of `--sheets` data sheets; opening the workbook and computing
+the summary should only load those.
+
+    python benchmarks/workbook_benchmark.py --sheets 50 --rows 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from workbooks import wide
+
+from workbook import Workbook, WorkbookStorage, WORKBOOK_EXTENSION
+from models import Cell
+
+
+def build(sheets: int, rows: int) -> Workbook:
+    workbook = Workbook()
+    for index in range(sheets):
+        workbook.add_sheet(f"Data{index + 1}", wide(rows, columns=2))
+        workbook.recalculate_sheet(f"Data{index + 1}")
+    summary = workbook.add_sheet("Summary")
+    summary.set_cell(0, 0, Cell(formula=f"=SUM(Data3!B1:B{rows}) + Data{sheets}!C1"))
+    summary.set_cell(1, 0, Cell(formula="=A1 * 2"))
+    workbook.recalculate_sheet("Summary")
+    return workbook
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sheets", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "benchmark" + WORKBOOK_EXTENSION)
+    start = time.perf_counter()
+    WorkbookStorage.save(path, build(args.sheets, args.rows))
+    print(f"{args.sheets + 1} sheets of {args.rows} rows, built and saved in {time.perf_counter() - start:.2f} s "
+          f"({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    start = time.perf_counter()
+    workbook = WorkbookStorage.open(path)
+    workbook.recalculate_sheet("Summary")
+    lazy_seconds = time.perf_counter() - start
+    loaded = len(workbook.loaded_sheets())
+
+    start = time.perf_counter()
+    eager = WorkbookStorage.open(path)
+    for name in eager.names():
+        eager.grid(name)
+    eager.recalculate_sheet("Summary")
+    eager_seconds = time.perf_counter() - start
+
+    print(f"{'':>8} {'open + calc, s':>15} {'sheets loaded':>14}")
+    print(f"{'lazy':>8} {lazy_seconds:>15.3f} {loaded:>14}")
+    print(f"{'eager':>8} {eager_seconds:>15.3f} {len(eager.loaded_sheets()):>14}")
+
+    # A change to a data sheet reaches the summary; only the sheets reading it are loaded
+    start = time.perf_counter()
+    workbook.grid("Data3").set_value(0, 0, 1000.0)
+    results = workbook.recalculate("Data3", [(0, 0)])
+    print(f"change on Data3: {sum(len(cells) for cells, errors in results.values())} cells recalculated "
+          f"on {', '.join(results)} in {time.perf_counter() - start:.4f} s; "
+          f"{len(workbook.loaded_sheets())} sheets loaded")
+
+
+if __name__ == "__main__":
+    main()
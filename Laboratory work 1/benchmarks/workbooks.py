@@ -0,0 +1,60 @@
+"""Synthetic workbooks for the benchmarks"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+
+
+def wide(rows: int, columns: int = 5) -> Grid:
+    """One column of inputs and `columns` columns of formulas that only read the inputs"""
+    grid = Grid(rows=rows, columns=columns + 1)
+    for row in range(rows):
+        grid.set_value(row, 0, float(row))
+        for col in range(1, columns + 1):
+            grid.set_cell(row, col, Cell(formula=f"=(A{row + 1} * {col} + 3) mod 7 + inc(A{row + 1}) ^ 2"))
+    return grid
+
+
+def deep_chain(length: int) -> Grid:
+    """A single column where every cell reads the one above it"""
+    grid = Grid(rows=length, columns=1)
+    grid.set_value(0, 0, 1.0)
+    for row in range(1, length):
+        grid.set_cell(row, 0, Cell(formula=f"=A{row} * 1.0001 + 1"))
+    return grid
+
+
+def dense_block(rows: int, columns: int = 20) -> Grid:
+    """Every cell below the first row is a formula over its neighbours in the row above"""
+    grid = Grid(rows=rows, columns=columns)
+    for col in range(columns):
+        grid.set_value(0, col, float(col))
+    for row in range(1, rows):
+        for col in range(columns):
+            left = Grid.get_column_name(max(col, 1))
+            right = Grid.get_column_name(min(col + 2, columns))
+            grid.set_cell(row, col, Cell(formula=f"=({left}{row} + {right}{row}) / 2 - dec({Grid.get_column_name(col + 1)}{row})"))
+    return grid
+
+
+def sparse(rows: int, columns: int = 200, density: float = 0.001, seed: int = 1) -> Grid:
+    """A mostly empty sheet with scattered numbers and a few aggregates over whole columns"""
+    rng = random.Random(seed)
+    grid = Grid(rows=rows, columns=columns)
+    for _ in range(int(rows * columns * density)):
+        grid.set_value(rng.randrange(1, rows), rng.randrange(columns), rng.random() * 100)
+    for col in range(min(columns, 20)):
+        name = Grid.get_column_name(col + 1)
+        grid.set_cell(0, col, Cell(formula=f"=SUM({name}2:{name}{rows})"))
+    return grid
+
+
+WORKBOOKS = {
+    "wide": lambda scale: wide(scale),
+    "deep_chain": lambda scale: deep_chain(scale),
+    "dense_block": lambda scale: dense_block(max(2, scale // 20)),
+    "sparse": lambda scale: sparse(scale * 10),
+}
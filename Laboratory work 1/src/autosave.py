@@ -0,0 +1,166 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from models import Grid
+from storage import GridStorage, CSV_EXTENSION
+from binary_storage import BinaryGridStorage, BINARY_EXTENSION
+from recalc import BackgroundRecalculator
+
+
+AUTOSAVE_SUFFIX = ".autosave" + BINARY_EXTENSION
+# Where tables that were never saved are autosaved
+UNTITLED_AUTOSAVE = os.path.join(tempfile.gettempdir(), "laboratory-work-1" + AUTOSAVE_SUFFIX)
+
+
+def write_table(path: str, grid: Grid):
+    """Write a whole table in the format given by the extension; every writer replaces the file atomically"""
+    if path.endswith(BINARY_EXTENSION):
+        BinaryGridStorage.save_full(path, grid)
+    elif path.endswith(CSV_EXTENSION):
+        GridStorage.export_csv(path, grid)
+    else:
+        GridStorage.save_to_json(path, grid)
+
+
+def autosave_path(path: Optional[str]) -> str:
+    return path + AUTOSAVE_SUFFIX if path else UNTITLED_AUTOSAVE
+
+
+class SaveResult:
+    __slots__ = ('path', 'autosave', 'error', 'seconds')
+
+    def __init__(self, path: str, autosave: bool, error: Optional[Exception], seconds: float):
+        self.path = path
+        self.autosave = autosave
+        self.error = error
+        self.seconds = seconds
+
+
+class BackgroundSaver:
+    """
+    Saves tables on a worker thread so the UI never waits for a write. Each save first lets
+    the background recalculation finish, then takes a snapshot of the grid under its lock
+    (Grid.snapshot, O(rows)) and writes the snapshot while editing goes on.
+    Every `interval` seconds the table returned by the autosave target is also written,
+    as a binary table next to it, if it changed since it was last saved or autosaved.
+    Finished saves are put on `results` for the UI thread.
+    """
+
+    def __init__(self, recalculator: BackgroundRecalculator, interval: float = 60.0):
+        self.recalculator = recalculator
+        self.lock = recalculator.lock
+        self.interval = interval
+        self.results: queue.Queue = queue.Queue()
+        self._condition = threading.Condition()
+        self._requests: List[Tuple[Grid, str]] = []
+        self._autosave_target: Optional[Callable[[], Optional[Tuple[Grid, str]]]] = None
+        # Edits counted by mark_changed and the count at the last save and autosave
+        self._version = 0
+        self._saved_version = 0
+        self._autosaved_version = 0
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+
+    def save(self, grid: Grid, path: str):
+        """Queue a save of `grid` to `path`"""
+        with self._condition:
+            self._requests.append((grid, path))
+            self._condition.notify_all()
+
+
+    def start_autosave(self, target: Callable[[], Optional[Tuple[Grid, str]]]):
+        """`target` returns the grid to autosave and the path of its table (None if untitled), or None to skip"""
+        with self._condition:
+            self._autosave_target = target
+            self._condition.notify_all()
+
+
+    def mark_changed(self):
+        """Record an edit, so the next autosave writes the table"""
+        self._version += 1
+
+
+    def mark_saved(self):
+        """Record that the current contents are stored, e.g. after a synchronous save or a load"""
+        self._saved_version = self._autosaved_version = self._version
+
+
+    def unsaved(self) -> bool:
+        return self._saved_version != self._version
+
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued save is written"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._requests or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+
+    def shutdown(self):
+        """Finish the queued saves and stop the worker"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+
+    def _run(self):
+        next_autosave = time.monotonic() + self.interval
+        while True:
+            with self._condition:
+                while not self._requests and not self._closed and time.monotonic() < next_autosave:
+                    self._condition.wait(next_autosave - time.monotonic())
+                if self._requests:
+                    (grid, path), autosave = self._requests.pop(0), False
+                elif self._closed:
+                    return
+                else:
+                    next_autosave = time.monotonic() + self.interval
+                    target = self._autosave_target() if self._autosave_target is not None else None
+                    if target is None or self._autosaved_version == self._version or not self.unsaved():
+                        continue
+                    grid, path = target[0], autosave_path(target[1])
+                    autosave = True
+                self._busy = True
+            try:
+                self._write(grid, path, autosave)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+
+    def _write(self, grid: Grid, path: str, autosave: bool):
+        start = time.perf_counter()
+        self.recalculator.wait_idle()
+        with self.lock:
+            snapshot = grid.snapshot()
+            version = self._version
+        error = None
+        try:
+            write_table(path, snapshot)
+        except Exception as e:
+            error = e
+        finally:
+            with self.lock:
+                grid.release_snapshot()
+        if error is None:
+            self._autosaved_version = version
+            if not autosave:
+                self._saved_version = version
+                # The table itself is now newer than its autosave
+                if os.path.exists(autosave_path(path)):
+                    os.remove(autosave_path(path))
+        self.results.put(SaveResult(path, autosave, error, time.perf_counter() - start))
@@ -0,0 +1,132 @@
+"""
+Headless batch recalculation of table JSON files.
+
+    python batch.py table.json                      # recalculate in place
+    python batch.py tables/ -o results/ --jobs 4    # a directory, concurrently
+    python batch.py big.json --workers 4            # one large table on a process pool
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import repeat
+from typing import List, Optional
+
+from storage import GridStorage
+from calculator import FormulaCalculator
+from recalc import RecalcEngine
+
+
+@dataclass
+class FileReport:
+    input_path: str
+    output_path: str
+    cells: int = 0
+    formulas: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    failure: Optional[str] = None
+
+
+    @property
+    def cells_per_second(self) -> float:
+        return self.cells / self.seconds if self.seconds else 0.0
+
+
+def recalculate_file(input_path: str, output_path: str, workers: int = 1) -> FileReport:
+    """
+    Load a table, recalculate every formula and save it to `output_path`.
+    With workers > 1 large dependency levels are evaluated on a process pool.
+    """
+    report = FileReport(input_path, output_path)
+    start = time.perf_counter()
+    try:
+        grid = GridStorage.load_from_json(input_path)
+        calculator = FormulaCalculator(grid)
+        calculator.rebuild_dependencies()
+        if workers > 1:
+            engine = RecalcEngine(calculator, workers=workers, kind="process")
+            try:
+                updated, errors = engine.recalculate_all()
+            finally:
+                engine.shutdown()
+        else:
+            updated, errors = calculator.recalculate_all()
+        GridStorage.save_to_json(output_path, grid)
+        report.cells = len(grid)
+        report.formulas = len(updated)
+        report.errors = len(errors)
+    except Exception as e:
+        report.failure = str(e)
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def collect_inputs(paths: List[str]) -> List[str]:
+    """Expand directories into the JSON files they contain"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".json")))
+        else:
+            files.append(path)
+    return files
+
+
+def output_path_for(input_path: str, output: Optional[str], many: bool) -> str:
+    if output is None:
+        return input_path
+    if many or os.path.isdir(output):
+        return os.path.join(output, os.path.basename(input_path))
+    return output
+
+
+def run_batch(paths: List[str], output: Optional[str] = None, jobs: int = 1, workers: int = 1) -> List[FileReport]:
+    inputs = collect_inputs(paths)
+    many = len(inputs) > 1 or any(os.path.isdir(path) for path in paths)
+    if output is not None and many:
+        os.makedirs(output, exist_ok=True)
+    targets = [output_path_for(path, output, many) for path in inputs]
+
+    if jobs > 1 and len(inputs) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(recalculate_file, inputs, targets, repeat(workers)))
+    return [recalculate_file(source, target, workers) for source, target in zip(inputs, targets)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="table JSON files or directories with them")
+    parser.add_argument("-o", "--output", help="output file, or directory when several inputs are given "
+                                               "(default: overwrite the inputs)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of files processed concurrently")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="processes recalculating each table (default: 1, no pool)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reports = run_batch(args.paths, args.output, args.jobs, args.workers)
+    total_seconds = time.perf_counter() - start
+
+    for report in reports:
+        if report.failure:
+            print(f"FAILED {report.input_path}: {report.failure}")
+        else:
+            print(f"{report.input_path} -> {report.output_path}: {report.cells} cells, "
+                  f"{report.formulas} formulas, {report.errors} errors, "
+                  f"{report.seconds:.3f} s, {report.cells_per_second:,.0f} cells/s")
+
+    total_cells = sum(report.cells for report in reports)
+    failed = sum(1 for report in reports if report.failure)
+    print(f"{len(reports)} files, {failed} failed, {sum(r.errors for r in reports)} formula errors, "
+          f"{total_cells} cells in {total_seconds:.3f} s "
+          f"({total_cells / total_seconds if total_seconds else 0:,.0f} cells/s)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,473 @@
+"""
+Compact binary table format (.lwb) that is memory-mapped and loaded lazily.
+
+Data file layout (little endian):
+    header   magic "LW1GRID\\0", version u32, block_rows u32, rows u32, columns u32, index_offset u64
+    blocks   the cells of `block_rows` consecutive rows, as records (see below)
+    index    count u32, then count x (block_id u32, offset u64, length u32)
+
+A record is row u32, column u32, kind u8, the value, and the formula
+(length u32, 0xFFFFFFFF for no formula, then UTF-8 bytes).
+
+Saves append only the cells changed since the last save to "<path>.journal".
+When the journal grows past a fraction of the data file it is compacted into
+a freshly written data file.
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Any, Callable, Dict, Iterator, List, Set, Tuple
+
+from models import Grid, Cell, CellError
+from storage import GridStorage
+
+
+MAGIC = b"LW1GRID\0"
+JOURNAL_MAGIC = b"LW1JRNL\0"
+VERSION = 1
+BINARY_EXTENSION = ".lwb"
+
+HEADER = struct.Struct("<8sIIIIQ")
+INDEX_ENTRY = struct.Struct("<IQI")
+RECORD = struct.Struct("<IIB")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F64 = struct.Struct("<d")
+NO_FORMULA = 0xFFFFFFFF
+
+KIND_NONE, KIND_FLOAT, KIND_INT, KIND_STR, KIND_BOOL, KIND_JSON, KIND_DELETED, KIND_SIZE, KIND_ERROR = range(9)
+
+# Marks a cell removed by the journal
+_DELETED = object()
+
+
+def _encode_record(buffer: bytearray, row: int, column: int, item: Any):
+    """Append one cell (raw value, Cell or _DELETED) to `buffer`"""
+    formula = None
+    if item.__class__ is Cell:
+        formula, item = item.formula, item.value
+
+    if item is _DELETED:
+        buffer += RECORD.pack(row, column, KIND_DELETED)
+    elif item is None:
+        buffer += RECORD.pack(row, column, KIND_NONE)
+    elif isinstance(item, bool):
+        buffer += RECORD.pack(row, column, KIND_BOOL) + bytes((item,))
+    elif isinstance(item, float):
+        buffer += RECORD.pack(row, column, KIND_FLOAT) + F64.pack(item)
+    elif isinstance(item, int) and -2 ** 63 <= item < 2 ** 63:
+        buffer += RECORD.pack(row, column, KIND_INT) + I64.pack(item)
+    else:
+        if isinstance(item, str):
+            kind, text = KIND_STR, item
+        elif item.__class__ is CellError:
+            kind, text = KIND_ERROR, item.code
+        else:
+            kind, text = KIND_JSON, json.dumps(item)
+        data = text.encode("utf-8")
+        buffer += RECORD.pack(row, column, kind) + U32.pack(len(data)) + data
+
+    if formula is None:
+        buffer += U32.pack(NO_FORMULA)
+    else:
+        data = formula.encode("utf-8")
+        buffer += U32.pack(len(data)) + data
+
+
+def _decode_records(data) -> Iterator[Tuple[int, int, int, Any]]:
+    """Yield (row, column, kind, item) for every record in a buffer"""
+    view = memoryview(data)
+    pos, end = 0, len(view)
+    while pos < end:
+        row, column, kind = RECORD.unpack_from(view, pos)
+        pos += RECORD.size
+        if kind == KIND_FLOAT:
+            value = F64.unpack_from(view, pos)[0]
+            pos += 8
+        elif kind == KIND_INT:
+            value = I64.unpack_from(view, pos)[0]
+            pos += 8
+        elif kind == KIND_BOOL:
+            value = bool(view[pos])
+            pos += 1
+        elif kind in (KIND_STR, KIND_JSON, KIND_ERROR):
+            length = U32.unpack_from(view, pos)[0]
+            pos += 4
+            value = bytes(view[pos:pos + length]).decode("utf-8")
+            if kind == KIND_JSON:
+                value = json.loads(value)
+            elif kind == KIND_ERROR:
+                value = CellError(value)
+            pos += length
+        else:
+            value = None
+
+        length = U32.unpack_from(view, pos)[0]
+        pos += 4
+        if length == NO_FORMULA:
+            item = value
+        else:
+            item = Cell(value=value, formula=bytes(view[pos:pos + length]).decode("utf-8"))
+            pos += length
+        yield row, column, kind, item
+
+
+class BinaryGridFile:
+    """Read side of a .lwb file: the memory-mapped blocks plus the journal overrides"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.block_rows, self.rows, self.columns, index_offset = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a binary table file")
+
+        self.blocks: Dict[int, Tuple[int, int]] = {}
+        count = U32.unpack_from(self._mmap, index_offset)[0]
+        for i in range(count):
+            block_id, offset, length = INDEX_ENTRY.unpack_from(self._mmap, index_offset + 4 + i * INDEX_ENTRY.size)
+            self.blocks[block_id] = (offset, length)
+
+        # Journal entries are small, so they are read eagerly and applied when a block loads
+        self.journal: Dict[int, Dict[Tuple[int, int], Any]] = {}
+        journal_path = path + ".journal"
+        if os.path.exists(journal_path):
+            with open(journal_path, "rb") as f:
+                data = f.read()
+            if data[:len(JOURNAL_MAGIC)] == JOURNAL_MAGIC:
+                for row, column, kind, item in _decode_records(data[len(JOURNAL_MAGIC):]):
+                    if kind == KIND_SIZE:
+                        self.rows, self.columns = row, column
+                    else:
+                        block = self.journal.setdefault(row // self.block_rows, {})
+                        block[(row, column)] = _DELETED if kind == KIND_DELETED else item
+
+
+    def block_ids(self) -> Set[int]:
+        return set(self.blocks) | set(self.journal)
+
+
+    def read_block(self, block_id: int) -> Iterator[Tuple[int, int, Any]]:
+        """Yield (row, column, item) for the cells of a block, journal changes applied"""
+        overrides = self.journal.get(block_id, {})
+        if block_id in self.blocks:
+            offset, length = self.blocks[block_id]
+            for row, column, kind, item in _decode_records(self._mmap[offset:offset + length]):
+                if (row, column) not in overrides:
+                    yield row, column, item
+        for (row, column), item in overrides.items():
+            if item is not _DELETED:
+                yield row, column, item
+
+
+    def data_size(self) -> int:
+        return len(self._mmap)
+
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+
+
+class LazyGrid(Grid):
+    """
+    Grid backed by a BinaryGridFile: blocks of rows are decoded on first access.
+    Records which cells changed since the last save so saves can be incremental.
+    """
+
+    def __init__(self, source: BinaryGridFile):
+        super().__init__(rows=source.rows, columns=source.columns)
+        self.source = source
+        self._pending: Set[int] = source.block_ids()
+        self.dirty: Set[Tuple[int, int]] = set()
+        self.saved_size = (source.rows, source.columns)
+
+
+    def _ensure(self, row: int):
+        block_id = row // self.source.block_rows
+        if block_id in self._pending:
+            self._load_block(block_id)
+
+
+    def _ensure_rows(self, row1: int, row2: int):
+        block_rows = self.source.block_rows
+        first, last = row1 // block_rows, row2 // block_rows
+        if last - first + 1 <= len(self._pending):
+            blocks = [block_id for block_id in range(first, last + 1) if block_id in self._pending]
+        else:
+            blocks = [block_id for block_id in self._pending if first <= block_id <= last]
+        for block_id in blocks:
+            self._load_block(block_id)
+
+
+    def _load_block(self, block_id: int):
+        self._pending.discard(block_id)
+        rows = self._rows
+        for row, column, item in self.source.read_block(block_id):
+            row_cells = rows.get(row)
+            if row_cells is None:
+                row_cells = rows[row] = {}
+            row_cells[column] = item
+
+
+    def load_all(self):
+        for block_id in sorted(self._pending):
+            self._load_block(block_id)
+
+
+    def is_loaded(self, row: int) -> bool:
+        return row // self.source.block_rows not in self._pending
+
+
+    def get_cell(self, row: int, column: int) -> Cell:
+        if self._pending:
+            self._ensure(row)
+        return super().get_cell(row, column)
+
+
+    def get_value(self, row: int, column: int) -> Any:
+        if self._pending:
+            self._ensure(row)
+        return super().get_value(row, column)
+
+
+    def set_cell(self, row: int, column: int, cell: Cell):
+        self._ensure(row)
+        self.dirty.add((row, column))
+        super().set_cell(row, column, cell)
+
+
+    def set_value(self, row: int, column: int, value: Any):
+        self._ensure(row)
+        self.dirty.add((row, column))
+        super().set_value(row, column, value)
+
+
+    def set_result(self, row: int, column: int, value: Any):
+        self._ensure(row)
+        self.dirty.add((row, column))
+        super().set_result(row, column, value)
+
+
+    def clear_cell(self, row: int, column: int):
+        self._ensure(row)
+        self.dirty.add((row, column))
+        super().clear_cell(row, column)
+
+
+    def clear_row(self, row: int):
+        self._ensure(row)
+        self.dirty.update((row, column) for column in self._rows.get(row, ()))
+        super().clear_row(row)
+
+
+    def clear_column(self, column: int):
+        self.load_all()
+        self.dirty.update((row, column) for row, row_cells in self._rows.items() if column in row_cells)
+        super().clear_column(column)
+
+
+    def clear(self):
+        self.load_all()
+        self.dirty.update((row, column) for row, row_cells in self._rows.items() for column in row_cells)
+        super().clear()
+
+
+    def insert_rows(self, index: int, count: int = 1):
+        self._shift(lambda: super(LazyGrid, self).insert_rows(index, count), 0, index)
+
+
+    def delete_rows(self, index: int, count: int = 1):
+        self._shift(lambda: super(LazyGrid, self).delete_rows(index, count), 0, index)
+
+
+    def insert_columns(self, index: int, count: int = 1):
+        self._shift(lambda: super(LazyGrid, self).insert_columns(index, count), 1, index)
+
+
+    def delete_columns(self, index: int, count: int = 1):
+        self._shift(lambda: super(LazyGrid, self).delete_columns(index, count), 1, index)
+
+
+    def _shift(self, move: Callable[[], None], axis: int, index: int):
+        """Run a row/column move and mark both the old and new positions of moved cells dirty"""
+        self.load_all()
+
+        def positions():
+            return {(row, column) for row, row_cells in self._rows.items()
+                    for column in row_cells if (row, column)[axis] >= index}
+        self.dirty.update(positions())
+        move()
+        # Blocks are loaded and saved by row number, so the cells are not left behind offset maps
+        self._rekey()
+        self.dirty.update(positions())
+
+
+    def range_values(self, row1: int, column1: int, row2: int, column2: int) -> List[Any]:
+        if self._pending:
+            self._ensure_rows(row1, row2)
+        return super().range_values(row1, column1, row2, column2)
+
+
+    def column_values(self, rows: List[int], column: int) -> List[Any]:
+        if self._pending and rows:
+            self._ensure_rows(min(rows), max(rows))
+        return super().column_values(rows, column)
+
+
+    def iter_cells(self, ordered: bool = False):
+        self.load_all()
+        return super().iter_cells(ordered)
+
+
+    def snapshot(self) -> Grid:
+        self.load_all()
+        return super().snapshot()
+
+
+    def iter_rows(self):
+        self.load_all()
+        return super().iter_rows()
+
+
+    def iter_formula_cells(self):
+        self.load_all()
+        return super().iter_formula_cells()
+
+
+    def __len__(self) -> int:
+        self.load_all()
+        return super().__len__()
+
+
+    def _row_items(self, row: int) -> Dict[int, Any]:
+        if self._pending:
+            self._ensure(row)
+        return super()._row_items(row)
+
+
+    def _row_numbers(self):
+        self.load_all()
+        return super()._row_numbers()
+
+
+    def close(self):
+        self.source.close()
+
+
+class BinaryGridStorage:
+    @staticmethod
+    def open(filepath: str) -> LazyGrid:
+        """Map a .lwb file; cells are decoded only when their rows are read"""
+        return LazyGrid(BinaryGridFile(filepath))
+
+
+    @staticmethod
+    def save(filepath: str, grid: Grid, compact_ratio: float = 0.5):
+        """
+        Save a grid. A LazyGrid opened from the same file only appends its changed
+        cells to the journal, compacting once the journal exceeds `compact_ratio`
+        of the data file; any other grid is written in full.
+        """
+        if not isinstance(grid, LazyGrid) or os.path.abspath(grid.source.path) != os.path.abspath(filepath):
+            BinaryGridStorage.save_full(filepath, grid)
+            return
+
+        journal_path = filepath + ".journal"
+        buffer = bytearray()
+        if not os.path.exists(journal_path):
+            buffer += JOURNAL_MAGIC
+        if (grid.rows, grid.columns) != grid.saved_size:
+            buffer += RECORD.pack(grid.rows, grid.columns, KIND_SIZE) + U32.pack(NO_FORMULA)
+        for row, column in sorted(grid.dirty):
+            row_cells = grid._rows.get(row)
+            item = row_cells.get(column, _DELETED) if row_cells is not None else _DELETED
+            _encode_record(buffer, row, column, item)
+
+        with open(journal_path, "ab") as f:
+            f.write(buffer)
+            f.flush()
+            os.fsync(f.fileno())
+        grid.dirty.clear()
+        grid.saved_size = (grid.rows, grid.columns)
+
+        if os.path.getsize(journal_path) > compact_ratio * grid.source.data_size():
+            BinaryGridStorage.compact(grid)
+
+
+    @staticmethod
+    def compact(grid: LazyGrid):
+        """Rewrite the data file with the journal folded in and drop the journal"""
+        grid.load_all()
+        path = grid.source.path
+        grid.source.close()
+        BinaryGridStorage.save_full(path, grid)
+        grid.source = BinaryGridFile(path)
+        grid._pending.clear()
+
+
+    @staticmethod
+    def save_full(filepath: str, grid: Grid, block_rows: int = 256):
+        """
+        Write the whole grid as a new data file (atomically) and remove any journal.
+        Cells are read through iter_cells, so any grid (a fork included) is written as it reads.
+        """
+        if isinstance(grid, LazyGrid):
+            block_rows = grid.source.block_rows
+
+        temp_path = filepath + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"\0" * HEADER.size)
+            index = []
+            offset = HEADER.size
+            block_id = None
+            buffer = bytearray()
+            for row, column, cell in grid.iter_cells(ordered=True):
+                if row // block_rows != block_id:
+                    if buffer:
+                        f.write(buffer)
+                        index.append((block_id, offset, len(buffer)))
+                        offset += len(buffer)
+                        buffer = bytearray()
+                    block_id = row // block_rows
+                _encode_record(buffer, row, column, cell)
+            if buffer:
+                f.write(buffer)
+                index.append((block_id, offset, len(buffer)))
+                offset += len(buffer)
+
+            f.write(U32.pack(len(index)))
+            for entry in index:
+                f.write(INDEX_ENTRY.pack(*entry))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, block_rows, grid.rows, grid.columns, offset))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, filepath)
+        if os.path.exists(filepath + ".journal"):
+            os.remove(filepath + ".journal")
+        # Saving a copy elsewhere leaves the changes still to be saved to the grid's own file
+        if isinstance(grid, LazyGrid) and os.path.abspath(grid.source.path) == os.path.abspath(filepath):
+            grid.dirty.clear()
+            grid.saved_size = (grid.rows, grid.columns)
+
+
+    @staticmethod
+    def json_to_binary(json_path: str, binary_path: str):
+        BinaryGridStorage.save_full(binary_path, GridStorage.load_from_json(json_path))
+
+
+    @staticmethod
+    def binary_to_json(binary_path: str, json_path: str):
+        grid = BinaryGridStorage.open(binary_path)
+        try:
+            GridStorage.save_to_json(json_path, grid)
+        finally:
+            grid.close()
@@ -1,83 +1,717 @@
-import re
+import math
 import operator
+import time
+from functools import lru_cache
+from itertools import repeat
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
-from models import Grid, CellReference, OperatorType
+from models import Grid, Cell, CellError, OperatorType, REF_ERROR, DIV_ZERO_ERROR, VALUE_ERROR, CYCLE_ERROR
+from dependencies import DependencyGraph, CircularReferenceError
+from profiling import RecalcProfiler
+from formula import (Node, Number, CellRef, Range, RelativeRef, RelativeRange, SheetRef, InvalidRef, UnaryOp,
+                     BinaryOp, FunctionCall, parse_formula, iter_references, format_formula, shift_references,
+                     shift_coordinate, relative_key, absolute_formula)
+
+
+# A compiled formula receives a callable returning the numeric value of (row, col),
+# a callable returning the list of numeric values inside a range, and the position
+# of the cell it is evaluated for (used by relative references).
+# Either callable may return a CellError instead, which the formula passes on as its result.
+ValueGetter = Callable[[int, int], Any]
+RangeGetter = Callable[[Range], Any]
+# Reads the numeric values of one column at the given rows
+ColumnGetter = Callable[[List[int], int], List[Any]]
+
+
+@lru_cache(maxsize=65536)
+def _text_number(text: str) -> Optional[float]:
+    """The number written in a text cell, or None; cached so repeated reads raise nothing"""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def to_number(value: Any, row: int, col: int) -> Any:
+    """Convert the value of a referenced cell to a number; empty cells count as 0, errors pass through"""
+    cls = value.__class__
+    if cls is float or cls is CellError:
+        return value
+    if value is None:
+        return 0
+    if cls is int or cls is bool:
+        return float(value)
+    number = _text_number(value) if cls is str else None
+    if number is None:
+        return CellError(VALUE_ERROR, f"Cell {Grid.get_column_name(col + 1)}{row + 1} does not contain a number")
+    return number
+
+
+def range_numbers(values: Iterable[Any]) -> Any:
+    """Keep the numeric values of a range; text that is not a number is skipped, the first error is returned"""
+    numbers = []
+    append = numbers.append
+    for value in values:
+        cls = value.__class__
+        if cls is float or cls is int:
+            append(value)
+        elif cls is CellError:
+            return value
+        elif cls is str:
+            number = _text_number(value)
+            if number is not None:
+                append(number)
+    return numbers
+
+
+def error_message(value: Any) -> Optional[str]:
+    """The message of an error result, None for any other value"""
+    return value.message if value.__class__ is CellError else None
+
+
+def collect_references(ast: Node) -> Tuple[FrozenSet[Tuple[int, int]], FrozenSet[Range]]:
+    """Split the absolute references of an AST into single cells and ranges"""
+    references, ranges = set(), set()
+    for ref in iter_references(ast):
+        if isinstance(ref, Range):
+            ranges.add(ref)
+        elif isinstance(ref, CellRef):
+            references.add((ref.row, ref.column))
+    return frozenset(references), frozenset(ranges)
+
+
+def collect_external(ast: Node) -> FrozenSet[SheetRef]:
+    """The references of an AST to cells and ranges of other sheets"""
+    return frozenset(ref for ref in iter_references(ast) if isinstance(ref, SheetRef))
+
+
+def _is_range(node: Node) -> bool:
+    return isinstance(node, (Range, RelativeRange)) or isinstance(node, SheetRef) and isinstance(node.ref, Range)
+
+
+def _average(values: List[float]) -> Any:
+    if not values:
+        return CellError(DIV_ZERO_ERROR, "AVG of an empty range")
+    return math.fsum(values) / len(values)
+
+
+def _divide(a: float, b: float) -> Any:
+    return a / b if b else CellError(DIV_ZERO_ERROR)
+
+
+def _floor_divide(a: float, b: float) -> Any:
+    return a // b if b else CellError(DIV_ZERO_ERROR)
+
+
+def _modulo(a: float, b: float) -> Any:
+    return a % b if b else CellError(DIV_ZERO_ERROR)
+
+
+def _power(a: float, b: float) -> Any:
+    try:
+        result = a ** b
+    except ZeroDivisionError:
+        return CellError(DIV_ZERO_ERROR, "Zero raised to a negative power")
+    except OverflowError:
+        return CellError(VALUE_ERROR, "Number too large")
+    if result.__class__ is complex:
+        return CellError(VALUE_ERROR, "Fractional power of a negative number")
+    return result
+
+
+class CompiledFormula:
+    """
+    A formula compiled to closures. Formulas in relative (R1C1) form are templates:
+    one instance is shared by every cell holding the same relative formula.
+    References to other sheets are kept apart in `external`: the workbook tracks them.
+    """
+    __slots__ = ('ast', 'func', 'references', 'ranges', 'offsets', 'relative_ranges', 'external', 'vector')
+
+    def __init__(self, ast: Node, func: Callable[[ValueGetter, RangeGetter, int, int], float],
+                 references: FrozenSet[Tuple[int, int]], ranges: FrozenSet[Range],
+                 offsets: FrozenSet[Tuple[int, int]] = frozenset(),
+                 relative_ranges: FrozenSet[RelativeRange] = frozenset(),
+                 external: FrozenSet[SheetRef] = frozenset()):
+        self.ast = ast
+        self.func = func
+        self.references = references
+        self.ranges = ranges
+        self.offsets = offsets
+        self.relative_ranges = relative_ranges
+        self.external = external
+        # Column-wise version of func, built on first use
+        self.vector = None
+
+
+    def reads(self, row: int, col: int) -> bool:
+        """Whether the formula stored at (row, col) reads that same cell, directly or through a range"""
+        return ((row, col) in self.references or any(rng.contains(row, col) for rng in self.ranges)
+                or (0, 0) in self.offsets or any(rng.contains(0, 0) for rng in self.relative_ranges))
+
+
+    def references_at(self, row: int, col: int) -> Tuple[FrozenSet[Tuple[int, int]], FrozenSet[Range]]:
+        """Absolute cells and ranges read by the formula when it is stored at (row, col)"""
+        if not self.offsets and not self.relative_ranges:
+            return self.references, self.ranges
+        return (self.references | {(row + dr, col + dc) for dr, dc in self.offsets},
+                self.ranges | {rng.at(row, col) for rng in self.relative_ranges})
 
 
 class FormulaCalculator:
-    def __init__(self, grid: Grid):
+    def __init__(self, grid: Grid, cache_size: int = 4096):
         self.grid = grid
         self.operators = {
             '+': (operator.add, OperatorType.BINARY),
             '-': (operator.sub, OperatorType.BINARY),
             '*': (operator.mul, OperatorType.BINARY),
-            '/': (operator.truediv, OperatorType.BINARY),
-            '**': (operator.pow, OperatorType.BINARY),
-            'mod': (operator.mod, OperatorType.BINARY),
-            'div': (operator.floordiv, OperatorType.BINARY),
+            '/': (_divide, OperatorType.BINARY),
+            '**': (_power, OperatorType.BINARY),
+            'mod': (_modulo, OperatorType.BINARY),
+            'div': (_floor_divide, OperatorType.BINARY),
             'inc': (lambda x: x + 1, OperatorType.UNARY),
-            'dec': (lambda x: x - 1, OperatorType.UNARY)
+            'dec': (lambda x: x - 1, OperatorType.UNARY),
+            'sum': (math.fsum, OperatorType.AGGREGATE),
+            'avg': (_average, OperatorType.AGGREGATE),
+            'min': (lambda values: min(values, default=0), OperatorType.AGGREGATE),
+            'max': (lambda values: max(values, default=0), OperatorType.AGGREGATE),
+            'count': (len, OperatorType.AGGREGATE)
         }
+        # Formulas are compiled once per distinct relative text and reused on every recalculation
+        self.compile = lru_cache(maxsize=cache_size)(self._compile)
+        self.dependencies = DependencyGraph()
+        # Template of every registered formula cell, so recalculation does not normalize its text again
+        self.cell_templates: Dict[Tuple[int, int], CompiledFormula] = {}
+        # Text and template of every cell template_for was asked about, so evaluating a cell
+        # again costs a string comparison instead of relative_key; the template depends only
+        # on the text and the position, so entries never go stale, they are only replaced
+        self.formula_templates: Dict[Tuple[int, int], Tuple[str, CompiledFormula]] = {}
+        # Groups of at least this many cells sharing a template are evaluated column-wise
+        self.vector_threshold = 16
+        # Set on forks until their first formula change: the graph and templates belong to the base
+        self._shared_dependencies = False
+        # The workbook this calculator's grid is a sheet of (see workbook.Workbook), which
+        # resolves Sheet!A1 references and tracks the dependencies between sheets
+        self.workbook = None
+        self.sheet_name: Optional[str] = None
+        # Instrumentation, off unless enable_profiling is called
+        self.profiler: Optional[RecalcProfiler] = None
+
+
+    def enable_profiling(self) -> RecalcProfiler:
+        """Start recording evaluation counts and times, cache hit rates and pass durations"""
+        if self.profiler is None:
+            self.profiler = RecalcProfiler(self.compile.cache_info)
+        return self.profiler
+
+
+    def disable_profiling(self) -> Optional[RecalcProfiler]:
+        """Stop recording; returns the profiler with what it recorded"""
+        profiler, self.profiler = self.profiler, None
+        return profiler
+
+
+    def fork(self) -> 'FormulaCalculator':
+        """
+        A calculator over a copy-on-write fork of the grid, for what-if scenarios. It shares the
+        compile cache, and the dependency graph until a formula changes in the fork, so forking
+        is O(1). Changing values and recalculating in the fork leave this calculator untouched.
+        """
+        forked = FormulaCalculator(self.grid.fork())
+        forked.compile = self.compile
+        forked.dependencies = self.dependencies
+        forked.cell_templates = self.cell_templates
+        forked.formula_templates = self.formula_templates
+        forked.vector_threshold = self.vector_threshold
+        forked._shared_dependencies = True
+        return forked
+
+
+    def _own_dependencies(self):
+        """Copy a shared dependency graph before changing it"""
+        if self._shared_dependencies:
+            self.dependencies = self.dependencies.copy()
+            self.cell_templates = dict(self.cell_templates)
+            self._shared_dependencies = False
+
+
+    def template_for(self, formula: str, row: int, col: int) -> CompiledFormula:
+        """The shared compiled template of a formula (without '=') stored at (row, col)"""
+        cached = self.formula_templates.get((row, col))
+        if cached is not None and cached[0] == formula:
+            return cached[1]
+        compiled = self.compile(relative_key(formula.strip(), row, col))
+        self.formula_templates[(row, col)] = (formula, compiled)
+        return compiled
+
+
+    def set_formula(self, row: int, col: int, formula: str):
+        """Register the references of the formula stored in a cell"""
+        compiled = self.template_for(formula.strip()[1:], row, col)
+        self._own_dependencies()
+        self.cell_templates[(row, col)] = compiled
+        self.dependencies.set_precedents((row, col), *compiled.references_at(row, col))
+        if self.workbook is not None:
+            self.workbook.set_external(self.sheet_name, row, col, compiled.external)
+
+
+    def fill_formula(self, row1: int, col1: int, row2: int, col2: int, formula: str) -> List[Tuple[int, int]]:
+        """
+        Fill a block with a formula written for its top-left cell, shifting its references
+        like a fill-down/fill-right. All the cells share one compiled template.
+        Returns the filled cells; recalculate them to compute their values.
+        """
+        key = relative_key(formula.strip()[1:].strip(), row1, col1)
+        compiled = self.compile(key)
+        self._own_dependencies()
+        graph = self.dependencies
+        templates = self.cell_templates
+        workbook = self.workbook
+        cells = []
+        for row in range(row1, row2 + 1):
+            for col in range(col1, col2 + 1):
+                self.grid.set_cell(row, col, Cell(formula="=" + absolute_formula(key, row, col)))
+                templates[(row, col)] = compiled
+                graph.set_precedents((row, col), *compiled.references_at(row, col))
+                if workbook is not None:
+                    workbook.set_external(self.sheet_name, row, col, compiled.external)
+                cells.append((row, col))
+        return cells
+
+
+    def clear_formula(self, row: int, col: int):
+        """Forget the references of a cell that no longer holds a formula"""
+        self._own_dependencies()
+        self.cell_templates.pop((row, col), None)
+        self.formula_templates.pop((row, col), None)
+        self.dependencies.remove((row, col))
+        if self.workbook is not None:
+            self.workbook.set_external(self.sheet_name, row, col, frozenset())
+
+
+    def clear_dependencies(self):
+        """Forget the dependencies and templates of every formula, e.g. when the grid is replaced"""
+        if self._shared_dependencies:
+            self.dependencies, self.cell_templates, self.formula_templates = DependencyGraph(), {}, {}
+            self._shared_dependencies = False
+        self.dependencies.clear()
+        self.cell_templates.clear()
+        self.formula_templates.clear()
+
+
+    def rebuild_dependencies(self):
+        """Re-register every formula of the grid, e.g. after loading a table"""
+        self.clear_dependencies()
+        if self.workbook is not None:
+            self.workbook.clear_external(self.sheet_name)
+        for row, col, cell in self.grid.iter_formula_cells():
+            try:
+                self.set_formula(row, col, cell.formula)
+            except ValueError:
+                # Unparsable formulas have no references; evaluation reports the error
+                self.dependencies.set_precedents((row, col), ())
+
+
+    def insert_rows(self, index: int, count: int = 1) -> Set[Tuple[int, int]]:
+        """Insert rows before `index`, rewriting references; returns the formula cells to recalculate"""
+        return self._shift_cells(0, index, count)
+
+
+    def delete_rows(self, index: int, count: int = 1) -> Set[Tuple[int, int]]:
+        """Delete rows starting at `index`, rewriting references; returns the formula cells to recalculate"""
+        return self._shift_cells(0, index, -count)
+
+
+    def insert_columns(self, index: int, count: int = 1) -> Set[Tuple[int, int]]:
+        """Insert columns before `index`, rewriting references; returns the formula cells to recalculate"""
+        return self._shift_cells(1, index, count)
+
+
+    def delete_columns(self, index: int, count: int = 1) -> Set[Tuple[int, int]]:
+        """Delete columns starting at `index`, rewriting references; returns the formula cells to recalculate"""
+        return self._shift_cells(1, index, -count)
+
 
+    def _shift_cells(self, axis: int, index: int, delta: int) -> Set[Tuple[int, int]]:
+        """
+        Move the grid's cells for a row (axis 0) or column (axis 1) insert/delete and keep
+        formulas pointing at the same data. Only formulas that move or that read moved or
+        deleted cells are touched; the dependency graph's row/column index finds them
+        without going over the formulas before `index`.
+        Sheet!A1 references are left to the workbook, which rewrites them on every sheet.
+        """
+        self._own_dependencies()
+        graph = self.dependencies
+        moved = graph.formulas_from(axis, index)
+        referencing = graph.readers_from(axis, index)
+
+        touched = moved | referencing
+        # Formulas that only move keep their references, so they are not parsed again
+        kept = {cell: (graph.precedents[cell], graph.range_precedents.get(cell, ()))
+                for cell in moved - referencing}
+        workbook = self.workbook
+        external = {}
+        for cell in touched:
+            graph.remove(cell)
+            if workbook is not None:
+                external[cell] = workbook.set_external(self.sheet_name, *cell, frozenset())
+            # Moving a cell changes its relative form; the template is looked up again when evaluated
+            self.cell_templates.pop(cell, None)
+        if axis == 0:
+            (self.grid.insert_rows if delta > 0 else self.grid.delete_rows)(index, abs(delta))
+        else:
+            (self.grid.insert_columns if delta > 0 else self.grid.delete_columns)(index, abs(delta))
+
+        changed = set()
+        for cell in touched:
+            coordinate = shift_coordinate(cell[axis], index, delta)
+            if coordinate is None:
+                continue  # the formula cell itself was deleted
+            row, col = (coordinate, cell[1]) if axis == 0 else (cell[0], coordinate)
+            if workbook is not None and external[cell]:
+                workbook.set_external(self.sheet_name, row, col, external[cell])
+            if cell in kept:
+                graph.set_precedents((row, col), *kept[cell])
+                continue
+            stored = self.grid.get_cell(row, col)
+            # Parsed without compiling: the rewritten text is compiled when it is recalculated
+            ast = parse_formula(stored.formula.strip()[1:].strip())
+            shifted = shift_references(ast, axis, index, delta)
+            if shifted is not ast:
+                self.grid.set_cell(row, col, Cell(value=stored.value, formula="=" + format_formula(shifted)))
+            graph.set_precedents((row, col), *collect_references(shifted))
+            changed.add((row, col))
+        return changed
+
+
+    def recalculate(self, changed: Iterable[Tuple[int, int]]) -> Tuple[List[Tuple[int, int]], Dict[Tuple[int, int], str]]:
+        """
+        Recalculate the formula cells among `changed` and all of their transitive
+        dependents, each exactly once and in topological order.
+        Returns the recalculated cells and the error message of every cell that failed.
+        """
+        affected = self.dependencies.affected(changed)
+        return self._recalculate_cells(affected)
+
+
+    def recalculate_all(self) -> Tuple[List[Tuple[int, int]], Dict[Tuple[int, int], str]]:
+        """Recalculate every registered formula cell"""
+        return self._recalculate_cells(set(self.dependencies.precedents))
+
+
+    def _recalculate_cells(self, cells):
+        start = time.perf_counter()
+        levels, blocked = self.dependencies.evaluation_levels(cells)
+        errors = {}
+        order = []
+        for level in levels:
+            tasks = [(row, col, self.grid.get_cell(row, col).formula[1:]) for row, col in level]
+            for row, col, value, error in self.evaluate_many(tasks):
+                self.grid.set_result(row, col, value)
+                if error is not None:
+                    errors[(row, col)] = error
+                order.append((row, col))
+
+        self.mark_blocked(blocked, errors)
+        if self.profiler is not None:
+            self.profiler.record_pass("recalculate", len(order), time.perf_counter() - start)
+        return order + sorted(blocked), errors
+
+
+    def evaluate_many(self, tasks: Iterable[Tuple[int, int, str]]) -> List[Tuple[int, int, Any, Optional[str]]]:
+        """
+        Evaluate formulas (row, col, text without '=') that do not read each other.
+        Cells of one column sharing a template are evaluated together, column-wise.
+        Returns (row, col, value, error message or None) for every task.
+        """
+        templates = self.cell_templates
+        groups: Dict[Tuple[CompiledFormula, int], List[int]] = {}
+        results = []
+        misses = 0
+        for row, col, formula in tasks:
+            compiled = templates.get((row, col))
+            if compiled is None:
+                misses += 1
+                try:
+                    compiled = self.template_for(formula, row, col)
+                except ValueError as e:
+                    results.append((row, col, CellError(VALUE_ERROR, str(e)), str(e)))
+                    continue
+            group = groups.get((compiled, col))
+            if group is None:
+                group = groups[(compiled, col)] = []
+            group.append(row)
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.record_templates(len(results) + sum(map(len, groups.values())) - misses, misses)
+        for (compiled, col), rows in groups.items():
+            if len(rows) >= self.vector_threshold and not compiled.references and not compiled.ranges \
+                    and not compiled.external and not compiled.reads(0, 0):
+                start = time.perf_counter()
+                try:
+                    values = self.evaluate_column(compiled, rows, col)
+                except Exception:
+                    values = None  # an error value somewhere in the column: evaluate the cells one by one
+                if values is not None:
+                    results.extend(zip(rows, repeat(col), values, repeat(None)))
+                    if profiler is not None:
+                        profiler.record_batch(zip(rows, repeat(col)), time.perf_counter() - start)
+                    continue
+            get, get_range, evaluate = self._cell_number, self.read_range, self.evaluate_compiled
+            if profiler is not None:
+                evaluate = profiler.timed(evaluate)
+            for row in rows:
+                value = evaluate(compiled, row, col, get, get_range)
+                results.append((row, col, value, error_message(value)))
+        return results
+
+
+    def evaluate_column(self, compiled: CompiledFormula, rows: List[int], col: int) -> List[float]:
+        """Evaluate a template for many rows of one column with one map() per operator"""
+        if compiled.vector is None:
+            compiled.vector = self._build_vector(compiled.ast)
+        return list(map(float, compiled.vector(self._cell_number, self.read_range, self.read_column, rows, col)))
+
+
+    def mark_blocked(self, blocked: Iterable[Tuple[int, int]], errors: Dict[Tuple[int, int], str]):
+        """Set cells that are on or behind a reference cycle to #CYCLE!"""
+        blocked = set(blocked)
+        if not blocked:
+            return
+        cycle = self.dependencies.find_cycle(blocked)
+        error = CellError(CYCLE_ERROR, str(CircularReferenceError(cycle)) if cycle else None)
+        for row, col in blocked:
+            self.grid.set_result(row, col, error)
+            errors[(row, col)] = error.message
+
+
+    def evaluate(self, formula: str, current_row: int, current_col: int) -> Any:
+        """Evaluate a formula string and return the result, a CellError if it fails"""
+        try:
+            compiled = self.template_for(formula, current_row, current_col)
+        except ValueError as e:
+            return CellError(VALUE_ERROR, str(e))
+        evaluate = self.evaluate_compiled if self.profiler is None else self.profiler.timed(self.evaluate_compiled)
+        return evaluate(compiled, current_row, current_col, self._cell_number, self.read_range)
+
+
+    @staticmethod
+    def evaluate_compiled(compiled: CompiledFormula, current_row: int, current_col: int,
+                          get: ValueGetter, get_range: RangeGetter) -> Any:
+        """Evaluate a compiled formula reading its inputs through `get` and `get_range`; errors are returned"""
+        if compiled.reads(current_row, current_col):
+            return CellError(CYCLE_ERROR)
 
-    def evaluate(self, formula: str, current_row: int, current_col: int) -> float:
-        """Evaluate a formula string and return the result"""
-        formula = formula.strip()
-        
-        # Handle unary operators
-        for op, (func, op_type) in self.operators.items():
-            if op_type == OperatorType.UNARY and formula.lower().startswith(f"{op}(") and formula.endswith(")"):
-                inner_expr = formula[len(op)+1:-1]
-                inner_value = self.evaluate(inner_expr, current_row, current_col)
-                return func(inner_value)
-
-        # Replace operators and cell references
-        formula = self._replace_word_operators(formula)
-        formula = self._replace_cell_references(formula, current_row, current_col)
-        
         try:
-            # Create safe evaluation environment
-            safe_dict = {
-                op: func for op, (func, _) in self.operators.items() 
-                if _ == OperatorType.BINARY
-            }
-            # Add the power operator specifically
-            safe_dict['**'] = operator.pow
-            
-            # Evaluate and return result
-            return float(eval(formula.replace(' ', ''), {"__builtins__": {}}, safe_dict))
+            result = compiled.func(get, get_range, current_row, current_col)
         except Exception as e:
+            # Error values cover every expected failure; this is only a safety net
+            return CellError(VALUE_ERROR, f"Invalid formula: {str(e)}")
+        return result if result.__class__ is CellError else float(result)
+
+
+    def _cell_number(self, row: int, col: int) -> Any:
+        """Read a referenced cell as a number"""
+        return to_number(self.grid.get_value(row, col), row, col)
+
+
+    def read_range(self, rng: Range) -> Any:
+        """Read the numeric values of a range in one pass; empty and text cells are skipped, errors returned"""
+        return range_numbers(self.grid.range_values(rng.row1, rng.column1, rng.row2, rng.column2))
+
+
+    def read_sheet(self, ref: SheetRef) -> Any:
+        """Read a cell (as a number) or a range (as a list of numbers) of another sheet, loading it if needed"""
+        if ref.sheet == self.sheet_name:
+            grid = self.grid
+        elif self.workbook is not None and ref.sheet in self.workbook:
+            grid = self.workbook.grid(ref.sheet)
+        else:
+            return CellError(REF_ERROR, f"Unknown sheet '{ref.sheet}'")
+        rng = ref.ref
+        if rng.__class__ is CellRef:
+            return to_number(grid.get_value(rng.row, rng.column), rng.row, rng.column)
+        return range_numbers(grid.range_values(rng.row1, rng.column1, rng.row2, rng.column2))
+
+
+    def read_column(self, rows: List[int], col: int) -> List[Any]:
+        """Read the cells of one column at `rows` as numbers (or error values)"""
+        values = self.grid.column_values(rows, col)
+        return [value if value.__class__ is float else to_number(value, row, col) for row, value in zip(rows, values)]
+
+
+    def _compile(self, formula: str) -> CompiledFormula:
+        """Parse a formula and turn its AST into nested closures"""
+        try:
+            ast = parse_formula(formula)
+        except ValueError as e:
             raise ValueError(f"Invalid formula: {str(e)}")
+        references, ranges = collect_references(ast)
+        offsets, relative_ranges = set(), set()
+        for ref in iter_references(ast):
+            if isinstance(ref, RelativeRef):
+                offsets.add((ref.row_offset, ref.column_offset))
+            elif isinstance(ref, RelativeRange):
+                relative_ranges.add(ref)
+        return CompiledFormula(ast, self._build(ast), references, ranges, frozenset(offsets), frozenset(relative_ranges),
+                               collect_external(ast))
 
 
-    def _replace_word_operators(self, formula: str) -> str:
-        """Replace word operators with their symbol equivalents"""
-        # Replace power operator ^ with **
-        formula = formula.replace('^', '**')
-        formula = re.sub(r'\bmod\b', '%', formula, flags=re.IGNORECASE)
-        formula = re.sub(r'\bdiv\b', '//', formula, flags=re.IGNORECASE)
-        return formula
-
-
-    def _replace_cell_references(self, formula: str, current_row: int, current_col: int) -> str:
-        while True:
-            cell_ref_match = re.search(r'[A-Z]+\d+', formula)
-            if not cell_ref_match:
-                break
-            
-            cell_ref = cell_ref_match.group()
-            cell_coords = CellReference.from_string(cell_ref)
-            
-            if cell_coords.row == current_row and cell_coords.column == current_col:
-                raise ValueError("Circular reference detected")
-            
-            cell = self.grid.get_cell(cell_coords.row, cell_coords.column)
-            try:
-                value = float(cell.value) if cell.value is not None else 0
-            except (ValueError, TypeError):
-                raise ValueError(f"Cell {cell_ref} does not contain a number")
-            
-            formula = formula.replace(cell_ref, str(value))
-        
-        return formula
-        
\ No newline at end of file
+    def _build(self, node: Node) -> Callable[[ValueGetter, RangeGetter, int, int], Any]:
+        if isinstance(node, Number):
+            value = node.value
+            return lambda get, get_range, r, c: value
+
+        if isinstance(node, CellRef):
+            row, col = node.row, node.column
+            return lambda get, get_range, r, c: get(row, col)
+
+        if isinstance(node, RelativeRef):
+            dr, dc = node.row_offset, node.column_offset
+            return lambda get, get_range, r, c: get(r + dr, c + dc)
+
+        if isinstance(node, Range):
+            return lambda get, get_range, r, c: get_range(node)
+
+        if isinstance(node, RelativeRange):
+            return lambda get, get_range, r, c: get_range(node.at(r, c))
+
+        if isinstance(node, SheetRef):
+            # Read through this calculator's workbook, not the getters: they only see this sheet
+            read_sheet = self.read_sheet
+            return lambda get, get_range, r, c: read_sheet(node)
+
+        if isinstance(node, InvalidRef):
+            error = CellError(REF_ERROR)
+            return lambda get, get_range, r, c: error
+
+        if isinstance(node, UnaryOp):
+            operand = self._build(node.operand)
+            if node.op != '-':
+                return operand
+
+            def negate(get, get_range, r, c):
+                value = operand(get, get_range, r, c)
+                return value if value.__class__ is CellError else -value
+            return negate
+
+        if isinstance(node, BinaryOp):
+            func = self.operators[node.op][0]
+            if isinstance(node.left, Number) and isinstance(node.right, Number):
+                folded = func(node.left.value, node.right.value)
+                return lambda get, get_range, r, c: folded
+            left, right = self._build(node.left), self._build(node.right)
+
+            def binary(get, get_range, r, c):
+                a = left(get, get_range, r, c)
+                if a.__class__ is CellError:
+                    return a
+                b = right(get, get_range, r, c)
+                if b.__class__ is CellError:
+                    return b
+                return func(a, b)
+            return binary
+
+        if isinstance(node, FunctionCall):
+            func, op_type = self.operators[node.name]
+            if op_type == OperatorType.AGGREGATE:
+                return self._build_aggregate(func, node.args)
+            if len(node.args) != 1:
+                raise ValueError(f"Invalid formula: {node.name}() takes exactly one argument")
+            argument = self._build(node.args[0])
+
+            def apply(get, get_range, r, c):
+                value = argument(get, get_range, r, c)
+                return value if value.__class__ is CellError else func(value)
+            return apply
+
+        raise ValueError(f"Invalid formula: unsupported expression {node!r}")
+
+
+    def _build_aggregate(self, func: Callable[[List[float]], float], args) -> Callable[[ValueGetter, RangeGetter, int, int], float]:
+        """Aggregate over ranges (read in bulk) and scalar arguments"""
+        if len(args) == 1 and _is_range(args[0]):
+            part = self._build(args[0])
+
+            def aggregate_range(get, get_range, r, c):
+                values = part(get, get_range, r, c)
+                return values if values.__class__ is CellError else func(values)
+            return aggregate_range
+
+        parts = [(_is_range(arg), self._build(arg)) for arg in args]
+
+        def aggregate(get, get_range, r, c):
+            values = []
+            for is_range, part in parts:
+                value = part(get, get_range, r, c)
+                if value.__class__ is CellError:
+                    return value
+                if is_range:
+                    values.extend(value)
+                else:
+                    values.append(value)
+            return func(values)
+        return aggregate
+
+
+    def _build_vector(self, node: Node) -> Callable[[ValueGetter, RangeGetter, ColumnGetter, List[int], int], Iterable]:
+        """
+        Column-wise counterpart of _build: the closure evaluates the node for every row
+        of `rows` at once and returns an iterable of values in the same order.
+        """
+        if isinstance(node, Number):
+            value = node.value
+            return lambda get, get_range, get_column, rows, col: repeat(value, len(rows))
+
+        if isinstance(node, CellRef):
+            row, column = node.row, node.column
+            return lambda get, get_range, get_column, rows, col: repeat(get(row, column), len(rows))
+
+        if isinstance(node, RelativeRef):
+            dr, dc = node.row_offset, node.column_offset
+            if dr == 0:
+                return lambda get, get_range, get_column, rows, col: get_column(rows, col + dc)
+            return lambda get, get_range, get_column, rows, col: get_column([row + dr for row in rows], col + dc)
+
+        if isinstance(node, Range):
+            return lambda get, get_range, get_column, rows, col: repeat(get_range(node), len(rows))
+
+        if isinstance(node, RelativeRange):
+            return lambda get, get_range, get_column, rows, col: [get_range(node.at(row, col)) for row in rows]
+
+        if isinstance(node, UnaryOp):
+            operand = self._build_vector(node.operand)
+            if node.op == '-':
+                return lambda *args: map(operator.neg, operand(*args))
+            return operand
+
+        if isinstance(node, BinaryOp):
+            func = self.operators[node.op][0]
+            left, right = self._build_vector(node.left), self._build_vector(node.right)
+            return lambda *args: map(func, left(*args), right(*args))
+
+        if isinstance(node, FunctionCall):
+            func, op_type = self.operators[node.name]
+            if op_type != OperatorType.AGGREGATE:
+                argument = self._build_vector(node.args[0])
+                return lambda *args: map(func, argument(*args))
+            parts = [(_is_range(arg), self._build_vector(arg)) for arg in node.args]
+            if len(parts) == 1 and parts[0][0]:
+                part = parts[0][1]
+                return lambda *args: map(func, part(*args))
+
+            def combine(*row_values):
+                values = []
+                for (is_range, _), value in zip(parts, row_values):
+                    if value.__class__ is CellError:
+                        # As in _build_aggregate; evaluate_column then falls back to one cell at a time
+                        return value
+                    if is_range:
+                        values.extend(value)
+                    else:
+                        values.append(value)
+                return func(values)
+            return lambda *args: map(combine, *(part(*args) for _, part in parts))
+
+        # SheetRef, InvalidRef and anything else: let evaluate_many fall back to one cell at a time
+        raise ValueError(f"Invalid formula: cannot evaluate {node!r} column-wise")
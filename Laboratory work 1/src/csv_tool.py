@@ -0,0 +1,73 @@
+"""
+Headless CSV import and export of tables.
+
+    python csv_tool.py import data.csv -o table.json          # or table.lwb
+    python csv_tool.py export table.json -o data.csv --recalculate
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+from storage import CsvReport, GridStorage
+from binary_storage import BINARY_EXTENSION, BinaryGridStorage
+from calculator import FormulaCalculator
+from models import Grid
+
+
+def print_progress(report: CsvReport):
+    print(f"  {report.rows:,} rows, {report.seconds:.1f} s ({report.rows_per_second:,.0f} rows/s)",
+          file=sys.stderr)
+
+
+def load_table(path: str) -> Grid:
+    if path.endswith(BINARY_EXTENSION):
+        return BinaryGridStorage.open(path)
+    return GridStorage.load_from_json(path)
+
+
+def save_table(path: str, grid: Grid):
+    if path.endswith(BINARY_EXTENSION):
+        BinaryGridStorage.save_full(path, grid)
+    else:
+        GridStorage.save_to_json(path, grid)
+
+
+def recalculate(grid: Grid) -> int:
+    """Compute every formula; returns the number of formula errors"""
+    calculator = FormulaCalculator(grid)
+    calculator.rebuild_dependencies()
+    updated, errors = calculator.recalculate_all()
+    return len(errors)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("input", help="CSV file to import, or table (.json or .lwb) to export")
+    parser.add_argument("-o", "--output", required=True, help="table to write (import) or CSV file (export)")
+    parser.add_argument("-d", "--delimiter", default=",")
+    parser.add_argument("--recalculate", action="store_true", help="compute the formulas before saving")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not print progress")
+    args = parser.parse_args(argv)
+    on_progress = None if args.quiet else print_progress
+
+    if args.command == "import":
+        grid, report = GridStorage.import_csv(args.input, args.delimiter, on_progress=on_progress)
+        numeric = ", ".join(Grid.get_column_name(column + 1) for column in report.numeric_columns) or "none"
+        print(f"{args.input}: {report.rows:,} rows, {report.cells:,} cells, {report.formulas:,} formulas "
+              f"in {report.seconds:.3f} s ({report.rows_per_second:,.0f} rows/s); numeric columns: {numeric}")
+        if args.recalculate:
+            print(f"{recalculate(grid)} formula errors")
+        save_table(args.output, grid)
+    else:
+        grid = load_table(args.input)
+        if args.recalculate:
+            print(f"{recalculate(grid)} formula errors")
+        report = GridStorage.export_csv(args.output, grid, args.delimiter, on_progress=on_progress)
+        print(f"{args.output}: {report.rows:,} rows, {report.cells:,} cells "
+              f"in {report.seconds:.3f} s ({report.rows_per_second:,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
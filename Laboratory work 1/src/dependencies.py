@@ -0,0 +1,284 @@
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+from models import Grid
+from formula import Range
+
+
+Coordinate = Tuple[int, int]
+
+# Rows/columns per block of an AxisIndex
+INDEX_BLOCK = 256
+
+
+class CircularReferenceError(ValueError):
+    def __init__(self, cycle: List[Coordinate]):
+        self.cycle = cycle
+        super().__init__("Circular reference detected: " + " -> ".join(
+            f"{Grid.get_column_name(col + 1)}{row + 1}" for row, col in cycle))
+
+
+class AxisIndex:
+    """
+    Members (cells or ranges) by a row or column number, in blocks of INDEX_BLOCK numbers
+    with the occupied blocks kept sorted: the members from a row/column on are found
+    without looking at the ones before it.
+    """
+
+    def __init__(self):
+        self.blocks: Dict[int, Dict[Hashable, int]] = {}
+        self.order: List[int] = []
+
+
+    def add(self, position: int, member: Hashable):
+        block_id = position // INDEX_BLOCK
+        block = self.blocks.get(block_id)
+        if block is None:
+            block = self.blocks[block_id] = {}
+            insort(self.order, block_id)
+        block[member] = position
+
+
+    def discard(self, position: int, member: Hashable):
+        block_id = position // INDEX_BLOCK
+        block = self.blocks.get(block_id)
+        if block is not None and block.pop(member, None) is not None and not block:
+            del self.blocks[block_id]
+            del self.order[bisect_left(self.order, block_id)]
+
+
+    def since(self, position: int) -> Iterator[Any]:
+        """Members at `position` or after it"""
+        blocks = self.blocks
+        for block_id in self.order[bisect_left(self.order, position // INDEX_BLOCK):]:
+            for member, member_position in blocks[block_id].items():
+                if member_position >= position:
+                    yield member
+
+
+    def copy(self) -> 'AxisIndex':
+        index = AxisIndex()
+        index.blocks = {block_id: dict(block) for block_id, block in self.blocks.items()}
+        index.order = list(self.order)
+        return index
+
+
+class DependencyGraph:
+    """
+    Precedents/dependents of every formula cell, kept up to date as formulas change.
+    Range references are tracked as whole ranges (indexed by column) rather than
+    expanded into one edge per cell. Formula cells, referenced cells and the ends of
+    ranges are also indexed by row and by column, for row/column inserts and deletes.
+    """
+
+    def __init__(self):
+        self.precedents: Dict[Coordinate, Set[Coordinate]] = {}
+        self.dependents: Dict[Coordinate, Set[Coordinate]] = {}
+        self.range_precedents: Dict[Coordinate, Set[Range]] = {}
+        self.range_dependents: Dict[Range, Set[Coordinate]] = {}
+        self.ranges_by_column: Dict[int, Set[Range]] = {}
+        # One AxisIndex per axis (0 rows, 1 columns)
+        self.formula_index = (AxisIndex(), AxisIndex())
+        self.reference_index = (AxisIndex(), AxisIndex())
+        self.range_end_index = (AxisIndex(), AxisIndex())
+
+
+    def set_precedents(self, cell: Coordinate, references: Iterable[Coordinate], ranges: Iterable[Range] = ()):
+        """Register the cells and ranges a formula cell reads, replacing its previous references"""
+        self.remove(cell)
+        references = set(references)
+        self.precedents[cell] = references
+        for axis, index in enumerate(self.formula_index):
+            index.add(cell[axis], cell)
+        for ref in references:
+            dependents = self.dependents.get(ref)
+            if dependents is None:
+                dependents = self.dependents[ref] = set()
+                for axis, index in enumerate(self.reference_index):
+                    index.add(ref[axis], ref)
+            dependents.add(cell)
+
+        ranges = set(ranges)
+        if ranges:
+            self.range_precedents[cell] = ranges
+            for rng in ranges:
+                dependents = self.range_dependents.get(rng)
+                if dependents is None:
+                    dependents = self.range_dependents[rng] = set()
+                    for column in range(rng.column1, rng.column2 + 1):
+                        self.ranges_by_column.setdefault(column, set()).add(rng)
+                    for axis, index in enumerate(self.range_end_index):
+                        index.add((rng.row2, rng.column2)[axis], rng)
+                dependents.add(cell)
+
+
+    def remove(self, cell: Coordinate):
+        """Forget the references of a cell that no longer holds a formula"""
+        references = self.precedents.pop(cell, None)
+        if references is None:
+            return
+        for axis, index in enumerate(self.formula_index):
+            index.discard(cell[axis], cell)
+        for ref in references:
+            dependents = self.dependents.get(ref)
+            if dependents is not None:
+                dependents.discard(cell)
+                if not dependents:
+                    del self.dependents[ref]
+                    for axis, index in enumerate(self.reference_index):
+                        index.discard(ref[axis], ref)
+
+        for rng in self.range_precedents.pop(cell, ()):
+            dependents = self.range_dependents[rng]
+            dependents.discard(cell)
+            if not dependents:
+                del self.range_dependents[rng]
+                for column in range(rng.column1, rng.column2 + 1):
+                    column_ranges = self.ranges_by_column[column]
+                    column_ranges.discard(rng)
+                    if not column_ranges:
+                        del self.ranges_by_column[column]
+                for axis, index in enumerate(self.range_end_index):
+                    index.discard((rng.row2, rng.column2)[axis], rng)
+
+
+    def copy(self) -> 'DependencyGraph':
+        graph = DependencyGraph()
+        graph.precedents = {cell: set(refs) for cell, refs in self.precedents.items()}
+        graph.dependents = {cell: set(refs) for cell, refs in self.dependents.items()}
+        graph.range_precedents = {cell: set(ranges) for cell, ranges in self.range_precedents.items()}
+        graph.range_dependents = {rng: set(cells) for rng, cells in self.range_dependents.items()}
+        graph.ranges_by_column = {column: set(ranges) for column, ranges in self.ranges_by_column.items()}
+        graph.formula_index = tuple(index.copy() for index in self.formula_index)
+        graph.reference_index = tuple(index.copy() for index in self.reference_index)
+        graph.range_end_index = tuple(index.copy() for index in self.range_end_index)
+        return graph
+
+
+    def clear(self):
+        self.precedents.clear()
+        self.dependents.clear()
+        self.range_precedents.clear()
+        self.range_dependents.clear()
+        self.ranges_by_column.clear()
+        self.formula_index = (AxisIndex(), AxisIndex())
+        self.reference_index = (AxisIndex(), AxisIndex())
+        self.range_end_index = (AxisIndex(), AxisIndex())
+
+
+    def formulas_from(self, axis: int, index: int) -> Set[Coordinate]:
+        """Formula cells in the rows (axis 0) or columns (axis 1) from `index` on"""
+        return set(self.formula_index[axis].since(index))
+
+
+    def readers_from(self, axis: int, index: int) -> Set[Coordinate]:
+        """Formula cells that read a cell, or a range ending, in the rows/columns from `index` on"""
+        result = set()
+        for ref in self.reference_index[axis].since(index):
+            result.update(self.dependents[ref])
+        for rng in self.range_end_index[axis].since(index):
+            result.update(self.range_dependents[rng])
+        return result
+
+
+    def dependents_of(self, cell: Coordinate) -> Set[Coordinate]:
+        """Formula cells that read `cell`, directly or through a range"""
+        result = self.dependents.get(cell, set())
+        column_ranges = self.ranges_by_column.get(cell[1])
+        if column_ranges:
+            row = cell[0]
+            result = set(result)
+            for rng in column_ranges:
+                if rng.row1 <= row <= rng.row2:
+                    result.update(self.range_dependents[rng])
+        return result
+
+
+    def precedents_within(self, cell: Coordinate, cells: Set[Coordinate]) -> Set[Coordinate]:
+        """Precedents of `cell` (including the members of its ranges) that belong to `cells`"""
+        result = self.precedents.get(cell, set()) & cells
+        for rng in self.range_precedents.get(cell, ()):
+            result.update(other for other in cells if rng.contains(*other))
+        return result
+
+
+    def affected(self, changed: Iterable[Coordinate]) -> Set[Coordinate]:
+        """Formula cells among `changed` plus all of their transitive dependents"""
+        changed = list(changed)
+        result = {cell for cell in changed if cell in self.precedents}
+        queue = deque(changed)
+        seen = set(queue)
+        while queue:
+            for dependent in self.dependents_of(queue.popleft()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    result.add(dependent)
+                    queue.append(dependent)
+        return result
+
+
+    def evaluation_order(self, cells: Set[Coordinate]) -> Tuple[List[Coordinate], Set[Coordinate]]:
+        """
+        Topologically sort `cells` (Kahn's algorithm restricted to the subgraph).
+        Returns the order and the cells that could not be ordered because they
+        are on, or downstream of, a cycle.
+        """
+        levels, blocked = self.evaluation_levels(cells)
+        return [cell for level in levels for cell in level], blocked
+
+
+    def evaluation_levels(self, cells: Set[Coordinate]) -> Tuple[List[List[Coordinate]], Set[Coordinate]]:
+        """
+        Group `cells` into levels: every cell only depends on cells of earlier levels,
+        so the cells of one level can be evaluated independently of each other.
+        Also returns the cells blocked by a cycle.
+        """
+        dependents = {cell: [d for d in self.dependents_of(cell) if d in cells] for cell in cells}
+        in_degree = dict.fromkeys(cells, 0)
+        for targets in dependents.values():
+            for dependent in targets:
+                in_degree[dependent] += 1
+        level = [cell for cell, degree in in_degree.items() if degree == 0]
+        levels = []
+        while level:
+            levels.append(level)
+            next_level = []
+            for cell in level:
+                for dependent in dependents[cell]:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        next_level.append(dependent)
+            level = next_level
+        blocked = {cell for cell, degree in in_degree.items() if degree > 0}
+        return levels, blocked
+
+
+    def find_cycle(self, cells: Set[Coordinate]) -> Optional[List[Coordinate]]:
+        """Return one cycle among `cells` as a list of coordinates, if there is one"""
+        visiting: Dict[Coordinate, int] = {}
+        done: Set[Coordinate] = set()
+        for start in cells:
+            if start in done:
+                continue
+            path = [start]
+            visiting[start] = 0
+            stack = [iter(self.precedents_within(start, cells))]
+            while stack:
+                ref = next(stack[-1], None)
+                if ref is None:
+                    stack.pop()
+                    node = path.pop()
+                    del visiting[node]
+                    done.add(node)
+                    continue
+                if ref in visiting:
+                    cycle = path[visiting[ref]:] + [ref]
+                    cycle.reverse()
+                    return cycle
+                if ref in done:
+                    continue
+                visiting[ref] = len(path)
+                path.append(ref)
+                stack.append(iter(self.precedents_within(ref, cells)))
+        return None
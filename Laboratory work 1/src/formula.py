@@ -0,0 +1,473 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple, Union
+
+from models import CellReference, Grid
+
+
+@dataclass(frozen=True)
+class Number:
+    value: float
+
+
+@dataclass(frozen=True)
+class CellRef:
+    row: int
+    column: int
+
+
+@dataclass(frozen=True)
+class Range:
+    """Rectangular block of cells, normalized so that row1 <= row2 and column1 <= column2"""
+    row1: int
+    column1: int
+    row2: int
+    column2: int
+
+
+    def contains(self, row: int, column: int) -> bool:
+        return self.row1 <= row <= self.row2 and self.column1 <= column <= self.column2
+
+
+@dataclass(frozen=True)
+class RelativeRef:
+    """Reference relative to the cell holding the formula, written R[row_offset]C[column_offset]"""
+    row_offset: int
+    column_offset: int
+
+
+@dataclass(frozen=True)
+class RelativeRange:
+    """Range relative to the cell holding the formula, normalized like Range"""
+    row1: int
+    column1: int
+    row2: int
+    column2: int
+
+
+    def contains(self, row_offset: int, column_offset: int) -> bool:
+        return self.row1 <= row_offset <= self.row2 and self.column1 <= column_offset <= self.column2
+
+
+    def at(self, row: int, column: int) -> Range:
+        """The absolute range for a formula stored at (row, column)"""
+        return Range(row + self.row1, column + self.column1, row + self.row2, column + self.column2)
+
+
+@dataclass(frozen=True)
+class SheetRef:
+    """A cell or range on another sheet of the workbook, written Sheet!A1 or Sheet!A1:B10"""
+    sheet: str
+    ref: Union[CellRef, Range]
+
+
+@dataclass(frozen=True)
+class InvalidRef:
+    """A reference whose cells were deleted, written as #REF!"""
+
+
+@dataclass(frozen=True)
+class UnaryOp:
+    op: str
+    operand: 'Node'
+
+
+@dataclass(frozen=True)
+class BinaryOp:
+    op: str
+    left: 'Node'
+    right: 'Node'
+
+
+@dataclass(frozen=True)
+class FunctionCall:
+    name: str
+    args: Tuple['Node', ...]
+
+
+Node = Union[Number, CellRef, Range, RelativeRef, RelativeRange, SheetRef, InvalidRef, UnaryOp, BinaryOp, FunctionCall]
+
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+      | (?P<relative>R\[-?\d+\]C\[-?\d+\])
+      | (?P<sheet>[^\W\d]\w*!)
+      | (?P<name>[A-Za-z_]+\d*)
+      | (?P<invalid>\#REF!)
+      | (?P<op>\*\*|//|[-+*/^%(),:])
+    )""", re.VERBOSE)
+
+RELATIVE_PATTERN = re.compile(r"R\[(-?\d+)\]C\[(-?\d+)\]")
+# A1-style references inside formula text (not the exponent of a number such as 1e5).
+# References to other sheets match as a whole in the `sheet` group, so they stay absolute.
+A1_PATTERN = re.compile(r"(?P<sheet>[^\W\d]\w*![A-Za-z]+\d+(?::[A-Za-z]+\d+)?)"
+                        r"|(?<![\w.\]])([A-Za-z]+)(\d+)(?![\w(\[])")
+SHEET_NAME_PATTERN = re.compile(r"[^\W\d]\w*")
+
+# Symbolic spellings accepted for the word operators
+OPERATOR_ALIASES = {'^': '**', '%': 'mod', '//': 'div'}
+WORD_OPERATORS = {'mod', 'div'}
+FUNCTIONS = {'inc', 'dec'}
+AGGREGATES = {'sum', 'avg', 'min', 'max', 'count'}
+FUNCTION_ALIASES = {'average': 'avg'}
+
+
+def tokenize(formula: str) -> List[Tuple[str, str]]:
+    """Split a formula into (kind, text) tokens"""
+    tokens = []
+    pos = 0
+    formula = formula.rstrip()
+    while pos < len(formula):
+        match = TOKEN_PATTERN.match(formula, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Unexpected character '{formula[pos:].strip()[:1]}' in formula")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'name':
+            lowered = text.lower()
+            if lowered in WORD_OPERATORS:
+                kind, text = 'op', lowered
+            elif lowered in FUNCTIONS or lowered in AGGREGATES or lowered in FUNCTION_ALIASES:
+                kind, text = 'function', FUNCTION_ALIASES.get(lowered, lowered)
+            elif re.fullmatch(r'[A-Za-z]+\d+', text):
+                kind, text = 'ref', text.upper()
+            else:
+                raise ValueError(f"Unknown name '{text}' in formula")
+        elif kind == 'sheet':
+            text = text[:-1]
+        elif kind == 'op':
+            text = OPERATOR_ALIASES.get(text, text)
+        tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+
+class FormulaParser:
+    """Recursive descent parser producing an AST with Python operator precedence"""
+
+    ADDITIVE = {'+', '-'}
+    MULTIPLICATIVE = {'*', '/', 'mod', 'div'}
+
+    def __init__(self, formula: str):
+        self.tokens = tokenize(formula)
+        self.pos = 0
+
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise ValueError("Empty formula")
+        node = self._expression()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected token '{self.tokens[self.pos][1]}'")
+        return node
+
+
+    def _peek(self) -> Tuple[str, str]:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return ('end', '')
+
+
+    def _advance(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.pos += 1
+        return token
+
+
+    def _expect(self, text: str):
+        kind, value = self._advance()
+        if value != text:
+            raise ValueError(f"Expected '{text}' but found '{value or 'end of formula'}'")
+
+
+    def _expression(self) -> Node:
+        node = self._term()
+        while self._peek()[0] == 'op' and self._peek()[1] in self.ADDITIVE:
+            op = self._advance()[1]
+            node = BinaryOp(op, node, self._term())
+        return node
+
+
+    def _term(self) -> Node:
+        node = self._unary()
+        while self._peek()[0] == 'op' and self._peek()[1] in self.MULTIPLICATIVE:
+            op = self._advance()[1]
+            node = BinaryOp(op, node, self._unary())
+        return node
+
+
+    def _unary(self) -> Node:
+        if self._peek()[0] == 'op' and self._peek()[1] in self.ADDITIVE:
+            op = self._advance()[1]
+            return UnaryOp(op, self._unary())
+        return self._power()
+
+
+    def _power(self) -> Node:
+        node = self._primary()
+        if self._peek() == ('op', '**'):
+            self._advance()
+            # Right associative and binds tighter than a unary minus on its left
+            node = BinaryOp('**', node, self._unary())
+        return node
+
+
+    def _primary(self) -> Node:
+        kind, value = self._advance()
+        if kind == 'number':
+            return Number(float(value))
+        if kind == 'ref':
+            ref = CellReference.from_string(value)
+            return CellRef(ref.row, ref.column)
+        if kind == 'relative':
+            return RelativeRef(*_relative_offsets(value))
+        if kind == 'sheet':
+            ref_kind, ref = self._advance()
+            if ref_kind != 'ref':
+                raise ValueError(f"Expected a cell after '{value}!' but found '{ref or 'end of formula'}'")
+            ref = CellReference.from_string(ref)
+            return SheetRef(value, CellRef(ref.row, ref.column))
+        if kind == 'invalid':
+            return InvalidRef()
+        if kind == 'function':
+            self._expect('(')
+            args = [self._argument(value)]
+            while self._peek() == ('op', ','):
+                self._advance()
+                args.append(self._argument(value))
+            self._expect(')')
+            return FunctionCall(value, tuple(args))
+        if (kind, value) == ('op', '('):
+            node = self._expression()
+            self._expect(')')
+            return node
+        raise ValueError(f"Unexpected token '{value or 'end of formula'}'")
+
+
+    def _argument(self, function: str) -> Node:
+        """Parse a function argument; aggregates also accept A1:B10 and Sheet!A1:B10 ranges"""
+        kind, value = self._peek()
+        if kind == 'sheet' and self.tokens[self.pos + 2:self.pos + 3] == [('op', ':')]:
+            self.pos += 1
+            sheet_range = self._argument(function)
+            if not isinstance(sheet_range, Range):
+                raise ValueError(f"Invalid range on sheet '{value}'")
+            return SheetRef(value, sheet_range)
+        if kind in ('ref', 'relative') and self.tokens[self.pos + 1:self.pos + 2] == [('op', ':')]:
+            if function not in AGGREGATES:
+                raise ValueError(f"{function}() does not accept a range")
+            self.pos += 2
+            end_kind, end_value = self._advance()
+            if end_kind != kind:
+                raise ValueError(f"Invalid range end '{end_value or 'end of formula'}'")
+            if kind == 'relative':
+                (row1, column1), (row2, column2) = _relative_offsets(value), _relative_offsets(end_value)
+                return RelativeRange(min(row1, row2), min(column1, column2), max(row1, row2), max(column1, column2))
+            start, end = CellReference.from_string(value), CellReference.from_string(end_value)
+            return Range(min(start.row, end.row), min(start.column, end.column),
+                         max(start.row, end.row), max(start.column, end.column))
+        return self._expression()
+
+
+def _relative_offsets(text: str) -> Tuple[int, int]:
+    row_offset, column_offset = RELATIVE_PATTERN.fullmatch(text).groups()
+    return int(row_offset), int(column_offset)
+
+
+def parse_formula(formula: str) -> Node:
+    """Parse a formula (without the leading '=') into an AST"""
+    return FormulaParser(formula).parse()
+
+
+def iter_references(node: Node) -> Iterator[Union[CellRef, Range, RelativeRef, RelativeRange, SheetRef]]:
+    """Yield every cell and range reference used by the AST; references to other sheets are SheetRef"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (CellRef, Range, RelativeRef, RelativeRange, SheetRef)):
+            yield node
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, BinaryOp):
+            stack.append(node.right)
+            stack.append(node.left)
+        elif isinstance(node, FunctionCall):
+            stack.extend(reversed(node.args))
+
+
+# Binding strength of each operator, used to put back only the parentheses that are needed
+PRECEDENCE = {'+': 1, '-': 1, '*': 2, '/': 2, 'mod': 2, 'div': 2, '**': 4}
+UNARY_PRECEDENCE = 3
+OPERATOR_TEXT = {'**': '^', 'mod': ' mod ', 'div': ' div '}
+
+
+def relative_key(formula: str, row: int, column: int) -> str:
+    """
+    Normalize a formula stored at (row, column) to relative R1C1 form, e.g. A1*B1 in C1
+    becomes R[0]C[-2]*R[0]C[-1]. Copies of a formula filled down or across share this key.
+    """
+    def relative(match) -> str:
+        sheet, letters, digits = match.groups()
+        if sheet:
+            return sheet
+        return f"R[{int(digits) - 1 - row}]C[{_column_index(letters) - column}]"
+    return A1_PATTERN.sub(relative, formula)
+
+
+def absolute_formula(key: str, row: int, column: int) -> str:
+    """Inverse of relative_key: the A1-style text of a relative formula stored at (row, column)"""
+    def absolute(match) -> str:
+        target_row, target_column = row + int(match.group(1)), column + int(match.group(2))
+        if target_row < 0 or target_column < 0:
+            return "#REF!"
+        return _format_ref(target_row, target_column)
+    return RELATIVE_PATTERN.sub(absolute, key)
+
+
+def _precedence(node: Node) -> int:
+    if isinstance(node, BinaryOp):
+        return PRECEDENCE[node.op]
+    if isinstance(node, UnaryOp):
+        return UNARY_PRECEDENCE
+    return 5
+
+
+def _format_number(value: float) -> str:
+    if value.is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    return repr(value)
+
+
+@lru_cache(maxsize=1024)
+def _column_name(column: int) -> str:
+    return Grid.get_column_name(column + 1)
+
+
+@lru_cache(maxsize=1024)
+def _column_index(letters: str) -> int:
+    return CellReference.from_string(letters.upper() + "1").column
+
+
+def _format_ref(row: int, column: int) -> str:
+    return f"{_column_name(column)}{row + 1}"
+
+
+def format_formula(node: Node) -> str:
+    """Turn an AST back into formula text (without the leading '=')"""
+    if isinstance(node, Number):
+        return _format_number(node.value)
+    if isinstance(node, CellRef):
+        return _format_ref(node.row, node.column)
+    if isinstance(node, Range):
+        return f"{_format_ref(node.row1, node.column1)}:{_format_ref(node.row2, node.column2)}"
+    if isinstance(node, RelativeRef):
+        return f"R[{node.row_offset}]C[{node.column_offset}]"
+    if isinstance(node, RelativeRange):
+        return f"R[{node.row1}]C[{node.column1}]:R[{node.row2}]C[{node.column2}]"
+    if isinstance(node, SheetRef):
+        return f"{node.sheet}!{format_formula(node.ref)}"
+    if isinstance(node, InvalidRef):
+        return "#REF!"
+    if isinstance(node, UnaryOp):
+        operand = format_formula(node.operand)
+        if _precedence(node.operand) < UNARY_PRECEDENCE:
+            operand = f"({operand})"
+        return node.op + operand
+    if isinstance(node, BinaryOp):
+        precedence = PRECEDENCE[node.op]
+        left, right = format_formula(node.left), format_formula(node.right)
+        if node.op == '**':
+            # Right associative: (a^b)^c and (-a)^b need parentheses, a^-b does not
+            left_needs = _precedence(node.left) <= precedence
+            right_needs = _precedence(node.right) < UNARY_PRECEDENCE
+        else:
+            left_needs = _precedence(node.left) < precedence
+            right_needs = _precedence(node.right) <= precedence
+        if left_needs:
+            left = f"({left})"
+        if right_needs:
+            right = f"({right})"
+        text = OPERATOR_TEXT.get(node.op, f" {node.op} ")
+        return f"{left}{text}{right}"
+    if isinstance(node, FunctionCall):
+        name = node.name.upper() if node.name in AGGREGATES else node.name
+        return f"{name}({', '.join(format_formula(arg) for arg in node.args)})"
+    raise ValueError(f"Unsupported expression {node!r}")
+
+
+def shift_coordinate(value: int, index: int, delta: int) -> Optional[int]:
+    """New position of a row/column index after inserting (delta > 0) or deleting (delta < 0) at `index`"""
+    if value < index:
+        return value
+    if delta < 0 and value < index - delta:
+        return None
+    return value + delta
+
+
+def shift_references(node: Node, axis: int, index: int, delta: int,
+                     sheet: Optional[str] = None, local: bool = True) -> Node:
+    """
+    Rewrite references for `delta` rows (axis 0) or columns (axis 1) inserted at `index`,
+    or deleted starting at `index` when delta is negative. References to deleted cells
+    become #REF!; ranges grow, shrink or become #REF!. Unchanged subtrees are returned as-is.
+    Plain references are rewritten when `local` is set, Sheet!A1 references when they
+    point at `sheet`: use local=False to follow the rows or columns of another sheet.
+    """
+    if isinstance(node, SheetRef):
+        if node.sheet != sheet:
+            return node
+        ref = shift_references(node.ref, axis, index, delta)
+        if isinstance(ref, InvalidRef):
+            return ref
+        return node if ref is node.ref else SheetRef(node.sheet, ref)
+
+    if not local and isinstance(node, (CellRef, Range)):
+        return node
+
+    if isinstance(node, CellRef):
+        coords = [node.row, node.column]
+        shifted = shift_coordinate(coords[axis], index, delta)
+        if shifted is None:
+            return InvalidRef()
+        if shifted == coords[axis]:
+            return node
+        coords[axis] = shifted
+        return CellRef(*coords)
+
+    if isinstance(node, Range):
+        bounds = [[node.row1, node.row2], [node.column1, node.column2]]
+        low, high = bounds[axis]
+        if delta > 0:
+            new_low = low + delta if low >= index else low
+            new_high = high + delta if high >= index else high
+        else:
+            end = index - delta
+            new_low = low if low < index else (index if low < end else low + delta)
+            new_high = high if high < index else (index - 1 if high < end else high + delta)
+            if new_high < new_low:
+                return InvalidRef()
+        if (new_low, new_high) == (low, high):
+            return node
+        bounds[axis] = [new_low, new_high]
+        return Range(bounds[0][0], bounds[1][0], bounds[0][1], bounds[1][1])
+
+    if isinstance(node, UnaryOp):
+        operand = shift_references(node.operand, axis, index, delta, sheet, local)
+        return node if operand is node.operand else UnaryOp(node.op, operand)
+
+    if isinstance(node, BinaryOp):
+        left = shift_references(node.left, axis, index, delta, sheet, local)
+        right = shift_references(node.right, axis, index, delta, sheet, local)
+        if left is node.left and right is node.right:
+            return node
+        return BinaryOp(node.op, left, right)
+
+    if isinstance(node, FunctionCall):
+        args = tuple(shift_references(arg, axis, index, delta, sheet, local) for arg in node.args)
+        if all(new is old for new, old in zip(args, node.args)):
+            return node
+        return FunctionCall(node.name, args)
+
+    return node
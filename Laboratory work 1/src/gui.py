@@ -1,17 +1,48 @@
+import os
+import queue
 import tkinter as tk
+from typing import Callable, Optional
 from tkinter import ttk, messagebox, filedialog
 
 from models import Grid, Cell
-from storage import GridStorage
+from storage import GridStorage, CSV_EXTENSION
+from binary_storage import BinaryGridStorage, LazyGrid, BINARY_EXTENSION
 from calculator import FormulaCalculator
+from recalc import RecalcEngine, BackgroundRecalculator
+from lazy import LazyEvaluator
+from autosave import BackgroundSaver
+from workbook import Workbook, WorkbookStorage, WORKBOOK_EXTENSION
+
+
+# Names given to new sheets: Аркуш1, Аркуш2, ...
+SHEET_NAME_PREFIX = "Аркуш"
 
 
 class ExcelGUI:
-    def __init__(self, root: tk.Tk, grid: 'Grid', calculator: 'FormulaCalculator'):
+    def __init__(self, root: tk.Tk, grid: 'Grid', calculator: 'FormulaCalculator', lazy: bool = False):
         self.root = root
         self.grid = grid
         self.calculator = calculator
+        # Evaluated inline on the recalculation thread: no process pool is forked from a Tk process
+        self.recalc_engine = RecalcEngine(calculator, workers=1)
+        # Eager recalculation runs on a worker thread; finished cells are shown by _poll_recalculation
+        self.background = BackgroundRecalculator(self.recalc_engine)
+        # In lazy mode formulas are only computed when they scroll into view or are saved
+        self.lazy = LazyEvaluator(calculator) if lazy else None
+        self.background_loader = None
+        # Saves and the periodic autosave are written from snapshots on another worker thread
+        self.file_path = None
+        self.saver = BackgroundSaver(self.background)
+        self.saver.start_autosave(self._autosave_target)
+        # A failing autosave is reported once, until one succeeds again
+        self._autosave_failed = False
+        # Set when the table is a sheet of a workbook; edits of the shown sheet not yet
+        # carried to the other sheets are collected in _sheet_changes
+        self.workbook = None
+        self.sheet_name = None
+        self._sheet_changes = set()
         self.setup_ui()
+        self.root.after(50, self._poll_recalculation)
 
 
     def setup_ui(self):
@@ -35,8 +66,12 @@ class ExcelGUI:
             ("Відкрити", self.load_table),
             ("Додати рядок", self.add_row),
             ("Додати колонку", self.add_column),
+            ("Вставити рядок", self.insert_row),
+            ("Вставити колонку", self.insert_column),
             ("Видалити рядок", self.delete_row),
             ("Видалити колонку", self.delete_column),
+            ("Додати аркуш", self.add_sheet),
+            ("Профіль", self.show_profile),
             ("Довідка", self.show_help),
             ("Вийти", self.exit_app)
         ]
@@ -44,18 +79,22 @@ class ExcelGUI:
         for text, command in buttons:
             ttk.Button(toolbar, text=text, command=command).pack(side=tk.LEFT, padx=2)
 
+        # Shown only while a long recalculation is running
+        self.progress = ttk.Progressbar(toolbar, length=150, mode="determinate", maximum=100)
+        # Shown only for workbooks
+        self.sheet_selector = ttk.Combobox(toolbar, state="readonly", width=16)
+        self.sheet_selector.bind("<<ComboboxSelected>>", lambda event: self._show_sheet(self.sheet_selector.get()))
+
 
     def create_grid_frame(self):
-        """Create the scrollable frame for the grid"""
+        """Create the scrollable viewport for the grid"""
         self.grid_frame = ttk.Frame(self.main_frame)
         self.grid_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        # Create canvas and scrollbars
+        # The scrollbars move the viewport over the grid instead of scrolling the canvas
         self.canvas = tk.Canvas(self.grid_frame)
-        self.vsb = ttk.Scrollbar(self.grid_frame, orient="vertical", command=self.canvas.yview)
-        self.hsb = ttk.Scrollbar(self.grid_frame, orient="horizontal", command=self.canvas.xview)
-        
-        self.canvas.configure(yscrollcommand=self.vsb.set, xscrollcommand=self.hsb.set)
+        self.vsb = ttk.Scrollbar(self.grid_frame, orient="vertical", command=self._on_vertical_scroll)
+        self.hsb = ttk.Scrollbar(self.grid_frame, orient="horizontal", command=self._on_horizontal_scroll)
         self.table_frame = ttk.Frame(self.canvas)
         
         # Grid layout
@@ -64,89 +103,271 @@ class ExcelGUI:
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
         self.canvas.create_window((0, 0), window=self.table_frame, anchor="nw")
-        self.table_frame.bind("<Configure>", self._on_frame_configure)
         self.canvas.bind("<Configure>", self._on_canvas_configure)
+        self.canvas.bind_all("<MouseWheel>", self._on_mouse_wheel)
+        self.canvas.bind_all("<Shift-MouseWheel>", self._on_mouse_wheel)
+        self.canvas.bind_all("<Button-4>", self._on_mouse_wheel)
+        self.canvas.bind_all("<Button-5>", self._on_mouse_wheel)
+
+        # Viewport state: first visible cell, pool size and the pooled widgets
+        self.top_row = 0
+        self.left_col = 0
+        self.visible_rows = 0
+        self.visible_cols = 0
+        self.cell_widgets = []
+        self.row_labels = []
+        self.column_labels = []
+        self.editing_cell = None
+        self.selected_cell = None
+        self.cell_width, self.cell_height = self._measure_cell()
+
+
+    def _measure_cell(self):
+        """Pixel size of one Entry cell including its padding"""
+        probe = ttk.Entry(self.table_frame, width=10)
+        width, height = probe.winfo_reqwidth() + 2, probe.winfo_reqheight() + 2
+        probe.destroy()
+        return width, height
 
 
-    def _on_frame_configure(self, event=None):
-        """Reset the scroll region to encompass the inner frame"""
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def _on_canvas_configure(self, event):
+        """Resize the widget pool to fill the visible canvas area"""
+        self._resize_pool(event.width, event.height)
 
 
-    def _on_canvas_configure(self, event):
-        """Reset the canvas window to encompass inner frame when required"""
-        self.canvas.itemconfig("all", width=event.width)
+    def _resize_pool(self, width: int, height: int):
+        # One extra row and column of buffer so partially visible cells are drawn
+        rows = max(1, height // self.cell_height) + 1
+        cols = max(1, width // self.cell_width) + 1
+        if (rows, cols) != (self.visible_rows, self.visible_cols):
+            self.visible_rows, self.visible_cols = rows, cols
+            self.create_grid()
 
 
     def save_table(self):
         """Save the table data to a JSON file"""
         try:
             file_path = filedialog.asksaveasfilename(
-                defaultextension=".json",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+                defaultextension=WORKBOOK_EXTENSION if self.workbook is not None else ".json",
+                filetypes=[("JSON files", "*.json"), ("Binary tables", f"*{BINARY_EXTENSION}"),
+                           ("CSV files", f"*{CSV_EXTENSION}"), ("Workbooks", f"*{WORKBOOK_EXTENSION}"),
+                           ("All files", "*.*")]
             )
             
-            if file_path:
-                # Before saving, ensure all formulas are properly stored with their current values
-                formula_cells = {
-                    key: cell
-                    for key, cell in self.grid.cells.items()
-                    if cell.formula
-                }
-                
-                # Update values for formula cells
-                for key, cell in formula_cells.items():
-                    row, col = map(int, key.split(','))
-                    try:
-                        result = self.calculator.evaluate(cell.formula[1:], row, col)
-                        cell.value = result
-                    except Exception as e:
-                        print(f"Error evaluating formula at {key}: {str(e)}")
-                        cell.value = "ERROR"
-                
-                # Save the grid
-                GridStorage.save_to_json(file_path, self.grid)
-                messagebox.showinfo("Успіх", "Файл збережено!")
-                
+            if file_path and self.background_loader is not None:
+                messagebox.showwarning("Зачекайте", "Файл ще завантажується")
+            elif file_path and file_path.endswith(WORKBOOK_EXTENSION):
+                self._save_workbook(file_path)
+            elif file_path:
+                # Formula values are saved as cached by the last recalculation; in lazy mode
+                # the formulas never computed are computed first
+                if self.lazy is not None:
+                    with self.background.lock:
+                        self.lazy.ensure_all()
+                self.file_path = file_path
+
+                if isinstance(self.grid, LazyGrid) and \
+                        os.path.abspath(self.grid.source.path) == os.path.abspath(file_path):
+                    # Only the changed cells are appended to the journal, which is quick;
+                    # it is written once the running recalculation has stored its values
+                    self._after_recalculation(lambda: self._save_journal(file_path))
+                else:
+                    # Written from a snapshot on the saver thread; _poll_saves reports the result
+                    self.saver.save(self.grid, file_path)
+
         except Exception as e:
             messagebox.showerror("Помилка", f"Не вдалося зберегти файл: {str(e)}")
     
 
+    def _save_journal(self, file_path: str):
+        """Append the changed cells of a binary table to the journal of its file"""
+        try:
+            with self.background.lock:
+                BinaryGridStorage.save(file_path, self.grid)
+            self.saver.mark_saved()
+            messagebox.showinfo("Успіх", "Файл збережено!")
+        except Exception as e:
+            messagebox.showerror("Помилка", f"Не вдалося зберегти файл: {str(e)}")
+
+
+    def _save_workbook(self, file_path: str):
+        """
+        Save every sheet of the workbook; a single table becomes its first sheet. Sheets never
+        opened are copied from the old file, so the save is synchronous.
+        """
+        if self.workbook is None:
+            workbook = Workbook()
+            workbook.add_sheet(SHEET_NAME_PREFIX + "1", self.grid)
+            self._use_workbook(workbook, SHEET_NAME_PREFIX + "1")
+        self._propagate_sheet_changes(lambda: self._write_workbook(file_path))
+
+
+    def _write_workbook(self, file_path: str):
+        try:
+            with self.background.lock:
+                WorkbookStorage.save(file_path, self.workbook)
+            self.file_path = file_path
+            self.saver.mark_saved()
+            messagebox.showinfo("Успіх", "Файл збережено!")
+        except Exception as e:
+            messagebox.showerror("Помилка", f"Не вдалося зберегти файл: {str(e)}")
+
+
+    def _after_recalculation(self, action: Callable[[], None]):
+        """Run `action` once the background recalculation is idle, checking from the event loop instead of blocking it"""
+        if self.background.busy():
+            self.root.after(50, self._after_recalculation, action)
+        else:
+            action()
+
+
     def create_grid(self):
-        """Create the Excel-like grid"""
+        """Create the pool of widgets covering the viewport"""
+        self._commit_edit()
         # Clear existing grid
         for widget in self.table_frame.winfo_children():
             widget.destroy()
 
         # Create headers
         ttk.Label(self.table_frame, text="").grid(row=0, column=0)
-        for col in range(self.grid.columns):
-            ttk.Label(self.table_frame, text=self.grid.get_column_name(col + 1)).grid(row=0, column=col + 1)
+        self.column_labels = []
+        for j in range(self.visible_cols):
+            label = ttk.Label(self.table_frame)
+            label.grid(row=0, column=j + 1)
+            self.column_labels.append(label)
         
-        # Create cells
-        for row in range(self.grid.rows):
-            ttk.Label(self.table_frame, text=str(row + 1)).grid(row=row + 1, column=0)
-            for col in range(self.grid.columns):
+        # Create cells; each widget is rebound to a grid coordinate by its offset in the viewport
+        self.row_labels = []
+        self.cell_widgets = []
+        for i in range(self.visible_rows):
+            label = ttk.Label(self.table_frame)
+            label.grid(row=i + 1, column=0)
+            self.row_labels.append(label)
+            widgets = []
+            for j in range(self.visible_cols):
                 cell = ttk.Entry(self.table_frame, width=10)
-                cell.grid(row=row + 1, column=col + 1, padx=1, pady=1)
+                cell.grid(row=i + 1, column=j + 1, padx=1, pady=1)
                 
                 # Bind events for cell interaction
-                cell.bind('<FocusOut>', 
-                    lambda e, row=row, col=col: self._on_cell_changed(row, col))
+                cell.bind('<FocusOut>', lambda e: self._commit_edit())
                 cell.bind('<FocusIn>', 
-                    lambda e, row=row, col=col: self._on_cell_focused(row, col))
-                
-                # Populate existing values
-                existing_cell = self.grid.get_cell(row, col)
-                if existing_cell.value is not None:
-                    cell.insert(0, str(existing_cell.value))
+                    lambda e, i=i, j=j: self._on_cell_focused(self.top_row + i, self.left_col + j))
+                widgets.append(cell)
+            self.cell_widgets.append(widgets)
+
+        self._render_viewport()
+
+
+    def _render_viewport(self):
+        """Show the grid contents at the current scroll position in the pooled widgets"""
+        self.top_row = max(0, min(self.top_row, self.grid.rows - 1))
+        self.left_col = max(0, min(self.left_col, self.grid.columns - 1))
+        # Reads of a LazyGrid load blocks into it, so they are made under the lock like writes
+        with self.background.lock:
+            if self.lazy is not None:
+                self.lazy.ensure(self._visible_cells())
+            values = {(row, col): self.grid.get_value(row, col) for row, col in self._visible_cells()}
+
+        for j, label in enumerate(self.column_labels):
+            col = self.left_col + j
+            label.configure(text=self.grid.get_column_name(col + 1) if col < self.grid.columns else "")
+
+        for i, widgets in enumerate(self.cell_widgets):
+            row = self.top_row + i
+            self.row_labels[i].configure(text=str(row + 1) if row < self.grid.rows else "")
+            for j, widget in enumerate(widgets):
+                col = self.left_col + j
+                if row >= self.grid.rows or col >= self.grid.columns:
+                    widget.grid_remove()
+                    continue
+                widget.grid()
+                widget.delete(0, tk.END)
+                value = values.get((row, col))
+                if value is not None:
+                    widget.insert(0, str(value))
+
+        self._update_scrollbars()
+
+
+    def _update_scrollbars(self):
+        self.vsb.set(self.top_row / self.grid.rows,
+                     min(1.0, (self.top_row + self.visible_rows) / self.grid.rows))
+        self.hsb.set(self.left_col / self.grid.columns,
+                     min(1.0, (self.left_col + self.visible_cols) / self.grid.columns))
+
+
+    def _scroll_to(self, top_row: int, left_col: int):
+        """Move the viewport, finishing any edit in progress first"""
+        top_row = max(0, min(top_row, self.grid.rows - 1))
+        left_col = max(0, min(left_col, self.grid.columns - 1))
+        if (top_row, left_col) == (self.top_row, self.left_col):
+            return
+        self._commit_edit()
+        self.canvas.focus_set()
+        self.top_row, self.left_col = top_row, left_col
+        self._render_viewport()
+
+
+    def _scroll_command(self, start: int, visible: int, total: int, args) -> int:
+        """Translate a scrollbar command into the new first visible index"""
+        if args[0] == "moveto":
+            return int(float(args[1]) * total)
+        amount = int(args[1])
+        if args[2] == "pages":
+            amount *= max(1, visible - 1)
+        return start + amount
+
+
+    def _on_vertical_scroll(self, *args):
+        self._scroll_to(self._scroll_command(self.top_row, self.visible_rows, self.grid.rows, args), self.left_col)
+
+
+    def _on_horizontal_scroll(self, *args):
+        self._scroll_to(self.top_row, self._scroll_command(self.left_col, self.visible_cols, self.grid.columns, args))
+
+
+    def _on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            step = -3
+        else:
+            step = 3
+        if event.state & 0x0001:  # Shift scrolls horizontally
+            self._scroll_to(self.top_row, self.left_col + step)
+        else:
+            self._scroll_to(self.top_row + step, self.left_col)
+
+
+    def _widget_for(self, row: int, col: int):
+        """Return the pooled widget currently showing (row, col), or None if it is off-screen"""
+        i, j = row - self.top_row, col - self.left_col
+        if 0 <= i < len(self.cell_widgets) and 0 <= j < self.visible_cols:
+            return self.cell_widgets[i][j]
+        return None
+
+
+    def _visible_cells(self):
+        """Coordinates of the grid cells currently shown in the viewport"""
+        rows = range(self.top_row, min(self.top_row + self.visible_rows, self.grid.rows))
+        cols = range(self.left_col, min(self.left_col + self.visible_cols, self.grid.columns))
+        return [(row, col) for row in rows for col in cols]
+
+
+    def _commit_edit(self):
+        """Apply the text of the cell being edited before its widget is rebound"""
+        if self.editing_cell is not None:
+            row, col = self.editing_cell
+            self.editing_cell = None
+            self._on_cell_changed(row, col)
 
 
     def _on_cell_focused(self, row: int, col: int):
         """Handle cell focus event - show formula if exists"""
-        cell = self.grid.get_cell(row, col)
+        self.editing_cell = (row, col)
+        self.selected_cell = (row, col)
+        with self.background.lock:
+            cell = self.grid.get_cell(row, col)
         if cell.formula:
-            widget = self.table_frame.grid_slaves(row=row + 1, column=col + 1)[0]
+            widget = self._widget_for(row, col)
             widget.delete(0, tk.END)
             widget.insert(0, cell.formula)
             widget.select_range(0, tk.END)  # Select all text for easy editing
@@ -154,180 +375,422 @@ class ExcelGUI:
 
     def _on_cell_changed(self, row: int, col: int):
         """Handle cell value changes and formula evaluation"""
-        widget = self.table_frame.grid_slaves(row=row + 1, column=col + 1)[0]
+        widget = self._widget_for(row, col)
+        if widget is None:
+            return
         value = widget.get().strip()
         
         if not value:
-            self.grid.clear_cell(row, col)
+            with self.background.lock:
+                self.grid.clear_cell(row, col)
+                self.calculator.clear_formula(row, col)
+            self._mark_changed([(row, col)])
+            self._update_dependent_cells(row, col)
             return
             
         if value.startswith('='):
             try:
-                result = self.calculator.evaluate(value[1:], row, col)
-                self.grid.set_cell(row, col, Cell(value=result, formula=value))
-                
-                # Only update display if the cell is not focused
-                if widget != self.root.focus_get():
-                    widget.delete(0, tk.END)
-                    widget.insert(0, str(result))
+                with self.background.lock:
+                    self.calculator.set_formula(row, col, value)
             except Exception as e:
                 messagebox.showerror("Помилка формули", str(e))
                 widget.delete(0, tk.END)
                 widget.insert(0, "ERROR")
+                return
+            with self.background.lock:
+                self.grid.set_cell(row, col, Cell(formula=value))
         else:
-            try:
-                float_value = float(value)
-                self.grid.set_cell(row, col, Cell(value=float_value))
-            except ValueError:
-                self.grid.set_cell(row, col, Cell(value=value))
-
-        self._update_dependent_cells(row, col)
-
-
-    def _update_dependent_cells(self, changed_row: int, changed_col: int):
-        """Update all cells that depend on the changed cell"""
-        changed_ref = f"{self.grid.get_column_name(changed_col + 1)}{changed_row + 1}"
-        
-        for key, cell in self.grid.cells.items():
-            if cell.formula and changed_ref in cell.formula:
-                row, col = map(int, key.split(','))
-                widget = self.table_frame.grid_slaves(row=row + 1, column=col + 1)[0]
-                
-                # Skip updating display if cell is currently being edited
-                if widget == self.root.focus_get():
-                    continue
-                    
+            with self.background.lock:
+                self.calculator.clear_formula(row, col)
                 try:
-                    result = self.calculator.evaluate(cell.formula[1:], row, col)
-                    cell.value = result
-                    widget.delete(0, tk.END)
-                    widget.insert(0, str(result))
-                except Exception as e:
-                    print(f"Error evaluating formula at {row},{col}: {str(e)}")
-                    widget.delete(0, tk.END)
-                    widget.insert(0, "ERROR")
+                    float_value = float(value)
+                    self.grid.set_cell(row, col, Cell(value=float_value))
+                except ValueError:
+                    self.grid.set_cell(row, col, Cell(value=value))
+
+        self._mark_changed([(row, col)])
+        errors = self._update_dependent_cells(row, col)
+        if (row, col) in errors:
+            messagebox.showerror("Помилка формули", errors[(row, col)])
+
+
+    def _mark_changed(self, cells):
+        """Record edited cells for the autosave and for the sheets reading this one"""
+        self.saver.mark_changed()
+        if self.workbook is not None:
+            self._sheet_changes.update(cells)
+
+
+    def _propagate_sheet_changes(self, then: Optional[Callable[[], None]] = None):
+        """
+        Recalculate what the other sheets of the workbook compute from the edited cells of this one,
+        then run `then`. The values of this sheet must be final first, so while a background pass
+        is running the propagation is postponed until it finishes.
+        """
+        if self.workbook is not None and self._sheet_changes and self.background.busy():
+            self._after_recalculation(lambda: self._propagate_sheet_changes(then))
+            return
+        if self.workbook is not None:
+            if self.lazy is not None:
+                with self.background.lock:
+                    self.lazy.ensure_all()
+            if self._sheet_changes:
+                with self.background.lock:
+                    self.workbook.propagate(self.sheet_name, self._sheet_changes)
+                self._sheet_changes = set()
+        if then is not None:
+            then()
+
+
+    def _update_dependent_cells(self, changed_row: int, changed_col: int) -> dict:
+        """
+        Recalculate the changed cell and its transitive dependents in dependency order.
+        In eager mode this only queues the work; errors are reported when it finishes.
+        """
+        if self.lazy is not None:
+            # Only mark dependents stale; the ones on screen are computed right away
+            with self.background.lock:
+                self.lazy.invalidate([(changed_row, changed_col)])
+                updated, errors = self.lazy.ensure(self._visible_cells())
+            self._refresh_cells(updated)
+            return errors
+        self.background.request([(changed_row, changed_col)], focus=[(changed_row, changed_col)])
+        return {}
+
+
+    def _refresh_cells(self, cells):
+        """Show the current values of recalculated cells in their widgets; error values show their code"""
+        focused = self.root.focus_get()
+        shown = []
+        for row, col in cells:
+            widget = self._widget_for(row, col)
+            # Skip cells outside the viewport and the one being edited
+            if widget is not None and widget != focused:
+                shown.append((row, col, widget))
+        with self.background.lock:
+            values = [self.grid.get_value(row, col) for row, col, _ in shown]
+        for (row, col, widget), value in zip(shown, values):
+            widget.delete(0, tk.END)
+            if value is not None:
+                widget.insert(0, str(value))
 
 
     def _evaluate_all_formulas(self):
         """Evaluate all formulas in the grid"""
-        # First, collect all cells with formulas
-        formula_cells = [(int(row), int(col), cell) 
-                        for (row, col), cell in 
-                        ((tuple(map(int, key.split(','))), cell) 
-                         for key, cell in self.grid.cells.items())
-                        if cell.formula]
-        
-        # Then evaluate each formula and update the display
-        for row, col, cell in formula_cells:
+        if self.lazy is not None:
+            with self.background.lock:
+                self.lazy.reset()
+            self._render_viewport()
+            return
+        self.background.request_all(rebuild=True)
+
+
+    def _poll_recalculation(self, reschedule: bool = True):
+        """Show the cells finished by the background recalculation, a batch at a time"""
+        while True:
             try:
-                # Get the widget for this cell
-                widget = self.table_frame.grid_slaves(row=row + 1, column=col + 1)[0]
-                
-                # Evaluate the formula
-                result = self.calculator.evaluate(cell.formula[1:], row, col)
-                
-                # Update the cell value and display
-                cell.value = result
-                widget.delete(0, tk.END)
-                widget.insert(0, str(result))
-            except Exception as e:
-                print(f"Error evaluating formula at {row},{col}: {str(e)}")
-                widget.delete(0, tk.END)
-                widget.insert(0, "ERROR")
+                batch = self.background.results.get_nowait()
+            except queue.Empty:
+                break
+            if batch.job.cancelled.is_set():
+                continue  # superseded, a newer pass recalculates these cells
+            self._refresh_cells(batch.cells)
+            self._show_progress(batch.done, batch.total, batch.finished)
+            for cell in batch.job.focus:
+                if cell in batch.errors:
+                    messagebox.showerror("Помилка формули", batch.errors[cell])
+        self._poll_saves()
+        if reschedule:
+            self.root.after(50, self._poll_recalculation)
+
+
+    def _poll_saves(self):
+        """Report the saves finished by the saver thread"""
+        while True:
+            try:
+                result = self.saver.results.get_nowait()
+            except queue.Empty:
+                break
+            if result.autosave:
+                if result.error is None:
+                    self._autosave_failed = False
+                elif not self._autosave_failed:
+                    self._autosave_failed = True
+                    messagebox.showwarning("Автозбереження",
+                                           f"Не вдалося автоматично зберегти {result.path}: {str(result.error)}")
+            elif result.error is not None:
+                messagebox.showerror("Помилка", f"Не вдалося зберегти файл: {str(result.error)}")
+            else:
+                messagebox.showinfo("Успіх", "Файл збережено!")
+
+
+    def _autosave_target(self):
+        """
+        The grid to autosave and the path of its table. Binary tables are skipped, their
+        saves only append changed cells; so are workbooks and tables still loading in the background.
+        """
+        if self.background_loader is not None or isinstance(self.grid, LazyGrid) or self.workbook is not None:
+            return None
+        return self.grid, self.file_path
+
+
+    def _show_progress(self, done: int, total: int, finished: bool):
+        """Show the progress bar for passes that take more than a few batches"""
+        if finished or total < 4 * self.background.batch_size:
+            self.progress.pack_forget()
+            return
+        if not self.progress.winfo_ismapped():
+            self.progress.pack(side=tk.RIGHT, padx=2)
+        self.progress["value"] = 100 * done / total
 
 
     def load_table(self):
         """Load table data from a JSON file"""
         try:
             file_path = filedialog.askopenfilename(
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+                filetypes=[("JSON files", "*.json"), ("Binary tables", f"*{BINARY_EXTENSION}"),
+                           ("CSV files", f"*{CSV_EXTENSION}"), ("Workbooks", f"*{WORKBOOK_EXTENSION}"),
+                           ("All files", "*.*")]
             )
             
             if file_path:
-                new_grid = GridStorage.load_from_json(file_path)
-                self.grid.rows = new_grid.rows
-                self.grid.columns = new_grid.columns
-                self.grid.cells = new_grid.cells
+                self._commit_edit()
+                loader = None
+                workbook = None
+                if file_path.endswith(WORKBOOK_EXTENSION):
+                    # Only the first sheet is read; the others load when shown or read by a formula
+                    workbook = WorkbookStorage.open(file_path)
+                    new_grid = workbook.grid(workbook.names()[0])
+                elif file_path.endswith(BINARY_EXTENSION):
+                    new_grid = BinaryGridStorage.open(file_path)
+                elif file_path.endswith(CSV_EXTENSION):
+                    new_grid, report = GridStorage.import_csv(file_path)
+                else:
+                    # Read just enough rows to fill the viewport, the rest loads in the background
+                    # (files not written in row order are read at once)
+                    loader = GridStorage.open_json_streaming(file_path, stop_row=self.visible_rows)
+                    new_grid = loader.grid
+                self._set_grid(new_grid)
+                self._use_workbook(workbook, workbook.names()[0] if workbook is not None else None)
+                self.file_path = file_path
+                self.saver.mark_saved()
+                self.top_row = self.left_col = 0
                 
                 self.create_grid()
-                self._evaluate_all_formulas()
+                if loader is not None and not loader.done:
+                    self.background_loader = loader
+                    loader.load_rest_in_background(lock=self.background.lock)
+                    self.root.after(100, self._poll_background_load)
+                else:
+                    self._evaluate_all_formulas()
                 messagebox.showinfo("Успіх", "Файл завантажено!")
         except Exception as e:
             messagebox.showerror("Помилка", f"Не вдалося відкрити файл: {str(e)}")
 
 
+    def _poll_background_load(self):
+        """Finish a background load on the Tk thread once the loader thread is done"""
+        loader = self.background_loader
+        if loader is None or loader.grid is not self.grid:
+            return
+        if not loader.done:
+            self.root.after(100, self._poll_background_load)
+            return
+        self.background_loader = None
+        if loader.error is not None:
+            messagebox.showerror("Помилка", f"Не вдалося відкрити файл: {str(loader.error)}")
+        self._render_viewport()
+        self._evaluate_all_formulas()
+
+
+    def _set_grid(self, grid: Grid):
+        """Replace the displayed grid, e.g. after loading a table"""
+        self.background.reset()
+        self.progress.pack_forget()
+        if isinstance(self.grid, LazyGrid) and self.grid is not grid:
+            self.grid.close()
+        with self.background.lock:
+            self.grid = grid
+            self.calculator.grid = grid
+            # The formulas of the old grid; the new ones are registered by the next full pass
+            self.calculator.clear_dependencies()
+            if self.lazy is not None:
+                self.lazy.reset()
+
+
+    def _use_workbook(self, workbook, name):
+        """Show sheet `name` of `workbook`, or leave workbook mode when it is None"""
+        self.workbook = workbook
+        self.sheet_name = name
+        self._sheet_changes = set()
+        with self.background.lock:
+            if workbook is None:
+                self.calculator.workbook = self.calculator.sheet_name = None
+            else:
+                workbook.attach(name, self.calculator)
+        if workbook is None:
+            self.sheet_selector.pack_forget()
+            return
+        self.sheet_selector["values"] = workbook.names()
+        self.sheet_selector.set(name)
+        if not self.sheet_selector.winfo_ismapped():
+            self.sheet_selector.pack(side=tk.RIGHT, padx=2)
+
+
+    def _show_sheet(self, name: str):
+        """Switch to another sheet of the workbook, loading it if it was not read yet"""
+        if name == self.sheet_name:
+            return
+        self._commit_edit()
+        self._propagate_sheet_changes(lambda: self._switch_sheet(name))
+
+
+    def _switch_sheet(self, name: str):
+        if name == self.sheet_name:
+            return
+        self._set_grid(self.workbook.grid(name))
+        self._use_workbook(self.workbook, name)
+        self.top_row = self.left_col = 0
+        self.create_grid()
+        self._evaluate_all_formulas()
+
+
+    def add_sheet(self):
+        """Add an empty sheet and show it; a single table becomes the first sheet of a new workbook"""
+        self._commit_edit()
+        if self.workbook is None:
+            workbook = Workbook()
+            workbook.add_sheet(SHEET_NAME_PREFIX + "1", self.grid)
+            self._use_workbook(workbook, SHEET_NAME_PREFIX + "1")
+        number = len(self.workbook.names()) + 1
+        while SHEET_NAME_PREFIX + str(number) in self.workbook:
+            number += 1
+        self.workbook.add_sheet(SHEET_NAME_PREFIX + str(number))
+        self.saver.mark_changed()
+        self._show_sheet(SHEET_NAME_PREFIX + str(number))
+
+
     def add_row(self):
         """Add a new row to the grid"""
         self.grid.rows += 1
-        row = self.grid.rows - 1
-        
-        ttk.Label(self.table_frame, text=str(self.grid.rows)).grid(row=self.grid.rows, column=0)
-        for col in range(self.grid.columns):
-            cell = ttk.Entry(self.table_frame, width=10)
-            cell.grid(row=self.grid.rows, column=col + 1, padx=1, pady=1)
-            cell.bind('<FocusOut>', lambda e, r=row, c=col: self._on_cell_changed(r, c))
-        
-        self._on_frame_configure()
+        self.saver.mark_changed()
+        self._render_viewport()
 
 
     def add_column(self):
         """Add a new column to the grid"""
         self.grid.columns += 1
-        col = self.grid.columns - 1
-        
-        ttk.Label(self.table_frame, text=self.grid.get_column_name(self.grid.columns)).grid(
-            row=0, column=self.grid.columns)
-            
-        for row in range(self.grid.rows):
-            cell = ttk.Entry(self.table_frame, width=10)
-            cell.grid(row=row + 1, column=self.grid.columns, padx=1, pady=1)
-            cell.bind('<FocusOut>', lambda e, r=row, c=col: self._on_cell_changed(r, c))
-        
-        self._on_frame_configure()
+        self.saver.mark_changed()
+        self._render_viewport()
+
+
+    def insert_row(self):
+        """Insert an empty row above the selected cell"""
+        self._commit_edit()
+        row = self.selected_cell[0] if self.selected_cell else self.grid.rows
+        self._apply_shift(0, row, 1)
+
+
+    def insert_column(self):
+        """Insert an empty column left of the selected cell"""
+        self._commit_edit()
+        col = self.selected_cell[1] if self.selected_cell else self.grid.columns
+        self._apply_shift(1, col, 1)
 
 
     def delete_row(self):
-        """Delete the last row from the grid"""
+        """Delete the row of the selected cell (the last row if nothing is selected)"""
         if self.grid.rows > 1:
-            # Remove widgets in the last row
-            for widget in self.table_frame.grid_slaves(row=self.grid.rows):
-                widget.destroy()
-            
-            # Remove data for deleted row
-            keys_to_delete = [key for key in self.grid.cells.keys() 
-                            if int(key.split(',')[0]) == self.grid.rows - 1]
-            for key in keys_to_delete:
-                self.grid.clear_cell(*map(int, key.split(',')))
-            
-            self.grid.rows -= 1
-            self._on_frame_configure()
-            self._update_all_formulas()
+            self._commit_edit()
+            row = self.selected_cell[0] if self.selected_cell else self.grid.rows - 1
+            self._apply_shift(0, min(row, self.grid.rows - 1), -1)
 
 
     def delete_column(self):
-        """Delete the last column from the grid"""
+        """Delete the column of the selected cell (the last column if nothing is selected)"""
         if self.grid.columns > 1:
-            # Remove widgets in the last column
-            for widget in self.table_frame.grid_slaves(column=self.grid.columns):
-                widget.destroy()
-            
-            # Remove data for deleted column
-            keys_to_delete = [key for key in self.grid.cells.keys() 
-                            if int(key.split(',')[1]) == self.grid.columns - 1]
-            for key in keys_to_delete:
-                self.grid.clear_cell(*map(int, key.split(',')))
-            
-            self.grid.columns -= 1
-            self._on_frame_configure()
-            self._update_all_formulas()
-
-
-    def _update_all_formulas(self):
-        """Update all formula cells"""
-        for key, cell in list(self.grid.cells.items()):
-            if cell.formula:
-                row, col = map(int, key.split(','))
-                self._on_cell_changed(row, col)
+            self._commit_edit()
+            col = self.selected_cell[1] if self.selected_cell else self.grid.columns - 1
+            self._apply_shift(1, min(col, self.grid.columns - 1), -1)
+
+
+    def _apply_shift(self, axis: int, index: int, delta: int):
+        """
+        Insert (delta > 0) or delete rows (axis 0) or columns (axis 1) at `index`,
+        recalculate the rewritten formulas and redraw the moved cells
+        """
+        # In a workbook, references on the other sheets follow the shifted cells too
+        owner = self.workbook if self.workbook is not None else self.calculator
+        if axis == 0:
+            shift = owner.insert_rows if delta > 0 else owner.delete_rows
+        else:
+            shift = owner.insert_columns if delta > 0 else owner.delete_columns
+        arguments = (index, abs(delta)) if self.workbook is None else (self.sheet_name, index, abs(delta))
+        if self.lazy is not None:
+            with self.background.lock:
+                self.lazy.ensure_dependencies()
+                changed = self._recalculate_other_sheets(shift(*arguments))
+                self.lazy.shift(axis, index, delta)
+                self.lazy.invalidate(changed)
+        else:
+            # Queued and running passes hold coordinates from before the shift; they are moved
+            # with it instead of waited for
+            with self.background.lock:
+                changed = self._recalculate_other_sheets(shift(*arguments))
+                self.background.shift(axis, index, delta)
+            self.background.request(changed)
+        self.saver.mark_changed()
+        self._render_viewport()
+
+
+    def _recalculate_other_sheets(self, changed):
+        """
+        Given the formula cells rewritten by a shift, per sheet in a workbook, recalculate the ones
+        on other sheets and return those of the shown sheet, which the caller recalculates
+        """
+        if self.workbook is None:
+            return changed
+        for name, cells in changed.items():
+            if name != self.sheet_name:
+                self.workbook.recalculate(name, cells)
+        return changed.get(self.sheet_name, set())
+
+
+    def show_profile(self):
+        """Turn profiling on, or show the hottest cells recorded so far"""
+        if self.calculator.profiler is None:
+            self.calculator.enable_profiling()
+            messagebox.showinfo("Профілювання", "Профілювання увімкнено.\n"
+                                "Натисніть «Профіль» ще раз, щоб побачити найповільніші комірки.")
+            return
+        window = tk.Toplevel(self.root)
+        window.title("Профіль перерахунку")
+        text = tk.Text(window, width=110, height=30, font=("Courier", 10))
+        text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        def refresh():
+            profiler = self.calculator.profiler
+            text.configure(state=tk.NORMAL)
+            text.delete("1.0", tk.END)
+            if profiler is not None:
+                with self.background.lock:
+                    text.insert("1.0", profiler.report(30, self.grid))
+            text.configure(state=tk.DISABLED)
+
+        def reset():
+            if self.calculator.profiler is not None:
+                self.calculator.profiler.reset()
+            refresh()
+
+        def disable():
+            self.calculator.disable_profiling()
+            window.destroy()
+
+        buttons = ttk.Frame(window)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        for label, command in (("Оновити", refresh), ("Скинути", reset), ("Вимкнути", disable)):
+            ttk.Button(buttons, text=label, command=command).pack(side=tk.LEFT, padx=2)
+        refresh()
 
 
     def show_help(self):
@@ -342,6 +805,7 @@ class ExcelGUI:
    - div: цілочисельне ділення
    - inc(): збільшення на 1
    - dec(): зменшення на 1
+3. Агрегатні функції над діапазонами: SUM, AVG, MIN, MAX, COUNT
 
 Приклади формул:
 1. =A1 + B1
@@ -351,10 +815,14 @@ class ExcelGUI:
 5. =dec(B2)
 6. =inc(A1 + B1)
 7. =(A1 mod 3) + B1
+8. =SUM(A1:A100)
+9. =AVG(A1:B10, C1)
 
 Посилання на комірки:
 - Використовуйте літери для позначення стовпців та цифри для позначення рядків
 - Приклад: A1, B2, C3
+- Діапазон: A1:B10 (лише як аргумент агрегатної функції)
+- Комірка або діапазон іншого аркуша книги: Аркуш2!A1, SUM(Аркуш2!A1:A10)
 
 Богдан Кузнецов К-25"""
         messagebox.showinfo("Help", help_text)
@@ -365,5 +833,9 @@ class ExcelGUI:
         if messagebox.askyesno("Зберегти зміни?", "Бажаєте зберегти зміни перед виходом?"):
             self.save_table()
         if messagebox.askyesno("Підтвердити вихід", "Ви впевнені, що хочете вийти?"):
+            # Queued saves are finished before quitting
+            self.saver.shutdown()
+            self.background.shutdown()
+            self.recalc_engine.shutdown()
             self.root.quit()
             
\ No newline at end of file
@@ -0,0 +1,180 @@
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+from calculator import FormulaCalculator, CompiledFormula, to_number, error_message
+from dependencies import CircularReferenceError
+from formula import shift_coordinate
+from models import Grid, CellError, VALUE_ERROR, CYCLE_ERROR
+
+
+Coordinate = Tuple[int, int]
+
+_VISITING, _DONE = 1, 2
+
+
+class LazyEvaluator:
+    """
+    Demand-driven evaluation on top of FormulaCalculator: a formula is computed only
+    when its value is read (by the viewport, by save or by another formula) and the
+    result is memoized in the grid until one of its inputs changes.
+    Values stored in a loaded file are trusted, so opening a table evaluates nothing.
+    """
+
+    def __init__(self, calculator: FormulaCalculator):
+        self.calculator = calculator
+        self.stale: Set[Coordinate] = set()
+        self._dependencies_ready = False
+
+
+    @property
+    def grid(self) -> Grid:
+        return self.calculator.grid
+
+
+    def reset(self):
+        """Start over on a new grid: only formulas without a stored value are stale"""
+        self.stale = {(row, col) for row, col, cell in self.grid.iter_formula_cells() if cell.value is None}
+        self._dependencies_ready = False
+
+
+    def ensure_dependencies(self):
+        """Build the dependency graph, which is only needed once something changes"""
+        if not self._dependencies_ready:
+            self.calculator.rebuild_dependencies()
+            self._dependencies_ready = True
+
+
+    def invalidate(self, changed: Iterable[Coordinate]) -> Set[Coordinate]:
+        """Mark the changed formula cells and everything that depends on them as stale"""
+        self.ensure_dependencies()
+        affected = self.calculator.dependencies.affected(changed)
+        self.stale.update(affected)
+        return affected
+
+
+    def shift(self, axis: int, index: int, delta: int):
+        """Move the stale marks along with the cells after a row (axis 0) or column (axis 1) insert/delete"""
+        stale = set()
+        for cell in self.stale:
+            coordinate = shift_coordinate(cell[axis], index, delta)
+            if coordinate is not None:
+                stale.add((coordinate, cell[1]) if axis == 0 else (cell[0], coordinate))
+        self.stale = stale
+
+
+    def is_stale(self, row: int, col: int) -> bool:
+        return (row, col) in self.stale
+
+
+    def get_value(self, row: int, col: int):
+        """Return the value of a cell, computing it first if it is stale"""
+        self.ensure([(row, col)])
+        return self.grid.get_value(row, col)
+
+
+    def ensure_all(self) -> Tuple[List[Coordinate], Dict[Coordinate, str]]:
+        """Compute every stale formula, e.g. before saving"""
+        return self.ensure(list(self.stale))
+
+
+    def ensure(self, cells: Iterable[Coordinate]) -> Tuple[List[Coordinate], Dict[Coordinate, str]]:
+        """
+        Compute the stale cells among `cells` together with the stale cells they read,
+        precedents first. Returns the computed cells and the error message of each failure.
+        """
+        start = time.perf_counter()
+        compiled: Dict[Coordinate, CompiledFormula] = {}
+        order, blocked = self._plan(cells, compiled)
+        grid = self.grid
+        get = lambda row, col: to_number(grid.get_value(row, col), row, col)
+        profiler = self.calculator.profiler
+        evaluate = self.calculator.evaluate_compiled
+        if profiler is not None:
+            evaluate = profiler.timed(evaluate)
+        errors = {}
+        for row, col in order:
+            self.stale.discard((row, col))
+            if (row, col) in blocked:
+                grid.set_result(row, col, CellError(CYCLE_ERROR, blocked[(row, col)]))
+                errors[(row, col)] = blocked[(row, col)]
+                continue
+            formula = compiled.get((row, col))
+            if formula is None:
+                # Not a formula any more, or one that does not parse
+                text = grid.get_cell(row, col).formula
+                if text is None:
+                    continue
+                try:
+                    formula = self.calculator.template_for(text.strip()[1:], row, col)
+                except ValueError as e:
+                    grid.set_result(row, col, CellError(VALUE_ERROR, str(e)))
+                    errors[(row, col)] = str(e)
+                    continue
+            value = evaluate(formula, row, col, get, self.calculator.read_range)
+            grid.set_result(row, col, value)
+            message = error_message(value)
+            if message is not None:
+                errors[(row, col)] = message
+        if profiler is not None and order:
+            profiler.record_pass("lazy", len(order), time.perf_counter() - start)
+        return order, errors
+
+
+    def _plan(self, cells: Iterable[Coordinate],
+              compiled: Dict[Coordinate, CompiledFormula]) -> Tuple[List[Coordinate], Dict[Coordinate, str]]:
+        """
+        Depth-first post-order over stale precedents; cells on a cycle get its message.
+        The compiled formula of every visited cell is kept in `compiled` for evaluation.
+        """
+        stale = self.stale
+        state: Dict[Coordinate, int] = {}
+        order: List[Coordinate] = []
+        blocked: Dict[Coordinate, str] = {}
+        for start in cells:
+            if start not in stale or start in state:
+                continue
+            state[start] = _VISITING
+            path = [start]
+            stack = [iter(self._stale_precedents(start, compiled))]
+            while stack:
+                ref = next(stack[-1], None)
+                if ref is None:
+                    stack.pop()
+                    cell = path.pop()
+                    state[cell] = _DONE
+                    order.append(cell)
+                    continue
+                ref_state = state.get(ref)
+                if ref_state == _VISITING:
+                    cycle = path[path.index(ref):] + [ref]
+                    cycle.reverse()
+                    message = str(CircularReferenceError(cycle))
+                    for cell in cycle:
+                        blocked[cell] = message
+                elif ref_state is None:
+                    state[ref] = _VISITING
+                    path.append(ref)
+                    stack.append(iter(self._stale_precedents(ref, compiled)))
+        return order, blocked
+
+
+    def _stale_precedents(self, cell: Coordinate, compiled: Dict[Coordinate, CompiledFormula]) -> List[Coordinate]:
+        """Stale cells read by the formula at `cell`, directly or through its ranges"""
+        formula = self.grid.get_cell(*cell).formula
+        if formula is None:
+            return []
+        try:
+            formula = compiled[cell] = self.calculator.template_for(formula.strip()[1:], *cell)
+        except ValueError:
+            return []
+        stale = self.stale
+        references, ranges = formula.references_at(*cell)
+        result = [ref for ref in references if ref in stale]
+        for rng in ranges:
+            area = (rng.row2 - rng.row1 + 1) * (rng.column2 - rng.column1 + 1)
+            if area <= len(stale):
+                result.extend((row, col) for row in range(rng.row1, rng.row2 + 1)
+                              for col in range(rng.column1, rng.column2 + 1) if (row, col) in stale)
+            else:
+                result.extend(other for other in stale if rng.contains(*other))
+        return result
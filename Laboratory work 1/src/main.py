@@ -1,3 +1,4 @@
+import argparse
 import tkinter as tk
 
 from models import Grid
@@ -6,14 +7,25 @@ from gui import ExcelGUI
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Excel-like table editor")
+    parser.add_argument("--lazy", action="store_true",
+                        help="compute formulas only when they are shown or saved")
+    parser.add_argument("--profile", action="store_true",
+                        help="record formula evaluation times and print the hottest cells on exit")
+    args = parser.parse_args()
+
     root = tk.Tk()
     root.geometry("1200x800")
     
     grid = Grid()
     calculator = FormulaCalculator(grid)
-    gui = ExcelGUI(root, grid, calculator)
+    if args.profile:
+        calculator.enable_profiling()
+    gui = ExcelGUI(root, grid, calculator, lazy=args.lazy)
     
     root.mainloop()
+    if calculator.profiler is not None:
+        print(calculator.profiler.report(grid=gui.grid))
 
 if __name__ == "__main__":
     main()
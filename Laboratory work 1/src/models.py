@@ -1,6 +1,7 @@
 import re
 import string
-from typing import Dict, Any, Optional
+from bisect import bisect_right
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -8,6 +9,7 @@ from enum import Enum
 class OperatorType(Enum):
     BINARY = "binary"
     UNARY = "unary"
+    AGGREGATE = "aggregate"
 
 
 @dataclass
@@ -32,7 +34,59 @@ class CellReference:
         return CellReference(row=int(row_str) - 1, column=col - 1)
 
 
+REF_ERROR = "#REF!"
+DIV_ZERO_ERROR = "#DIV/0!"
+VALUE_ERROR = "#VALUE!"
+CYCLE_ERROR = "#CYCLE!"
+
+ERROR_MESSAGES = {
+    REF_ERROR: "Invalid cell reference: the referenced cells were deleted",
+    DIV_ZERO_ERROR: "Division by zero",
+    VALUE_ERROR: "Invalid value",
+    CYCLE_ERROR: "Circular reference detected",
+}
+
+
+class CellError:
+    """
+    Error value of a formula. It is stored and cached like any other result, and a formula
+    that reads it returns it unchanged, so a broken input costs its dependents no exceptions.
+    `code` is what the cell shows, `message` says what went wrong where.
+    """
+    __slots__ = ('code', 'message')
+
+    def __init__(self, code: str, message: Optional[str] = None):
+        self.code = code
+        self.message = message or ERROR_MESSAGES[code]
+
+
+    @staticmethod
+    def restore(value: Any) -> Any:
+        """Turn an error code read back from a file into a CellError; other values are returned as-is"""
+        if value.__class__ is str and value in ERROR_MESSAGES:
+            return CellError(value)
+        return value
+
+
+    def __str__(self) -> str:
+        return self.code
+
+
+    def __repr__(self) -> str:
+        return f"CellError({self.code!r}, {self.message!r})"
+
+
+    def __eq__(self, other) -> bool:
+        return other.__class__ is CellError and other.code == self.code and other.message == self.message
+
+
+    def __hash__(self) -> int:
+        return hash((self.code, self.message))
+
+
 class Cell:
+    __slots__ = ('value', 'formula')
+
     def __init__(self, value: Any = None, formula: Optional[str] = None):
         self.value = value
         self.formula = formula
@@ -42,27 +96,467 @@ class Cell:
         return self.formula is not None
 
 
+class _EmptyCell(Cell):
+    """Shared immutable cell returned for every empty coordinate"""
+    __slots__ = ()
+
+    def __init__(self):
+        object.__setattr__(self, 'value', None)
+        object.__setattr__(self, 'formula', None)
+
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The empty cell is immutable, use Grid.set_cell instead")
+
+
+EMPTY_CELL = _EmptyCell()
+
+# A grid whose offset maps grow past this many segments stores its cells under their coordinates again
+MAX_OFFSET_SEGMENTS = 256
+
+
+class _OffsetMap:
+    """
+    Where the rows (or columns) of a grid are stored after inserts and deletes.
+    Sheet index i is stored under key i - shifts[s], s being the last segment with
+    starts[s] <= i, so an insert or delete only edits the segments after it and the
+    stored cells keep their keys. Inserted rows get fresh (negative) keys.
+    """
+
+    def __init__(self):
+        self.starts = [0]
+        self.shifts = [0]
+        self.fresh = 0
+        self._inverse: Optional[Tuple[List[int], List[int]]] = None
+
+
+    def key(self, index: int) -> int:
+        return index - self.shifts[bisect_right(self.starts, index) - 1]
+
+
+    def index(self, key: int) -> int:
+        """The sheet index stored under `key`"""
+        if self._inverse is None:
+            segments = sorted(zip((start - shift for start, shift in zip(self.starts, self.shifts)), self.shifts))
+            self._inverse = [first for first, _ in segments], [shift for _, shift in segments]
+        firsts, shifts = self._inverse
+        return key + shifts[bisect_right(firsts, key) - 1]
+
+
+    def intervals(self, start: int, end: int) -> List[range]:
+        """The keys of sheet indexes start..end-1, as ranges in sheet order"""
+        starts, shifts = self.starts, self.shifts
+        result = []
+        segment = bisect_right(starts, start) - 1
+        while start < end:
+            stop = min(end, starts[segment + 1]) if segment + 1 < len(starts) else end
+            result.append(range(start - shifts[segment], stop - shifts[segment]))
+            start = stop
+            segment += 1
+        return result
+
+
+    def insert(self, index: int, count: int):
+        segment = self._split(index)
+        for i in range(segment, len(self.starts)):
+            self.starts[i] += count
+            self.shifts[i] += count
+        self.fresh -= count
+        self.starts.insert(segment, index)
+        self.shifts.insert(segment, index - self.fresh)
+        self._merge()
+
+
+    def delete(self, index: int, count: int) -> List[range]:
+        """Drop sheet indexes index..index+count-1; returns the keys they were stored under"""
+        removed = self.intervals(index, index + count)
+        first, last = self._split(index), self._split(index + count)
+        del self.starts[first:last]
+        del self.shifts[first:last]
+        for i in range(first, len(self.starts)):
+            self.starts[i] -= count
+            self.shifts[i] -= count
+        self._merge()
+        return removed
+
+
+    def is_identity(self) -> bool:
+        return self.shifts == [0]
+
+
+    def copy(self) -> '_OffsetMap':
+        copy = _OffsetMap()
+        copy.starts, copy.shifts, copy.fresh = list(self.starts), list(self.shifts), self.fresh
+        return copy
+
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+    def _split(self, index: int) -> int:
+        """Make `index` the start of a segment and return that segment"""
+        segment = bisect_right(self.starts, index) - 1
+        if self.starts[segment] == index:
+            return segment
+        self.starts.insert(segment + 1, index)
+        self.shifts.insert(segment + 1, self.shifts[segment])
+        return segment + 1
+
+
+    def _merge(self):
+        """Join neighbouring segments that store their indexes one after another"""
+        starts, shifts = [self.starts[0]], [self.shifts[0]]
+        for start, shift in zip(self.starts[1:], self.shifts[1:]):
+            if shift != shifts[-1]:
+                starts.append(start)
+                shifts.append(shift)
+        self.starts, self.shifts = starts, shifts
+        self._inverse = None
+
+
 class Grid:
+    """
+    Sparse cell store: one dict of columns per non-empty row.
+    Plain values are stored as-is; only formula cells keep a Cell object,
+    because their computed value is updated in place on recalculation.
+    Inserting or deleting rows/columns only records the offsets in a map per axis:
+    the stored cells keep their keys, so an edit costs nothing per cell that moves.
+    """
+
     def __init__(self, rows: int = 10, columns: int = 10):
         self.rows = rows
         self.columns = columns
-        self.cells: Dict[str, Cell] = {}
+        self._rows: Dict[int, Dict[int, Any]] = {}
+        # ids of the row dicts shared with live snapshots; such a row is copied before it changes
+        self._shared: Optional[Set[int]] = None
+        self._snapshots = 0
+        # Row/column number -> stored key; None while they are the same
+        self._row_map: Optional[_OffsetMap] = None
+        self._column_map: Optional[_OffsetMap] = None
 
 
     def get_cell(self, row: int, column: int) -> Cell:
-        key = f"{row},{column}"
-        return self.cells.get(key, Cell())
+        """Return the cell at (row, column); plain values are wrapped in a new read-only view"""
+        if self._row_map is not None:
+            row = self._row_map.key(row)
+        row_cells = self._rows.get(row)
+        if row_cells is None:
+            return EMPTY_CELL
+        if self._column_map is not None:
+            column = self._column_map.key(column)
+        item = row_cells.get(column, EMPTY_CELL)
+        if item.__class__ is Cell or item is EMPTY_CELL:
+            return item
+        return Cell(value=item)
+
+
+    def get_value(self, row: int, column: int) -> Any:
+        """Return the value at (row, column) without allocating a Cell"""
+        if self._row_map is not None:
+            row = self._row_map.key(row)
+        row_cells = self._rows.get(row)
+        if row_cells is None:
+            return None
+        if self._column_map is not None:
+            column = self._column_map.key(column)
+        item = row_cells.get(column)
+        if item.__class__ is Cell:
+            return item.value
+        return item
 
 
     def set_cell(self, row: int, column: int, cell: Cell):
-        key = f"{row},{column}"
-        self.cells[key] = cell
+        if cell.formula is None:
+            self.set_value(row, column, cell.value)
+            return
+        self._writable_row(self._row_key(row))[self._column_key(column)] = cell
+
+
+    def set_value(self, row: int, column: int, value: Any):
+        """Store a plain value (no formula) at (row, column)"""
+        if value is None:
+            self.clear_cell(row, column)
+        else:
+            self._writable_row(self._row_key(row))[self._column_key(column)] = value
+
+
+    def set_result(self, row: int, column: int, value: Any):
+        """Store the computed value of the formula cell at (row, column)"""
+        row, column = self._row_key(row), self._column_key(column)
+        row_cells = self._rows.get(row)
+        item = row_cells.get(column) if row_cells is not None else None
+        if item.__class__ is Cell:
+            if self._shared is not None and id(row_cells) in self._shared:
+                item = self._unshare(row)[column]
+            item.value = value
 
 
     def clear_cell(self, row: int, column: int):
-        key = f"{row},{column}"
-        if key in self.cells:
-            del self.cells[key]
+        self._clear_stored(self._row_key(row), self._column_key(column))
+
+
+    def clear_row(self, row: int):
+        self._rows.pop(self._row_key(row), None)
+
+
+    def clear_column(self, column: int):
+        column = self._column_key(column)
+        for row in [row for row, row_cells in self._rows.items() if column in row_cells]:
+            self._clear_stored(row, column)
+
+
+    def clear(self):
+        self._rows.clear()
+        self._row_map = self._column_map = None
+
+
+    def insert_rows(self, index: int, count: int = 1):
+        """Insert empty rows before `index`; only the row offsets change, no stored row moves"""
+        if self._row_map is None:
+            self._row_map = _OffsetMap()
+        self._row_map.insert(index, count)
+        self.rows += count
+        self._check_maps()
+
+
+    def delete_rows(self, index: int, count: int = 1):
+        """Delete rows index..index+count-1; the rows below them keep their stored keys"""
+        if self._row_map is None:
+            self._row_map = _OffsetMap()
+        rows = self._rows
+        for keys in self._row_map.delete(index, count):
+            for key in (keys if len(keys) <= len(rows) else [key for key in rows if key in keys]):
+                rows.pop(key, None)
+        self.rows = max(self.rows - count, 0)
+        self._check_maps()
+
+
+    def insert_columns(self, index: int, count: int = 1):
+        """Insert empty columns before `index`; only the column offsets change, no stored cell moves"""
+        if self._column_map is None:
+            self._column_map = _OffsetMap()
+        self._column_map.insert(index, count)
+        self.columns += count
+        self._check_maps()
+
+
+    def delete_columns(self, index: int, count: int = 1):
+        """Delete columns index..index+count-1; each row is looked up once to drop their cells, none moves"""
+        if self._column_map is None:
+            self._column_map = _OffsetMap()
+        removed = self._column_map.delete(index, count)
+        in_removed = _membership(removed)
+        for row in list(self._rows):
+            row_cells = self._rows[row]
+            if count <= len(row_cells):
+                keys = [key for keys in removed for key in keys if key in row_cells]
+            else:
+                keys = [key for key in row_cells if in_removed(key)]
+            if keys:
+                row_cells = self._writable_row(row)
+                for key in keys:
+                    del row_cells[key]
+                if not row_cells:
+                    del self._rows[row]
+        self.columns = max(self.columns - count, 0)
+        self._check_maps()
+
+
+    def range_values(self, row1: int, column1: int, row2: int, column2: int) -> List[Any]:
+        """Return the non-empty values inside a block, visiting only stored cells"""
+        rows = self._rows
+        row_keys = self._keys(self._row_map, row1, row2)
+        if row2 - row1 + 1 <= len(rows):
+            row_dicts = [row_cells for keys in row_keys for row_cells in map(rows.get, keys) if row_cells]
+        else:
+            in_rows = _membership(row_keys)
+            row_dicts = [row_cells for row, row_cells in rows.items() if in_rows(row)]
+
+        if column1 == column2:
+            column = self._column_key(column1)
+            items = [row_cells[column] for row_cells in row_dicts if column in row_cells]
+        else:
+            column_keys = self._keys(self._column_map, column1, column2)
+            in_columns = _membership(column_keys)
+            width = column2 - column1 + 1
+            items = []
+            for row_cells in row_dicts:
+                if width <= len(row_cells):
+                    items.extend(row_cells[column] for keys in column_keys for column in keys if column in row_cells)
+                else:
+                    items.extend(item for column, item in row_cells.items() if in_columns(column))
+
+        return [item.value if item.__class__ is Cell else item for item in items
+                if item.__class__ is not Cell or item.value is not None]
+
+
+    def column_values(self, rows: List[int], column: int) -> List[Any]:
+        """Return the values of one column at the given rows (None for empty cells)"""
+        get_row = self._rows.get
+        column = self._column_key(column)
+        values = []
+        append = values.append
+        for row in (rows if self._row_map is None else map(self._row_map.key, rows)):
+            row_cells = get_row(row)
+            item = row_cells.get(column) if row_cells is not None else None
+            append(item.value if item.__class__ is Cell else item)
+        return values
+
+
+    def iter_cells(self, ordered: bool = False) -> Iterator[Tuple[int, int, Cell]]:
+        """Yield (row, column, cell) for every non-empty cell, optionally in row/column order"""
+        rows = self._sheet_rows()
+        for row in (sorted(rows) if ordered else list(rows)):
+            row_cells = rows[row]
+            for column in (sorted(row_cells) if ordered else list(row_cells)):
+                item = row_cells[column]
+                yield row, column, item if item.__class__ is Cell else Cell(value=item)
+
+
+    def iter_rows(self) -> Iterator[Tuple[int, Dict[int, Any]]]:
+        """Yield (row, {column: value}) for every non-empty row in order; formula cells give their computed value"""
+        rows = self._sheet_rows()
+        for row in sorted(rows):
+            yield row, {column: item.value if item.__class__ is Cell else item
+                        for column, item in rows[row].items()}
+
+
+    def iter_formula_cells(self) -> Iterator[Tuple[int, int, Cell]]:
+        """Yield (row, column, cell) for every cell holding a formula"""
+        for row, row_cells in self._sheet_rows().items():
+            for column, item in row_cells.items():
+                if item.__class__ is Cell:
+                    yield row, column, item
+
+
+    def __len__(self) -> int:
+        return sum(len(row_cells) for row_cells in self._rows.values())
+
+
+    def snapshot(self) -> 'Grid':
+        """
+        A read-only copy of the grid as it is now, e.g. to save it on another thread.
+        It shares the row dicts with the grid, which copies a row (cells included) the
+        first time it changes it afterwards. Costs O(rows): take it under the lock that
+        guards writes, and call release_snapshot() once the copy is no longer used.
+        """
+        snapshot = Grid(self.rows, self.columns)
+        snapshot._rows = dict(self._rows)
+        snapshot._row_map = self._row_map.copy() if self._row_map is not None else None
+        snapshot._column_map = self._column_map.copy() if self._column_map is not None else None
+        shared = {id(row_cells) for row_cells in self._rows.values()}
+        self._shared = shared if self._shared is None else self._shared | shared
+        self._snapshots += 1
+        return snapshot
+
+
+    def release_snapshot(self):
+        self._snapshots = max(self._snapshots - 1, 0)
+        if not self._snapshots:
+            self._shared = None
+
+
+    def _writable_row(self, row: int) -> Dict[int, Any]:
+        """The dict of a row (by stored key), created if missing and copied first if a snapshot shares it"""
+        row_cells = self._rows.get(row)
+        if row_cells is None:
+            row_cells = self._rows[row] = {}
+        elif self._shared is not None and id(row_cells) in self._shared:
+            row_cells = self._unshare(row)
+        return row_cells
+
+
+    def _unshare(self, row: int) -> Dict[int, Any]:
+        row_cells = self._rows[row] = {column: Cell(value=item.value, formula=item.formula)
+                                       if item.__class__ is Cell else item
+                                       for column, item in self._rows[row].items()}
+        return row_cells
+
+
+    def _clear_stored(self, row: int, column: int):
+        row_cells = self._rows.get(row)
+        if row_cells is not None and column in row_cells:
+            if self._shared is not None and id(row_cells) in self._shared:
+                row_cells = self._unshare(row)
+            del row_cells[column]
+            if not row_cells:
+                del self._rows[row]
+
+
+    def _row_key(self, row: int) -> int:
+        return row if self._row_map is None else self._row_map.key(row)
+
+
+    def _column_key(self, column: int) -> int:
+        return column if self._column_map is None else self._column_map.key(column)
+
+
+    @staticmethod
+    def _keys(offsets: Optional[_OffsetMap], first: int, last: int) -> List[range]:
+        """Stored keys of the rows/columns first..last"""
+        if offsets is None:
+            return [range(first, last + 1)]
+        return offsets.intervals(first, last + 1)
+
+
+    def _check_maps(self):
+        """Drop an offset map that is back to no offsets; rekey once a map is too fragmented"""
+        if self._row_map is not None and self._row_map.is_identity():
+            self._row_map = None
+        if self._column_map is not None and self._column_map.is_identity():
+            self._column_map = None
+        if max(len(self._row_map or ()), len(self._column_map or ())) > MAX_OFFSET_SEGMENTS:
+            self._rekey()
+
+
+    def _rekey(self):
+        """Store every cell under its row and column number again and drop the offset maps (O(cells))"""
+        if self._row_map is None and self._column_map is None:
+            return
+        shared = self._shared or ()
+        rows = {}
+        for row, row_cells in self._sheet_rows().items():
+            if self._column_map is not None:
+                # A new dict: cells of a row shared with a snapshot are copied as _unshare would
+                if id(self._rows[self._row_key(row)]) in shared:
+                    row_cells = {column: Cell(value=item.value, formula=item.formula) if item.__class__ is Cell
+                                 else item for column, item in row_cells.items()}
+            rows[row] = row_cells
+        self._rows = rows
+        self._row_map = self._column_map = None
+
+
+    def fork(self) -> 'ForkedGrid':
+        """An O(1) copy-on-write fork that shares every cell with this grid"""
+        return ForkedGrid(self)
+
+
+    def _sheet_rows(self) -> Dict[int, Dict[int, Any]]:
+        """The stored rows keyed by row and column number (the stored dicts while there are no offsets); must not be modified"""
+        if self._row_map is None and self._column_map is None:
+            return self._rows
+        row_index = self._row_map.index if self._row_map is not None else None
+        column_index = self._column_map.index if self._column_map is not None else None
+        return {row_index(key) if row_index else key:
+                {column_index(column): item for column, item in row_cells.items()} if column_index else row_cells
+                for key, row_cells in self._rows.items()}
+
+
+    def _row_items(self, row: int) -> Dict[int, Any]:
+        """The stored items of a row (plain values and formula Cells); must not be modified"""
+        row_cells = self._rows.get(self._row_key(row)) or {}
+        if self._column_map is not None and row_cells:
+            index = self._column_map.index
+            return {index(column): item for column, item in row_cells.items()}
+        return row_cells
+
+
+    def _row_numbers(self) -> Iterable[int]:
+        """Numbers of the rows that may hold cells"""
+        if self._row_map is not None:
+            return [self._row_map.index(key) for key in self._rows]
+        return self._rows.keys()
 
 
     @staticmethod
@@ -73,4 +567,227 @@ class Grid:
             result = string.ascii_uppercase[col_index % 26] + result
             col_index //= 26
         return result
-    
\ No newline at end of file
+
+
+def _membership(key_ranges: List[range]) -> Callable[[int], bool]:
+    """Test for a key in any of `key_ranges`"""
+    if len(key_ranges) == 1:
+        return key_ranges[0].__contains__
+    return lambda key: any(key in keys for keys in key_ranges)
+
+
+# Marks a cell that was cleared in a fork but still exists in its base
+_REMOVED = object()
+
+
+class ForkedGrid(Grid):
+    """
+    Copy-on-write fork of a Grid. Every cell is shared with `base`; `_rows` holds only
+    the cells changed in the fork (including recalculated formula values), so forking
+    is O(1) and a fork costs memory in proportion to what it changes.
+    Forks can be changed and recalculated independently, from different threads too,
+    as long as the base itself is left unchanged while they are in use.
+    A fork keeps its own cells under their row and column numbers (no offset maps).
+    """
+
+    def __init__(self, base: Grid):
+        super().__init__(rows=base.rows, columns=base.columns)
+        self.base = base
+
+
+    def get_cell(self, row: int, column: int) -> Cell:
+        changes = self._rows.get(row)
+        if changes is None or column not in changes:
+            return self.base.get_cell(row, column)
+        item = changes[column]
+        if item is _REMOVED:
+            return EMPTY_CELL
+        return item if item.__class__ is Cell else Cell(value=item)
+
+
+    def get_value(self, row: int, column: int) -> Any:
+        changes = self._rows.get(row)
+        if changes is None or column not in changes:
+            return self.base.get_value(row, column)
+        item = changes[column]
+        if item is _REMOVED:
+            return None
+        return item.value if item.__class__ is Cell else item
+
+
+    def set_result(self, row: int, column: int, value: Any):
+        changes = self._rows.get(row)
+        item = changes.get(column) if changes is not None else None
+        if item.__class__ is Cell:
+            item.value = value
+        elif item is None:
+            # The formula is still the base's Cell: give the fork its own copy
+            formula = self.base.get_cell(row, column).formula
+            if formula is not None:
+                self._rows.setdefault(row, {})[column] = Cell(value=value, formula=formula)
+
+
+    def clear_cell(self, row: int, column: int):
+        if self.base.get_cell(row, column) is EMPTY_CELL:
+            super().clear_cell(row, column)
+        else:
+            self._rows.setdefault(row, {})[column] = _REMOVED
+
+
+    def clear_row(self, row: int):
+        changes = {column: _REMOVED for column in self.base._row_items(row)}
+        if changes:
+            self._rows[row] = changes
+        else:
+            self._rows.pop(row, None)
+
+
+    def clear_column(self, column: int):
+        for row in list(self._row_numbers()):
+            self.clear_cell(row, column)
+
+
+    def clear(self):
+        self.base = Grid(self.rows, self.columns)
+        self._rows.clear()
+
+
+    def insert_rows(self, index: int, count: int = 1):
+        self.detach()
+        super().insert_rows(index, count)
+        self._rekey()
+
+
+    def delete_rows(self, index: int, count: int = 1):
+        self.detach()
+        super().delete_rows(index, count)
+        self._rekey()
+
+
+    def insert_columns(self, index: int, count: int = 1):
+        self.detach()
+        super().insert_columns(index, count)
+        self._rekey()
+
+
+    def delete_columns(self, index: int, count: int = 1):
+        self.detach()
+        super().delete_columns(index, count)
+        self._rekey()
+
+
+    def snapshot(self) -> Grid:
+        """Forks are copied outright for a snapshot; their base must not change anyway"""
+        copy = Grid(self.rows, self.columns)
+        for row in self._row_numbers():
+            items = self._row_items(row)
+            if items:
+                copy._rows[row] = {column: Cell(value=item.value, formula=item.formula) if item.__class__ is Cell
+                                   else item for column, item in items.items()}
+        return copy
+
+
+    def release_snapshot(self):
+        pass
+
+
+    def detach(self):
+        """Copy every cell into the fork and drop the base (done before moving rows or columns)"""
+        rows = {}
+        for row in sorted(self._row_numbers()):
+            row_cells = {column: Cell(value=item.value, formula=item.formula) if item.__class__ is Cell else item
+                         for column, item in self._row_items(row).items()}
+            if row_cells:
+                rows[row] = row_cells
+        self._rows = rows
+        self.base = Grid(self.rows, self.columns)
+
+
+    def range_values(self, row1: int, column1: int, row2: int, column2: int) -> List[Any]:
+        changed_rows = sorted(row for row in self._rows if row1 <= row <= row2)
+        if not changed_rows:
+            return self.base.range_values(row1, column1, row2, column2)
+        # The base supplies the unchanged stretches between changed rows
+        values = []
+        start = row1
+        for row in changed_rows:
+            if start < row:
+                values.extend(self.base.range_values(start, column1, row - 1, column2))
+            values.extend(item.value if item.__class__ is Cell else item
+                          for column, item in self._row_items(row).items() if column1 <= column <= column2)
+            start = row + 1
+        if start <= row2:
+            values.extend(self.base.range_values(start, column1, row2, column2))
+        return [value for value in values if value is not None]
+
+
+    def column_values(self, rows: List[int], column: int) -> List[Any]:
+        values = self.base.column_values(rows, column)
+        changes = self._rows
+        if changes:
+            for i, row in enumerate(rows):
+                row_changes = changes.get(row)
+                if row_changes is not None and column in row_changes:
+                    item = row_changes[column]
+                    values[i] = None if item is _REMOVED else item.value if item.__class__ is Cell else item
+        return values
+
+
+    def iter_rows(self) -> Iterator[Tuple[int, Dict[int, Any]]]:
+        for row in sorted(self._row_numbers()):
+            items = self._row_items(row)
+            if items:
+                yield row, {column: item.value if item.__class__ is Cell else item for column, item in items.items()}
+
+
+    def iter_cells(self, ordered: bool = False) -> Iterator[Tuple[int, int, Cell]]:
+        rows = self._row_numbers()
+        for row in (sorted(rows) if ordered else list(rows)):
+            items = self._row_items(row)
+            for column in (sorted(items) if ordered else list(items)):
+                item = items[column]
+                yield row, column, item if item.__class__ is Cell else Cell(value=item)
+
+
+    def iter_formula_cells(self) -> Iterator[Tuple[int, int, Cell]]:
+        for row in list(self._row_numbers()):
+            for column, item in self._row_items(row).items():
+                if item.__class__ is Cell:
+                    yield row, column, item
+
+
+    def __len__(self) -> int:
+        return sum(len(self._row_items(row)) for row in self._row_numbers())
+
+
+    def _row_items(self, row: int) -> Dict[int, Any]:
+        changes = self._rows.get(row)
+        items = self.base._row_items(row)
+        if changes is None:
+            return items
+        items = dict(items)
+        for column, item in changes.items():
+            if item is _REMOVED:
+                items.pop(column, None)
+            else:
+                items[column] = item
+        return items
+
+
+    def _row_numbers(self) -> Iterable[int]:
+        rows = self.base._row_numbers()
+        if not self._rows:
+            return rows
+        return set(rows).union(self._rows)
+
+
+    def diff(self) -> List[Tuple[int, int, Any, Any]]:
+        """(row, column, base value, fork value) of every cell whose value differs from the base, in order"""
+        result = []
+        for row in sorted(self._rows):
+            for column in sorted(self._rows[row]):
+                base_value = self.base.get_value(row, column)
+                value = self.get_value(row, column)
+                if value != base_value:
+                    result.append((row, column, base_value, value))
+        return result
@@ -0,0 +1,131 @@
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from models import Grid
+
+
+Coordinate = Tuple[int, int]
+
+
+class RecalcPass:
+    """One recalculation pass: where it ran, how many cells it computed and how long it took"""
+    __slots__ = ('kind', 'cells', 'seconds')
+
+    def __init__(self, kind: str, cells: int, seconds: float):
+        self.kind = kind
+        self.cells = cells
+        self.seconds = seconds
+
+
+class RecalcProfiler:
+    """
+    Opt-in instrumentation of formula evaluation (FormulaCalculator.enable_profiling):
+    how many times each cell was evaluated and for how long in total, the hit rates of
+    the compile cache and of the per-cell template lookup, and the duration of every
+    recalculation pass. Without a profiler the calculator checks one attribute per batch.
+    Cells evaluated column-wise or on a process pool share the time of their batch.
+    """
+
+    def __init__(self, cache_info: Optional[Callable[[], Any]] = None, max_passes: int = 1000):
+        self.cache_info = cache_info
+        self.max_passes = max_passes
+        self.reset()
+
+
+    def reset(self):
+        # [evaluations, seconds] of every evaluated cell
+        self.cells: Dict[Coordinate, List[float]] = {}
+        self.passes: deque = deque(maxlen=self.max_passes)
+        self.template_hits = 0
+        self.template_misses = 0
+        self._cache_start = self.cache_info() if self.cache_info is not None else None
+
+
+    def timed(self, evaluate: Callable) -> Callable:
+        """Wrap FormulaCalculator.evaluate_compiled so that every call is counted and timed"""
+        cells = self.cells
+        clock = time.perf_counter
+
+        def evaluate_timed(compiled, row, col, get, get_range):
+            start = clock()
+            value = evaluate(compiled, row, col, get, get_range)
+            elapsed = clock() - start
+            stats = cells.get((row, col))
+            if stats is None:
+                cells[(row, col)] = [1, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+            return value
+        return evaluate_timed
+
+
+    def record_batch(self, cells: Iterable[Coordinate], seconds: float):
+        """Count cells evaluated together, sharing `seconds` evenly"""
+        cells = list(cells)
+        if not cells:
+            return
+        share = seconds / len(cells)
+        stats_of = self.cells
+        for cell in cells:
+            stats = stats_of.get(cell)
+            if stats is None:
+                stats_of[cell] = [1, share]
+            else:
+                stats[0] += 1
+                stats[1] += share
+
+
+    def record_templates(self, hits: int, misses: int):
+        self.template_hits += hits
+        self.template_misses += misses
+
+
+    def record_pass(self, kind: str, cells: int, seconds: float):
+        self.passes.append(RecalcPass(kind, cells, seconds))
+
+
+    def compile_cache(self) -> Tuple[int, int]:
+        """Hits and misses of the compile cache since the profiler was started or reset"""
+        if self.cache_info is None:
+            return 0, 0
+        info = self.cache_info()
+        return info.hits - self._cache_start.hits, info.misses - self._cache_start.misses
+
+
+    def hottest(self, count: int = 20) -> List[Tuple[Coordinate, int, float]]:
+        """The `count` cells with the most evaluation time: (cell, evaluations, seconds)"""
+        stats = sorted(list(self.cells.items()), key=lambda item: item[1][1], reverse=True)[:count]
+        return [(cell, int(evaluations), seconds) for cell, (evaluations, seconds) in stats]
+
+
+    def report(self, count: int = 20, grid: Optional[Grid] = None) -> str:
+        """A text summary with the `count` hottest cells; their formulas are shown when `grid` is given"""
+        cells = list(self.cells.values())
+        evaluations = sum(stats[0] for stats in cells)
+        seconds = sum(stats[1] for stats in cells)
+        passes = list(self.passes)
+        lines = [f"{int(evaluations):,} evaluations of {len(cells):,} cells, {seconds * 1000:.1f} ms"]
+        lines.append(f"template lookups: {_rate(self.template_hits, self.template_misses)}; "
+                     f"compile cache: {_rate(*self.compile_cache())}")
+        if passes:
+            longest = max(passes, key=lambda item: item.seconds)
+            lines.append(f"{len(passes)} passes, {sum(item.seconds for item in passes) * 1000:.1f} ms in total, "
+                         f"longest {longest.seconds * 1000:.1f} ms ({longest.kind}, {longest.cells:,} cells)")
+        hottest = self.hottest(count)
+        if hottest:
+            lines.append("")
+            lines.append(f"{'cell':<8} {'evals':>8} {'total ms':>10} {'us/eval':>9}  formula")
+            for (row, col), evals, cell_seconds in hottest:
+                formula = (grid.get_cell(row, col).formula or "") if grid is not None else ""
+                lines.append(f"{Grid.get_column_name(col + 1) + str(row + 1):<8} {evals:>8,} "
+                             f"{cell_seconds * 1000:>10.3f} {cell_seconds / evals * 1e6:>9.1f}  {formula}")
+        return "\n".join(lines)
+
+
+def _rate(hits: int, misses: int) -> str:
+    total = hits + misses
+    if not total:
+        return "no lookups"
+    return f"{hits / total:.1%} hits ({hits:,} of {total:,})"
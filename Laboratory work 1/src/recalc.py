@@ -0,0 +1,413 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from models import Grid, CellError, VALUE_ERROR, CYCLE_ERROR
+from calculator import FormulaCalculator, to_number, error_message
+from dependencies import CircularReferenceError
+from formula import Range, shift_coordinate
+
+
+Coordinate = Tuple[int, int]
+# (row, col, formula text without '=') for each cell of a chunk
+Task = Tuple[int, int, str]
+
+
+_worker_calculator: Optional[FormulaCalculator] = None
+
+
+def evaluate_chunk(tasks: List[Task], values: Dict[Coordinate, Any],
+                   ranges: Dict[Range, List[float]]) -> List[Tuple[int, int, Any, Optional[str]]]:
+    """
+    Evaluate independent formulas against a read-only snapshot of their inputs.
+    Runs inside pool workers, so it only uses its arguments and a per-process compile cache.
+    """
+    global _worker_calculator
+    if _worker_calculator is None:
+        _worker_calculator = FormulaCalculator(Grid(rows=0, columns=0))
+    calculator = _worker_calculator
+
+    get = lambda row, col: to_number(values.get((row, col)), row, col)
+    results = []
+    for row, col, formula in tasks:
+        try:
+            compiled = calculator.template_for(formula, row, col)
+        except ValueError as e:
+            results.append((row, col, CellError(VALUE_ERROR, str(e)), str(e)))
+            continue
+        value = calculator.evaluate_compiled(compiled, row, col, get, ranges.__getitem__)
+        results.append((row, col, value, error_message(value)))
+    return results
+
+
+class RecalcEngine:
+    """
+    Recalculates formula cells level by level: the cells of one dependency level do
+    not read each other, so a level can be split into chunks and evaluated on a pool.
+    The pool is opt-in, for batch and headless use (workers > 1, or None for one per CPU):
+    every parallel level first copies the inputs it reads, which costs more than it saves
+    for interactive edits. With workers=1 (or small levels) everything runs in order on
+    the calling thread.
+    """
+
+    def __init__(self, calculator: FormulaCalculator, workers: Optional[int] = 1,
+                 kind: str = "process", min_parallel_level: int = 2000):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.calculator = calculator
+        self.workers = workers or os.cpu_count() or 1
+        self.kind = kind
+        self.min_parallel_level = min_parallel_level
+        self._executor: Optional[Executor] = None
+
+
+    @property
+    def grid(self) -> Grid:
+        return self.calculator.grid
+
+
+    def recalculate(self, changed: Iterable[Coordinate]) -> Tuple[List[Coordinate], Dict[Coordinate, str]]:
+        """Recalculate the changed formula cells and their transitive dependents"""
+        return self._recalculate_cells(self.calculator.dependencies.affected(changed))
+
+
+    def recalculate_all(self) -> Tuple[List[Coordinate], Dict[Coordinate, str]]:
+        """Recalculate every registered formula cell"""
+        return self._recalculate_cells(set(self.calculator.dependencies.precedents))
+
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+    def _recalculate_cells(self, cells) -> Tuple[List[Coordinate], Dict[Coordinate, str]]:
+        start = time.perf_counter()
+        levels, blocked = self.calculator.dependencies.evaluation_levels(cells)
+        errors = {}
+        updated = []
+        for level in levels:
+            tasks = [(row, col, self.grid.get_cell(row, col).formula[1:]) for row, col in level]
+            for row, col, value, error in self.evaluate_tasks(tasks):
+                self.grid.set_result(row, col, value)
+                if error is not None:
+                    errors[(row, col)] = error
+                updated.append((row, col))
+
+        self.calculator.mark_blocked(blocked, errors)
+        if self.calculator.profiler is not None:
+            self.calculator.profiler.record_pass("engine", len(updated), time.perf_counter() - start)
+        return updated + sorted(blocked), errors
+
+
+    def evaluate_tasks(self, tasks: List[Task]) -> List[Tuple[int, int, Any, Optional[str]]]:
+        """Evaluate formulas that do not read each other, on the pool if there are enough of them"""
+        # Pool workers only see this sheet, so formulas of a workbook sheet are evaluated here
+        if self.workers > 1 and len(tasks) >= self.min_parallel_level and self.calculator.workbook is None:
+            return self._evaluate_parallel(tasks)
+        return self._evaluate_inline(tasks)
+
+
+    def _evaluate_inline(self, tasks: List[Task]) -> List[Tuple[int, int, Any, Optional[str]]]:
+        """Deterministic single-threaded fallback reading the live Grid"""
+        return self.calculator.evaluate_many(tasks)
+
+
+    def _evaluate_parallel(self, tasks: List[Task]) -> List[Tuple[int, int, Any, Optional[str]]]:
+        started = time.perf_counter()
+        executor = self._get_executor()
+        chunk_size = -(-len(tasks) // (self.workers * 4))
+        futures = []
+        for start in range(0, len(tasks), chunk_size):
+            chunk = tasks[start:start + chunk_size]
+            values, ranges = self._snapshot(chunk)
+            futures.append(executor.submit(evaluate_chunk, chunk, values, ranges))
+
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        if self.calculator.profiler is not None:
+            # Workers are not instrumented: the cells share the wall time of the level
+            self.calculator.profiler.record_batch(((row, col) for row, col, formula in tasks),
+                                                  time.perf_counter() - started)
+        return results
+
+
+    def _snapshot(self, tasks: List[Task]) -> Tuple[Dict[Coordinate, Any], Dict[Range, List[float]]]:
+        """Copy the values that a chunk of formulas reads, so workers never touch the Grid"""
+        values = {}
+        ranges = {}
+        for row, col, formula in tasks:
+            try:
+                compiled = self.calculator.template_for(formula, row, col)
+            except ValueError:
+                continue
+            references, ranges_read = compiled.references_at(row, col)
+            for ref in references:
+                if ref not in values:
+                    values[ref] = self.grid.get_value(*ref)
+            for rng in ranges_read:
+                if rng not in ranges:
+                    ranges[rng] = self.calculator.read_range(rng)
+        return values, ranges
+
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+
+def _shift_cells(cells: Set[Coordinate], axis: int, index: int, delta: int) -> Set[Coordinate]:
+    """New positions of cells after a row/column insert/delete; deleted cells are dropped"""
+    shifted = set()
+    for cell in cells:
+        coordinate = shift_coordinate(cell[axis], index, delta)
+        if coordinate is not None:
+            shifted.add((coordinate, cell[1]) if axis == 0 else (cell[0], coordinate))
+    return shifted
+
+
+class RecalcJob:
+    """One background recalculation pass"""
+    __slots__ = ('id', 'changed', 'full', 'rebuild', 'focus', 'cancelled', 'requeued')
+
+    def __init__(self, job_id: int, changed: Set[Coordinate], full: bool, rebuild: bool, focus: Set[Coordinate]):
+        self.id = job_id
+        self.changed = changed
+        self.full = full
+        self.rebuild = rebuild
+        self.focus = focus
+        self.cancelled = threading.Event()
+        # Set when its cells were already queued again, so they are not folded back on cancel
+        self.requeued = False
+
+
+class RecalcBatch:
+    """Cells recalculated by a job since the previous batch, plus its progress"""
+    __slots__ = ('job', 'cells', 'errors', 'done', 'total', 'finished')
+
+    def __init__(self, job: RecalcJob, cells: List[Coordinate], errors: Dict[Coordinate, str],
+                 done: int, total: int, finished: bool):
+        self.job = job
+        self.cells = cells
+        self.errors = errors
+        self.done = done
+        self.total = total
+        self.finished = finished
+
+
+class BackgroundRecalculator:
+    """
+    Runs RecalcEngine passes on a worker thread so the Tk thread never waits for them.
+    Requests that arrive while a pass is queued are merged into it, and a running pass
+    is cancelled (its cells are folded into the next one) as soon as a newer request
+    supersedes it. Finished cells are published in batches on `results`, to be shown
+    by the Tk thread. Grid and dependency graph changes must be made while holding `lock`;
+    the worker only holds it while planning a pass and while evaluating one batch.
+    """
+
+    def __init__(self, engine: RecalcEngine, batch_size: int = 5000, debounce: float = 0.05):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.debounce = debounce
+        self.lock = threading.RLock()
+        self.results: "queue.Queue[RecalcBatch]" = queue.Queue()
+        self._condition = threading.Condition()
+        self._changed: Set[Coordinate] = set()
+        self._focus: Set[Coordinate] = set()
+        self._full = False
+        self._rebuild = False
+        self._current: Optional[RecalcJob] = None
+        self._next_id = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+
+    def request(self, changed: Iterable[Coordinate], focus: Iterable[Coordinate] = ()):
+        """Recalculate the dependents of `changed`; errors of `focus` cells are reported to the user"""
+        with self._condition:
+            self._changed.update(changed)
+            self._focus.update(focus)
+            self._supersede()
+
+
+    def request_all(self, rebuild: bool = False):
+        """Recalculate every formula, rebuilding the dependency graph first if asked to"""
+        with self._condition:
+            self._full = True
+            self._rebuild = self._rebuild or rebuild
+            self._supersede()
+
+
+    def reset(self):
+        """Drop queued work, cancel the running pass and wait for it to stop, e.g. before replacing the grid"""
+        with self._condition:
+            self._changed.clear()
+            self._focus.clear()
+            self._full = self._rebuild = False
+            if self._current is not None:
+                self._current.cancelled.set()
+        self.wait_idle()
+
+
+    def shift(self, axis: int, index: int, delta: int):
+        """
+        Move the queued work along with the cells after a row (axis 0) or column (axis 1)
+        insert/delete, without waiting for the running pass: it is cancelled and its cells
+        are queued again at their new positions. Call it holding `lock`, together with the shift.
+        """
+        with self._condition:
+            current = self._current
+            if current is not None and not current.requeued:
+                current.cancelled.set()
+                current.requeued = True
+                self._changed.update(current.changed)
+                self._focus.update(current.focus)
+                self._full = self._full or current.full
+                self._rebuild = self._rebuild or current.rebuild
+            self._changed = _shift_cells(self._changed, axis, index, delta)
+            self._focus = _shift_cells(self._focus, axis, index, delta)
+            if self._has_pending():
+                self._supersede()
+
+
+    def busy(self) -> bool:
+        with self._condition:
+            return self._current is not None or self._has_pending()
+
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Block until no pass is running or queued"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._current is not None or (self._has_pending() and not self._closed):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            if self._current is not None:
+                self._current.cancelled.set()
+            self._condition.notify_all()
+
+
+    def _has_pending(self) -> bool:
+        return self._full or bool(self._changed)
+
+
+    def _supersede(self):
+        """Cancel the running pass in favour of the new request and wake the worker"""
+        current = self._current
+        if current is not None and not current.cancelled.is_set():
+            current.cancelled.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._condition.notify_all()
+
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._has_pending() and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            # Let a burst of edits settle so they end up in the same pass
+            time.sleep(self.debounce)
+            with self._condition:
+                if not self._has_pending():
+                    continue
+                self._next_id += 1
+                job = RecalcJob(self._next_id, self._changed, self._full, self._rebuild, self._focus)
+                self._changed, self._focus = set(), set()
+                self._full = self._rebuild = False
+                self._current = job
+
+            try:
+                self._execute(job)
+            finally:
+                with self._condition:
+                    self._current = None
+                    if job.cancelled.is_set() and not job.requeued and not self._closed:
+                        # Superseded: its cells are recalculated together with the newer request
+                        self._changed.update(job.changed)
+                        self._focus.update(job.focus)
+                        self._full = self._full or job.full
+                        self._rebuild = self._rebuild or job.rebuild
+                    self._condition.notify_all()
+
+
+    def _execute(self, job: RecalcJob):
+        start = time.perf_counter()
+        engine = self.engine
+        calculator = engine.calculator
+        with self.lock:
+            if job.rebuild:
+                calculator.rebuild_dependencies()
+            graph = calculator.dependencies
+            cells = set(graph.precedents) if job.full else graph.affected(job.changed)
+            levels, blocked = graph.evaluation_levels(cells)
+            cycle_error = None
+            if blocked:
+                cycle = graph.find_cycle(blocked)
+                cycle_error = CellError(CYCLE_ERROR, str(CircularReferenceError(cycle)) if cycle else None)
+
+        # Slices of levels, evaluated in order; consecutive small slices share one batch
+        size = self.batch_size
+        chunks = [level[start:start + size] for level in levels for start in range(0, len(level), size)]
+        total = len(cells)
+        done = 0
+        index = 0
+        while index < len(chunks):
+            if job.cancelled.is_set():
+                return
+            cells_done, errors = [], {}
+            with self.lock:
+                # Checked again under the lock: a shift made while waiting for it moved the cells
+                if job.cancelled.is_set():
+                    return
+                grid = engine.grid
+                batch_cells = 0
+                while index < len(chunks) and batch_cells < size:
+                    tasks = []
+                    for row, col in chunks[index]:
+                        formula = grid.get_cell(row, col).formula
+                        if formula is not None:
+                            tasks.append((row, col, formula[1:]))
+                    for row, col, value, error in engine.evaluate_tasks(tasks):
+                        grid.set_result(row, col, value)
+                        cells_done.append((row, col))
+                        if error is not None:
+                            errors[(row, col)] = error
+                    batch_cells += len(chunks[index])
+                    index += 1
+            done += batch_cells
+            self.results.put(RecalcBatch(job, cells_done, errors, done, total, False))
+            time.sleep(0)  # give a Tk thread waiting for the lock its turn
+
+        if job.cancelled.is_set():
+            return
+        errors = {}
+        with self.lock:
+            if job.cancelled.is_set():
+                return
+            for row, col in blocked:
+                engine.grid.set_result(row, col, cycle_error)
+                errors[(row, col)] = cycle_error.message
+        self.results.put(RecalcBatch(job, sorted(blocked), errors, total, total, True))
+        if calculator.profiler is not None:
+            calculator.profiler.record_pass("background", total, time.perf_counter() - start)
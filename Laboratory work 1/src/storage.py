@@ -1,39 +1,384 @@
+import csv
 import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Iterator, List, Optional, Tuple
 
-from models import Grid, Cell
+from models import Grid, Cell, CellError
+
+
+CSV_EXTENSION = ".csv"
+# Written before text that starts with '=' or itself, so it is not read back as a formula
+CSV_TEXT_PREFIX = "'"
+# The "order" of a table JSON file whose cells are listed row by row
+ROW_ORDER = "rows"
+
+
+@dataclass
+class CsvReport:
+    """Progress and totals of a CSV import or export"""
+    path: str
+    rows: int = 0
+    cells: int = 0
+    formulas: int = 0
+    seconds: float = 0.0
+    numeric_columns: List[int] = field(default_factory=list)
+
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def detect_numeric_columns(rows: List[List[str]]) -> List[bool]:
+    """
+    A column is numeric when every non-empty field of the sample parses as a number.
+    The first row is left out when there are others, since it is often a header.
+    """
+    sample = rows[1:] if len(rows) > 1 else rows
+    width = max((len(fields) for fields in rows), default=0)
+    numeric = [None] * width
+    for fields in sample:
+        for column, text in enumerate(fields):
+            if text and numeric[column] is not False:
+                try:
+                    float(text)
+                    numeric[column] = True
+                except ValueError:
+                    numeric[column] = False
+    return [flag is True for flag in numeric]
 
 
 class GridStorage:
     @staticmethod
     def save_to_json(filepath: str, grid: Grid):
-        data = {
+        """Write the table as JSON to a temporary file and rename it over `filepath`"""
+        temp_path = filepath + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(GridStorage.to_data(grid), f, indent=4)
+        os.replace(temp_path, filepath)
+
+
+    @staticmethod
+    def load_from_json(filepath: str) -> Grid:
+        with open(filepath, 'r') as f:
+            return GridStorage.from_data(json.load(f))
+
+
+    @staticmethod
+    def to_data(grid: Grid) -> dict:
+        """The JSON document of a table"""
+        return {
             "rows": grid.rows,
             "columns": grid.columns,
+            # Lets a streaming load stop after the rows it needs
+            "order": ROW_ORDER,
             "cells": {
-                key: {
-                    "value": cell.value,
+                f"{row},{col}": {
+                    # Error values are written as their code
+                    "value": str(cell.value) if cell.value.__class__ is CellError else cell.value,
                     "formula": cell.formula
                 }
-                for key, cell in grid.cells.items()
+                for row, col, cell in grid.iter_cells(ordered=True)
             }
         }
-        
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
 
 
     @staticmethod
-    def load_from_json(filepath: str) -> Grid:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        
+    def from_data(data: dict) -> Grid:
+        """Build a table from the document written by to_data"""
         grid = Grid(rows=data["rows"], columns=data["columns"])
         for key, cell_data in data["cells"].items():
             row, col = map(int, key.split(','))
+            formula = cell_data.get("formula")
             grid.set_cell(row, col, Cell(
-                value=cell_data["value"],
-                formula=cell_data.get("formula")
+                value=cell_data["value"] if formula is None else CellError.restore(cell_data["value"]),
+                formula=formula
             ))
-        
+
+        return grid
+
+
+    @staticmethod
+    def open_json_streaming(filepath: str, stop_row: Optional[int] = None) -> 'StreamingJsonLoader':
+        """Start a streaming load and read cells up to `stop_row` (all of them if None)"""
+        loader = StreamingJsonLoader(filepath)
+        loader.load_until(stop_row)
+        return loader
+
+
+    @staticmethod
+    def import_csv(filepath: str, delimiter: str = ",", chunk_rows: int = 50000,
+                   on_progress: Optional[Callable[[CsvReport], None]] = None) -> Tuple[Grid, CsvReport]:
+        """
+        Read a CSV file in chunks of `chunk_rows` rows straight into the row dicts of a new Grid.
+        Columns detected as numeric in the first chunk are stored as floats, other fields as text,
+        and fields starting with '=' become formulas (not evaluated). A leading "'" marks text
+        and is dropped, as export_csv writes it. `on_progress` runs after every chunk.
+        """
+        report = CsvReport(filepath)
+        start = time.perf_counter()
+        grid = Grid(rows=0, columns=0)
+        rows = grid._rows
+        numeric: Optional[List[bool]] = None
+        row = 0
+        with open(filepath, 'r', newline='') as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            while True:
+                chunk = list(islice(reader, chunk_rows))
+                if not chunk:
+                    break
+                if numeric is None:
+                    numeric = detect_numeric_columns(chunk)
+                    report.numeric_columns = [column for column, flag in enumerate(numeric) if flag]
+                for fields in chunk:
+                    if len(fields) > len(numeric):
+                        numeric.extend([False] * (len(fields) - len(numeric)))
+                    row_cells = {}
+                    for column, text in enumerate(fields):
+                        if not text:
+                            continue
+                        if numeric[column]:
+                            try:
+                                row_cells[column] = float(text)
+                                continue
+                            except ValueError:
+                                pass
+                        if text[0] == '=':
+                            row_cells[column] = Cell(formula=text)
+                            report.formulas += 1
+                        elif text[0] == CSV_TEXT_PREFIX:
+                            row_cells[column] = text[1:]
+                        else:
+                            row_cells[column] = text
+                    if row_cells:
+                        rows[row] = row_cells
+                        report.cells += len(row_cells)
+                    row += 1
+                report.rows = row
+                report.seconds = time.perf_counter() - start
+                if on_progress is not None:
+                    on_progress(report)
+
+        grid.rows = row
+        grid.columns = len(numeric) if numeric is not None else 0
+        report.seconds = time.perf_counter() - start
+        return grid, report
+
+
+    @staticmethod
+    def export_csv(filepath: str, grid: Grid, delimiter: str = ",", progress_rows: int = 50000,
+                   on_progress: Optional[Callable[[CsvReport], None]] = None) -> CsvReport:
+        """
+        Write the grid row by row, formula cells as their computed values, to a temporary
+        file that replaces `filepath` at the end. Text starting with '=' or "'" gets a
+        leading "'", so import_csv reads it back as the same text rather than a formula.
+        Empty rows between stored ones are written so every cell keeps its position.
+        `on_progress` runs every `progress_rows` rows.
+        """
+        report = CsvReport(filepath)
+        start = time.perf_counter()
+        next_report = progress_rows
+        written = cells = 0
+        temp_path = filepath + ".tmp"
+        with open(temp_path, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter=delimiter)
+            for row, values in grid.iter_rows():
+                if row > written:
+                    writer.writerows([[]] * (row - written))
+                fields = [""] * (max(values) + 1)
+                for column, value in values.items():
+                    if value.__class__ is float:
+                        # Whole numbers without the trailing '.0', so they read back as the same number
+                        fields[column] = str(int(value)) if value.is_integer() and -1e15 < value < 1e15 else value
+                    elif value.__class__ is str and value[:1] in ('=', CSV_TEXT_PREFIX):
+                        fields[column] = CSV_TEXT_PREFIX + value
+                    elif value is not None:
+                        fields[column] = value
+                    else:
+                        continue
+                    cells += 1
+                writer.writerow(fields)
+                written = row + 1
+                if on_progress is not None and written >= next_report:
+                    report.rows, report.cells = written, cells
+                    report.seconds = time.perf_counter() - start
+                    on_progress(report)
+                    next_report = written + progress_rows
+        os.replace(temp_path, filepath)
+
+        report.rows, report.cells = written, cells
+        report.seconds = time.perf_counter() - start
+        return report
+
+
+class StreamingJsonLoader:
+    """
+    Parses a table JSON file incrementally, in bounded memory, straight into a Grid.
+    Loading can stop at a row when the file lists its cells in row order (save_to_json marks
+    such files with "order": "rows"), and the rest can be read later, e.g. on a background thread.
+    Other files are read to the end at once.
+    """
+
+    def __init__(self, filepath: str, chunk_size: int = 1 << 16):
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.grid = Grid()
+        self.done = False
+        self.row_ordered = False
+        self.error: Optional[Exception] = None
+        self._thread: Optional[threading.Thread] = None
+        self._file = open(filepath, 'r')
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._cells = self._iter_cells()
+        self._lookahead: Optional[Tuple[int, int, Any, Optional[str]]] = None
+
+
+    def load_until(self, stop_row: Optional[int] = None, max_cells: Optional[int] = None) -> Grid:
+        """
+        Load cells until one beyond `stop_row` is reached in a row-ordered file, `max_cells`
+        cells were read, or to the end of the file
+        """
+        grid = self.grid
+        count = 0
+        while not self.done and (max_cells is None or count < max_cells):
+            if self._lookahead is not None:
+                item, self._lookahead = self._lookahead, None
+            else:
+                item = next(self._cells, None)
+                if item is None:
+                    self._finish()
+                    break
+            row, col, value, formula = item
+            if stop_row is not None and row > stop_row and self.row_ordered:
+                self._lookahead = item
+                break
+            count += 1
+            if formula is None:
+                grid.set_value(row, col, value)
+            else:
+                grid.set_cell(row, col, Cell(value=CellError.restore(value), formula=formula))
         return grid
-    
\ No newline at end of file
+
+
+    def load_rest_in_background(self, on_done: Optional[Callable[['StreamingJsonLoader'], None]] = None,
+                                lock: Optional[threading.RLock] = None, batch_cells: int = 10000) -> threading.Thread:
+        """
+        Load the remaining cells on a daemon thread; `on_done` runs on that thread. If the grid is
+        in use, pass the `lock` guarding it: cells are written while holding it, `batch_cells` at a time.
+        """
+        def run():
+            try:
+                while not self.done:
+                    if lock is None:
+                        self.load_until(None)
+                    else:
+                        with lock:
+                            self.load_until(None, batch_cells)
+                        time.sleep(0)  # let a thread waiting for the lock take it
+            except Exception as e:
+                self.error = e
+                self._finish()
+            if on_done is not None:
+                on_done(self)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        return self._thread
+
+
+    def _finish(self):
+        self.done = True
+        self._file.close()
+
+
+    def _iter_cells(self) -> Iterator[Tuple[int, int, Any, Optional[str]]]:
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            if key == "cells":
+                yield from self._iter_cell_entries()
+            else:
+                value = self._decode()
+                if key == "order":
+                    self.row_ordered = value == ROW_ORDER
+                elif key == "rows":
+                    self.grid.rows = value
+                elif key == "columns":
+                    self.grid.columns = value
+            if self._next_char() == '}':
+                return
+
+
+    def _iter_cell_entries(self) -> Iterator[Tuple[int, int, Any, Optional[str]]]:
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._decode()
+            self._expect(':')
+            cell_data = self._decode()
+            row, col = map(int, key.split(','))
+            yield row, col, cell_data.get("value"), cell_data.get("formula")
+            if self._next_char() == '}':
+                return
+
+
+    def _fill(self) -> bool:
+        """Drop consumed text and read another chunk; False at end of file"""
+        chunk = self._file.read(self.chunk_size)
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return bool(chunk)
+
+
+    def _peek(self) -> str:
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON file")
+
+
+    def _next_char(self) -> str:
+        """Consume a ',' or closing brace between members"""
+        char = self._peek()
+        if char not in ',}':
+            raise ValueError(f"Expected ',' or '}}' in JSON file, found '{char}'")
+        self._pos += 1
+        return char
+
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON file, found '{self._peek()}'")
+        self._pos += 1
+
+
+    def _decode(self) -> Any:
+        """Decode one JSON value, reading more chunks while it is incomplete"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
@@ -0,0 +1,406 @@
+import json
+import os
+import zipfile
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from models import Grid, Cell
+from storage import GridStorage
+from calculator import FormulaCalculator
+from formula import Range, SheetRef, SHEET_NAME_PATTERN, parse_formula, shift_references, format_formula
+
+
+WORKBOOK_EXTENSION = ".lwz"
+MANIFEST = "workbook.json"
+
+Coordinate = Tuple[int, int]
+# A cell of a named sheet
+SheetCell = Tuple[str, int, int]
+# Recalculated cells and the error message of every failure, per sheet
+SheetResults = Dict[str, Tuple[List[Coordinate], Dict[Coordinate, str]]]
+
+
+class Sheet:
+    """A named sheet; the grid of a sheet stored in a workbook file is read on first use"""
+    __slots__ = ('name', 'grid', 'calculator', 'member', 'references')
+
+    def __init__(self, name: str, grid: Optional[Grid] = None, member: Optional[str] = None,
+                 references: Optional[Set[str]] = None):
+        self.name = name
+        self.grid = grid
+        self.calculator: Optional[FormulaCalculator] = None
+        # Member of the workbook file holding the sheet, None for a sheet created in memory
+        self.member = member
+        # Sheets read by the formulas of this one, as stored in the file (None if unknown)
+        self.references = references
+
+
+    @property
+    def loaded(self) -> bool:
+        return self.grid is not None
+
+
+class Workbook:
+    """
+    Named sheets whose formulas read each other with Sheet!A1 and Sheet!A1:B10.
+    Every sheet has its own FormulaCalculator and dependency graph; the workbook tracks
+    the references between sheets and carries changes across them. The sheets of an
+    opened file stay on disk until they are viewed or read by a formula, or until a
+    change has to reach their formulas.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.sheets: Dict[str, Sheet] = {}
+        # Cross-sheet references of every formula cell that has any
+        self._precedents: Dict[SheetCell, FrozenSet[SheetRef]] = {}
+        # For each sheet, the formula cells of any sheet reading one of its cells or ranges
+        self._dependents: Dict[str, Dict[Coordinate, Set[SheetCell]]] = {}
+        self._range_dependents: Dict[str, Dict[Range, Set[SheetCell]]] = {}
+        # How many cross-sheet references each sheet's formulas make to each other sheet
+        self._reference_counts: Dict[str, Dict[str, int]] = {}
+
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sheets
+
+
+    def names(self) -> List[str]:
+        return list(self.sheets)
+
+
+    def add_sheet(self, name: str, grid: Optional[Grid] = None) -> Grid:
+        """Append a sheet, empty unless `grid` is given"""
+        if not SHEET_NAME_PATTERN.fullmatch(name):
+            raise ValueError(f"Invalid sheet name '{name}': use letters, digits and '_', starting with a letter")
+        if name in self.sheets:
+            raise ValueError(f"Sheet '{name}' already exists")
+        grid = grid if grid is not None else Grid()
+        self.sheets[name] = Sheet(name, grid, references=None if len(grid) else set())
+        return grid
+
+
+    def remove_sheet(self, name: str) -> SheetResults:
+        """Delete a sheet; formulas that read it become #REF! and are recalculated"""
+        self.load_referrers(name)
+        dependents = self.external_dependents(name, None)
+        self.clear_external(name)
+        del self.sheets[name]
+        return self._recalculate(_group(dependents))
+
+
+    def is_loaded(self, name: str) -> bool:
+        return self.sheets[name].loaded
+
+
+    def grid(self, name: str) -> Grid:
+        """The grid of a sheet, read from the workbook file the first time"""
+        sheet = self.sheets[name]
+        if sheet.grid is None:
+            sheet.grid = WorkbookStorage.load_sheet(self.path, sheet.member)
+        return sheet.grid
+
+
+    def calculator(self, name: str) -> FormulaCalculator:
+        """The calculator of a sheet, with the dependencies of its formulas registered"""
+        sheet = self.sheets[name]
+        if sheet.calculator is None:
+            calculator = FormulaCalculator(self.grid(name))
+            self.attach(name, calculator)
+            calculator.rebuild_dependencies()
+        return sheet.calculator
+
+
+    def attach(self, name: str, calculator: FormulaCalculator):
+        """
+        Make `calculator` the one of sheet `name`, e.g. the calculator of the window showing it.
+        A calculator serves one sheet at a time; rebuild its dependencies if its grid changed.
+        """
+        for sheet in self.sheets.values():
+            if sheet.calculator is calculator:
+                sheet.calculator = None
+                sheet.references = set(self._reference_counts.get(sheet.name, ()))
+        calculator.grid = self.grid(name)
+        calculator.workbook = self
+        calculator.sheet_name = name
+        self.sheets[name].calculator = calculator
+
+
+    def set_external(self, sheet: str, row: int, col: int, refs: FrozenSet[SheetRef]) -> FrozenSet[SheetRef]:
+        """Register the cross-sheet references of a formula cell; returns the ones it had before"""
+        cell = (sheet, row, col)
+        old = self._precedents.pop(cell, frozenset())
+        if old == refs:
+            if refs:
+                self._precedents[cell] = refs
+            return old
+        counts = self._reference_counts.setdefault(sheet, {})
+        for ref in old:
+            target = self._range_dependents if ref.ref.__class__ is Range else self._dependents
+            key = ref.ref if ref.ref.__class__ is Range else (ref.ref.row, ref.ref.column)
+            dependents = target[ref.sheet][key]
+            dependents.discard(cell)
+            if not dependents:
+                del target[ref.sheet][key]
+            counts[ref.sheet] -= 1
+            if not counts[ref.sheet]:
+                del counts[ref.sheet]
+        for ref in refs:
+            if ref.ref.__class__ is Range:
+                self._range_dependents.setdefault(ref.sheet, {}).setdefault(ref.ref, set()).add(cell)
+            else:
+                self._dependents.setdefault(ref.sheet, {}).setdefault((ref.ref.row, ref.ref.column), set()).add(cell)
+            counts[ref.sheet] = counts.get(ref.sheet, 0) + 1
+        if refs:
+            self._precedents[cell] = refs
+        return old
+
+
+    def clear_external(self, sheet: str):
+        """Forget the cross-sheet references of every formula of a sheet"""
+        for cell in [cell for cell in self._precedents if cell[0] == sheet]:
+            self.set_external(*cell, frozenset())
+
+
+    def references(self, name: str) -> Set[str]:
+        """The sheets read by the formulas of sheet `name`"""
+        sheet = self.sheets[name]
+        if sheet.calculator is None and sheet.references is not None:
+            return sheet.references
+        self.calculator(name)
+        return set(self._reference_counts.get(name, ()))
+
+
+    def referrers(self, name: str) -> List[str]:
+        """The sheets whose formulas read sheet `name`"""
+        return [other for other in self.sheets if other != name and name in self.references(other)]
+
+
+    def load_referrers(self, name: str):
+        """Register the formulas of every sheet reading `name`, so that changes to it reach them"""
+        for other in self.referrers(name):
+            self.calculator(other)
+
+
+    def external_dependents(self, name: str, cells: Optional[Iterable[Coordinate]]) -> Set[SheetCell]:
+        """The formula cells (of any sheet) reading `cells` of sheet `name` with Sheet!A1 references; all of them if None"""
+        dependents = self._dependents.get(name, {})
+        range_dependents = self._range_dependents.get(name, {})
+        result = set()
+        if cells is None:
+            for group in chain(dependents.values(), range_dependents.values()):
+                result.update(group)
+            return result
+        for cell in cells:
+            group = dependents.get(cell)
+            if group:
+                result.update(group)
+            for rng, group in range_dependents.items():
+                if rng.contains(*cell):
+                    result.update(group)
+        return result
+
+
+    def recalculate(self, name: str, changed: Iterable[Coordinate]) -> SheetResults:
+        """
+        Recalculate the formula cells among `changed` cells of sheet `name` and everything that
+        depends on them, on any sheet. Sheets are visited in the order of their references, so
+        when the sheets do not read each other in a circle every affected cell is computed once.
+        Otherwise the changes go round until they settle; a change that keeps coming back after
+        every cross-sheet reference was followed once is a cycle, and its cells become #CYCLE!.
+        """
+        return self._recalculate({name: set(changed)})
+
+
+    def propagate(self, name: str, changed: Iterable[Coordinate]) -> SheetResults:
+        """
+        Carry changes to the other sheets once sheet `name` itself was recalculated for them,
+        e.g. by the background recalculation of the window showing it
+        """
+        changed = set(changed)
+        self.load_referrers(name)
+        affected = self.calculator(name).dependencies.affected(changed)
+        return self._recalculate(_group(self.external_dependents(name, chain(changed, affected))))
+
+
+    def _recalculate(self, pending: Dict[str, Set[Coordinate]]) -> SheetResults:
+        rank = {sheet: index for index, sheet in enumerate(self._sheet_order())}
+        limit = len(self._precedents) + len(self.sheets)
+        results: SheetResults = {}
+        cycle: Set[SheetCell] = set()
+        passes = 0
+        while pending:
+            sheet = min(pending, key=rank.__getitem__)
+            cells = pending.pop(sheet)
+            calculator = self.calculator(sheet)
+            self.load_referrers(sheet)
+            passes += 1
+            if passes > limit:
+                # Block the cells and everything they reach, each of them once
+                errors: Dict[Coordinate, str] = {}
+                blocked = {cell for cell in calculator.dependencies.affected(cells) if (sheet, *cell) not in cycle}
+                calculator.mark_blocked(blocked, errors)
+                cycle.update((sheet, *cell) for cell in blocked)
+                updated = sorted(blocked)
+            else:
+                updated, errors = calculator.recalculate(cells)
+            _merge(results, {sheet: (updated, errors)})
+            for other, row, col in self.external_dependents(sheet, chain(cells, updated)):
+                if (other, row, col) not in cycle:
+                    pending.setdefault(other, set()).add((row, col))
+        for sheet, (order, errors) in results.items():
+            results[sheet] = (list(dict.fromkeys(order)), errors)
+        return results
+
+
+    def recalculate_sheet(self, name: str) -> SheetResults:
+        """Recalculate every formula of one sheet and what reads it on other sheets; other sheets are only read"""
+        calculator = self.calculator(name)
+        return self.recalculate(name, calculator.dependencies.precedents)
+
+
+    def loaded_sheets(self) -> List[str]:
+        return [name for name, sheet in self.sheets.items() if sheet.loaded]
+
+
+    def insert_rows(self, name: str, index: int, count: int = 1) -> Dict[str, Set[Coordinate]]:
+        """Insert rows into a sheet, rewriting references on every sheet; returns the formula cells to recalculate"""
+        self.load_referrers(name)
+        return self._shift_references(name, 0, index, count, self.calculator(name).insert_rows(index, count))
+
+
+    def delete_rows(self, name: str, index: int, count: int = 1) -> Dict[str, Set[Coordinate]]:
+        """Delete rows of a sheet, rewriting references on every sheet; returns the formula cells to recalculate"""
+        self.load_referrers(name)
+        return self._shift_references(name, 0, index, -count, self.calculator(name).delete_rows(index, count))
+
+
+    def insert_columns(self, name: str, index: int, count: int = 1) -> Dict[str, Set[Coordinate]]:
+        """Insert columns into a sheet, rewriting references on every sheet; returns the formula cells to recalculate"""
+        self.load_referrers(name)
+        return self._shift_references(name, 1, index, count, self.calculator(name).insert_columns(index, count))
+
+
+    def delete_columns(self, name: str, index: int, count: int = 1) -> Dict[str, Set[Coordinate]]:
+        """Delete columns of a sheet, rewriting references on every sheet; returns the formula cells to recalculate"""
+        self.load_referrers(name)
+        return self._shift_references(name, 1, index, -count, self.calculator(name).delete_columns(index, count))
+
+
+    def _shift_references(self, name: str, axis: int, index: int, delta: int,
+                          shifted_cells: Set[Coordinate]) -> Dict[str, Set[Coordinate]]:
+        """After the sheet's own cells moved, rewrite the Sheet!A1 references to it on every sheet"""
+        changed = {name: shifted_cells}
+        referring = set()
+        for cell, dependents in self._dependents.get(name, {}).items():
+            if cell[axis] >= index:
+                referring.update(dependents)
+        for rng, dependents in self._range_dependents.get(name, {}).items():
+            if (rng.row2, rng.column2)[axis] >= index:
+                referring.update(dependents)
+        for sheet, row, col in referring:
+            calculator = self.calculator(sheet)
+            stored = calculator.grid.get_cell(row, col)
+            ast = parse_formula(stored.formula.strip()[1:].strip())
+            shifted = shift_references(ast, axis, index, delta, name, local=False)
+            if shifted is ast:
+                continue
+            formula = "=" + format_formula(shifted)
+            calculator.grid.set_cell(row, col, Cell(value=stored.value, formula=formula))
+            calculator.set_formula(row, col, formula)
+            changed.setdefault(sheet, set()).add((row, col))
+        return changed
+
+
+    def _sheet_order(self) -> List[str]:
+        """Sheets after the sheets they read; sheets that read each other in a circle keep the workbook order"""
+        loaded_references = {name: self.references(name) for name, sheet in self.sheets.items()
+                             if sheet.calculator is not None or sheet.references is not None}
+        order = []
+        visited = set()
+        for start in self.sheets:
+            if start in visited:
+                continue
+            visited.add(start)
+            stack = [(start, iter(sorted(loaded_references.get(start, ()))))]
+            while stack:
+                sheet, references = stack[-1]
+                ref = next(references, None)
+                if ref is None:
+                    stack.pop()
+                    order.append(sheet)
+                elif ref in self.sheets and ref not in visited:
+                    visited.add(ref)
+                    stack.append((ref, iter(sorted(loaded_references.get(ref, ())))))
+        return order
+
+
+def _group(cells: Iterable[SheetCell]) -> Dict[str, Set[Coordinate]]:
+    groups: Dict[str, Set[Coordinate]] = {}
+    for sheet, row, col in cells:
+        groups.setdefault(sheet, set()).add((row, col))
+    return groups
+
+
+def _merge(results: SheetResults, more: SheetResults):
+    """Add recalculation results; a cell computed again keeps only its latest error"""
+    for sheet, (cells, errors) in more.items():
+        if sheet not in results:
+            results[sheet] = ([], {})
+        order, known = results[sheet]
+        for cell in cells:
+            known.pop(cell, None)
+        order.extend(cells)
+        known.update(errors)
+
+
+class WorkbookStorage:
+    """
+    Workbook files (.lwz) are zip archives: a manifest listing the sheets in order with
+    the sheets each one reads, and one JSON table per sheet, so any sheet is read alone.
+    """
+
+    @staticmethod
+    def save(filepath: str, workbook: Workbook):
+        """
+        Write the workbook to a temporary file and rename it over `filepath`. Sheets that were
+        never loaded are copied from the file they came from without being parsed.
+        """
+        temp_path = filepath + ".tmp"
+        manifest = []
+        with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+            source = zipfile.ZipFile(workbook.path) if workbook.path and os.path.exists(workbook.path) else None
+            try:
+                for index, (name, sheet) in enumerate(workbook.sheets.items()):
+                    member = f"sheets/{index}.json"
+                    if sheet.loaded:
+                        archive.writestr(member, json.dumps(GridStorage.to_data(sheet.grid), separators=(',', ':')))
+                    else:
+                        archive.writestr(member, source.read(sheet.member))
+                    manifest.append({"name": name, "member": member, "references": sorted(workbook.references(name))})
+            finally:
+                if source is not None:
+                    source.close()
+            archive.writestr(MANIFEST, json.dumps({"sheets": manifest}, indent=4))
+        os.replace(temp_path, filepath)
+        workbook.path = filepath
+        for entry in manifest:
+            workbook.sheets[entry["name"]].member = entry["member"]
+
+
+    @staticmethod
+    def open(filepath: str) -> Workbook:
+        """Read the list of sheets only; each sheet is loaded when the workbook first needs it"""
+        with zipfile.ZipFile(filepath) as archive:
+            manifest = json.loads(archive.read(MANIFEST))
+        workbook = Workbook(filepath)
+        for entry in manifest["sheets"]:
+            workbook.sheets[entry["name"]] = Sheet(entry["name"], member=entry["member"],
+                                                   references=set(entry["references"]))
+        return workbook
+
+
+    @staticmethod
+    def load_sheet(filepath: str, member: str) -> Grid:
+        with zipfile.ZipFile(filepath) as archive:
+            return GridStorage.from_data(json.loads(archive.read(member)))
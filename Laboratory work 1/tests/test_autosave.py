@@ -0,0 +1,75 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid
+from calculator import FormulaCalculator
+from recalc import RecalcEngine, BackgroundRecalculator
+from storage import GridStorage
+from binary_storage import BinaryGridStorage
+from autosave import BackgroundSaver, autosave_path
+
+
+class BackgroundSaverTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "table.json")
+        self.grid = Grid(10, 2)
+        self.grid.set_value(0, 0, 1.0)
+        self.background = BackgroundRecalculator(RecalcEngine(FormulaCalculator(self.grid), workers=1))
+        self.saver = None
+
+
+    def tearDown(self):
+        if self.saver is not None:
+            self.saver.shutdown()
+        self.background.shutdown()
+        self.directory.cleanup()
+
+
+    def test_save_writes_a_snapshot_and_reports_it(self):
+        self.saver = BackgroundSaver(self.background)
+        self.saver.mark_changed()
+        self.assertTrue(self.saver.unsaved())
+        self.saver.save(self.grid, self.path)
+        self.assertTrue(self.saver.wait_idle(timeout=10))
+
+        result = self.saver.results.get_nowait()
+        self.assertEqual((result.path, result.autosave, result.error), (self.path, False, None))
+        self.assertFalse(self.saver.unsaved())
+        self.assertEqual(GridStorage.load_from_json(self.path).get_value(0, 0), 1.0)
+
+
+    def test_failed_save_is_reported(self):
+        self.saver = BackgroundSaver(self.background)
+        self.saver.mark_changed()
+        self.saver.save(self.grid, os.path.join(self.directory.name, "missing", "table.json"))
+        self.assertTrue(self.saver.wait_idle(timeout=10))
+        self.assertIsNotNone(self.saver.results.get_nowait().error)
+        self.assertTrue(self.saver.unsaved())
+
+
+    def test_autosave_writes_changed_tables_only(self):
+        self.saver = BackgroundSaver(self.background, interval=0.05)
+        self.saver.start_autosave(lambda: (self.grid, self.path))
+        time.sleep(0.2)
+        self.assertTrue(self.saver.results.empty())
+
+        self.grid.set_value(1, 1, "edited")
+        self.saver.mark_changed()
+        result = self.saver.results.get(timeout=10)
+        self.assertEqual((result.path, result.autosave, result.error), (autosave_path(self.path), True, None))
+        autosaved = BinaryGridStorage.open(result.path)
+        try:
+            self.assertEqual(autosaved.get_value(1, 1), "edited")
+        finally:
+            autosaved.close()
+        self.assertTrue(self.saver.unsaved())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+from calculator import FormulaCalculator
+from recalc import RecalcEngine, BackgroundRecalculator
+
+
+def chain_grid(rows: int) -> Grid:
+    """Inputs in column A, B doubles A and C adds up B down to its row"""
+    grid = Grid(rows, 3)
+    for row in range(rows):
+        grid.set_value(row, 0, float(row))
+        grid.set_cell(row, 1, Cell(formula=f"=A{row + 1}*2"))
+        grid.set_cell(row, 2, Cell(formula=f"=B{row + 1}+C{row}" if row else "=B1"))
+    return grid
+
+
+class BackgroundShiftTest(unittest.TestCase):
+    def shift_with_pending_edit(self, index: int, delta: int, debounce: float):
+        """
+        Edit A21 so that B21 fails, then move rows while the edit is queued or recalculated;
+        returns the cells whose errors were reported as focus errors
+        """
+        grid = chain_grid(1500)
+        calculator = FormulaCalculator(grid)
+        calculator.rebuild_dependencies()
+        calculator.recalculate_all()
+        background = BackgroundRecalculator(RecalcEngine(calculator, workers=1), batch_size=50, debounce=debounce)
+        try:
+            with background.lock:
+                grid.set_value(20, 0, "text")
+            background.request([(20, 0)], focus=[(20, 1)])
+            with background.lock:
+                if delta > 0:
+                    changed = calculator.insert_rows(index, delta)
+                else:
+                    changed = calculator.delete_rows(index, -delta)
+                background.shift(0, index, delta)
+            background.request(changed)
+            self.assertTrue(background.wait_idle(timeout=60))
+        finally:
+            background.shutdown()
+
+        expected = FormulaCalculator(grid)
+        expected.rebuild_dependencies()
+        for row, col, cell in list(grid.iter_formula_cells()):
+            self.assertEqual(cell.value, expected.evaluate(cell.formula[1:], row, col), f"cell {row},{col}")
+
+        reported = set()
+        while not background.results.empty():
+            batch = background.results.get()
+            if not batch.job.cancelled.is_set():
+                reported.update(cell for cell in batch.job.focus if cell in batch.errors)
+        return reported
+
+
+    def test_insert_with_a_queued_edit(self):
+        self.assertEqual(self.shift_with_pending_edit(10, 3, debounce=0.2), {(23, 1)})
+
+
+    def test_delete_with_a_queued_edit(self):
+        self.assertEqual(self.shift_with_pending_edit(10, -2, debounce=0.2), {(18, 1)})
+
+
+    def test_edited_row_deleted_with_a_queued_edit(self):
+        self.assertEqual(self.shift_with_pending_edit(20, -1, debounce=0.2), set())
+
+
+    def test_insert_during_a_pass(self):
+        self.assertEqual(self.shift_with_pending_edit(10, 3, debounce=0), {(23, 1)})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, DIV_ZERO_ERROR
+from storage import GridStorage
+from batch import recalculate_file, run_batch, main
+
+
+def write_table(path: str, rows: int = 50):
+    grid = Grid(rows, 3)
+    for row in range(rows):
+        grid.set_value(row, 0, float(row))
+        grid.set_cell(row, 1, Cell(formula=f"=A{row + 1} * 2"))
+    grid.set_cell(0, 2, Cell(formula=f"=SUM(B1:B{rows})"))
+    grid.set_cell(1, 2, Cell(formula="=1/A1"))
+    GridStorage.save_to_json(path, grid)
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.inputs = os.path.join(self.directory.name, "in")
+        os.mkdir(self.inputs)
+        for name in ("a.json", "b.json"):
+            write_table(os.path.join(self.inputs, name))
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def path(self, *names: str) -> str:
+        return os.path.join(self.directory.name, *names)
+
+
+    def test_file_is_recalculated_and_saved(self):
+        report = recalculate_file(self.path("in", "a.json"), self.path("out.json"))
+        self.assertIsNone(report.failure)
+        self.assertEqual((report.cells, report.formulas, report.errors), (102, 52, 1))
+        grid = GridStorage.load_from_json(self.path("out.json"))
+        self.assertEqual(grid.get_value(10, 1), 20.0)
+        self.assertEqual(grid.get_value(0, 2), 2450.0)
+        self.assertEqual(grid.get_value(1, 2).code, DIV_ZERO_ERROR)
+
+
+    def test_process_pool_output_matches_inline(self):
+        recalculate_file(self.path("in", "a.json"), self.path("inline.json"))
+        report = recalculate_file(self.path("in", "a.json"), self.path("pool.json"), workers=2)
+        self.assertIsNone(report.failure)
+        with open(self.path("inline.json")) as inline, open(self.path("pool.json")) as pool:
+            self.assertEqual(inline.read(), pool.read())
+
+
+    def test_directory_is_processed_into_the_output_directory(self):
+        reports = run_batch([self.inputs], self.path("out"), jobs=2)
+        self.assertEqual([os.path.basename(report.output_path) for report in reports], ["a.json", "b.json"])
+        self.assertEqual(sorted(os.listdir(self.path("out"))), ["a.json", "b.json"])
+
+
+    def test_failures_are_reported_not_raised(self):
+        with open(self.path("broken.json"), "w") as f:
+            f.write("{")
+        report = recalculate_file(self.path("broken.json"), self.path("never.json"))
+        self.assertIsNotNone(report.failure)
+        self.assertFalse(os.path.exists(self.path("never.json")))
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                self.assertEqual(main([self.path("broken.json"), "-j", "1"]), 1)
+            finally:
+                sys.stdout = stdout
+
+
+if __name__ == "__main__":
+    unittest.main()
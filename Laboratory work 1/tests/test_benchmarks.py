@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+from workbooks import WORKBOOKS
+from run_benchmarks import benchmark_workbook
+from calculator import FormulaCalculator
+
+
+class BenchmarkSmokeTest(unittest.TestCase):
+    """Runs every synthetic workbook at a tiny scale so the suite keeps working as the code changes"""
+
+
+    def test_workbooks_recalculate_without_errors(self):
+        for name, build in WORKBOOKS.items():
+            with self.subTest(workbook=name):
+                calculator = FormulaCalculator(build(40))
+                calculator.rebuild_dependencies()
+                updated, errors = calculator.recalculate_all()
+                self.assertTrue(updated)
+                self.assertEqual(errors, {})
+
+
+    def test_every_measurement_is_reported(self):
+        for name in WORKBOOKS:
+            with self.subTest(workbook=name):
+                result = benchmark_workbook(name, 40, repeat=1)
+                self.assertEqual(result["workbook"], name)
+                self.assertGreater(result["formulas"], 0)
+                for key in ("evaluate_per_second", "full_recalc_s", "json_load_s", "binary_bytes",
+                            "binary_open_first_row_s", "json_stream_load_peak_bytes"):
+                    self.assertIn(key, result)
+
+
+if __name__ == "__main__":
+    unittest.main()
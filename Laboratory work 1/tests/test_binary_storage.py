@@ -0,0 +1,110 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, CellError, DIV_ZERO_ERROR
+from binary_storage import BinaryGridStorage
+
+
+def cells(grid: Grid):
+    """The contents of a grid as comparable tuples (Cell has no equality)"""
+    return [(row, col, cell.value, cell.formula) for row, col, cell in grid.iter_cells(ordered=True)]
+
+
+def sample_grid(rows: int = 600) -> Grid:
+    grid = Grid(rows, 4)
+    for row in range(rows):
+        grid.set_value(row, 0, float(row))
+        grid.set_cell(row, 1, Cell(value=row * 2.0, formula=f"=A{row + 1}*2"))
+    grid.set_value(3, 2, "text")
+    grid.set_value(4, 2, 7)
+    grid.set_value(5, 2, True)
+    grid.set_value(6, 2, [1, "two"])
+    grid.set_cell(7, 3, Cell(value=CellError(DIV_ZERO_ERROR), formula="=1/0"))
+    return grid
+
+
+class BinaryStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "table.lwb")
+        self.opened = []
+
+
+    def tearDown(self):
+        for grid in self.opened:
+            grid.close()
+        self.directory.cleanup()
+
+
+    def open(self, path: str = None):
+        grid = BinaryGridStorage.open(path or self.path)
+        self.opened.append(grid)
+        return grid
+
+
+    def test_full_save_round_trip(self):
+        grid = sample_grid()
+        BinaryGridStorage.save_full(self.path, grid)
+        loaded = self.open()
+        self.assertEqual((loaded.rows, loaded.columns), (grid.rows, grid.columns))
+        self.assertEqual(cells(loaded), cells(grid))
+        self.assertEqual(loaded.get_value(7, 3).code, DIV_ZERO_ERROR)
+
+
+    def test_journal_round_trip(self):
+        BinaryGridStorage.save_full(self.path, sample_grid())
+        grid = self.open()
+        grid.set_value(10, 0, 99.0)
+        grid.clear_cell(11, 1)
+        grid.set_cell(599, 3, Cell(value=5.0, formula="=A6"))
+        grid.rows += 5
+        BinaryGridStorage.save(self.path, grid, compact_ratio=1000)
+        self.assertTrue(os.path.exists(self.path + ".journal"))
+        self.assertFalse(grid.dirty)
+
+        loaded = self.open()
+        self.assertEqual(loaded.rows, 605)
+        self.assertEqual(cells(loaded), cells(grid))
+        self.assertIsNone(loaded.get_cell(11, 1).formula)
+
+
+    def test_compaction_folds_the_journal_in(self):
+        BinaryGridStorage.save_full(self.path, sample_grid())
+        grid = self.open()
+        for row in range(600):
+            grid.set_value(row, 2, f"row {row}")
+        BinaryGridStorage.save(self.path, grid, compact_ratio=0.1)
+        self.assertFalse(os.path.exists(self.path + ".journal"))
+        self.assertEqual(cells(self.open()), cells(grid))
+
+
+    def test_save_as_keeps_changes_for_the_own_file(self):
+        BinaryGridStorage.save_full(self.path, sample_grid())
+        grid = self.open()
+        grid.set_value(1, 2, 42.0)
+        copy = os.path.join(self.directory.name, "copy.lwb")
+        BinaryGridStorage.save(copy, grid)
+        self.assertTrue(grid.dirty)
+        self.assertEqual(self.open(copy).get_value(1, 2), 42.0)
+
+        BinaryGridStorage.save(self.path, grid)
+        self.assertFalse(grid.dirty)
+        self.assertEqual(self.open().get_value(1, 2), 42.0)
+
+
+    def test_fork_is_saved_as_it_reads(self):
+        grid = sample_grid()
+        fork = grid.fork()
+        fork.set_value(5, 0, "changed")
+        fork.clear_cell(7, 0)
+        fork.set_value(599, 3, False)
+        BinaryGridStorage.save_full(self.path, fork)
+        self.assertEqual(cells(self.open()), cells(fork))
+
+
+if __name__ == "__main__":
+    unittest.main()
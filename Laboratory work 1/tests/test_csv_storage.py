@@ -0,0 +1,84 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+from storage import GridStorage
+
+
+class CsvStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "table.csv")
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def write(self, text: str):
+        with open(self.path, "w", newline="") as f:
+            f.write(text)
+
+
+    def test_round_trip_keeps_values_and_positions(self):
+        grid = Grid(10, 4)
+        grid.set_value(0, 0, "name")
+        grid.set_value(0, 1, "amount")
+        grid.set_value(1, 0, "a, with comma")
+        grid.set_value(1, 1, 2.5)
+        grid.set_value(2, 1, 3.0)
+        grid.set_value(5, 3, "after empty rows")
+        GridStorage.export_csv(self.path, grid)
+
+        loaded, report = GridStorage.import_csv(self.path)
+        self.assertEqual(report.rows, 6)
+        self.assertEqual(report.numeric_columns, [1])
+        self.assertEqual(loaded.get_value(0, 1), "amount")
+        self.assertEqual(loaded.get_value(1, 0), "a, with comma")
+        self.assertEqual(loaded.get_value(1, 1), 2.5)
+        self.assertEqual(loaded.get_value(2, 1), 3.0)
+        self.assertEqual(loaded.get_value(5, 3), "after empty rows")
+        self.assertIsNone(loaded.get_value(3, 0))
+
+
+    def test_text_that_looks_like_a_formula_stays_text(self):
+        grid = Grid(2, 3)
+        grid.set_value(0, 0, "=hello")
+        grid.set_value(0, 1, "'quoted")
+        grid.set_value(0, 2, "plain")
+        GridStorage.export_csv(self.path, grid)
+
+        loaded, report = GridStorage.import_csv(self.path)
+        self.assertEqual([loaded.get_value(0, col) for col in range(3)], ["=hello", "'quoted", "plain"])
+        self.assertIsNone(loaded.get_cell(0, 0).formula)
+        self.assertEqual(report.formulas, 0)
+
+
+    def test_formulas_are_exported_as_their_values(self):
+        grid = Grid(2, 2)
+        grid.set_value(0, 0, 4.0)
+        grid.set_cell(0, 1, Cell(value=8.0, formula="=A1*2"))
+        GridStorage.export_csv(self.path, grid)
+
+        loaded, _ = GridStorage.import_csv(self.path)
+        self.assertEqual(loaded.get_value(0, 1), 8.0)
+        self.assertIsNone(loaded.get_cell(0, 1).formula)
+
+
+    def test_import_reads_formulas_and_reports_every_chunk(self):
+        self.write("=1+1,x\n" + "".join(f"{row},y\n" for row in range(1, 10)))
+        reports = []
+        grid, report = GridStorage.import_csv(self.path, chunk_rows=4, on_progress=lambda r: reports.append(r.rows))
+        self.assertEqual(reports, [4, 8, 10])
+        self.assertEqual(grid.get_cell(0, 0).formula, "=1+1")
+        self.assertEqual(report.formulas, 1)
+        self.assertEqual(grid.get_value(9, 0), 9.0)
+        self.assertEqual((grid.rows, grid.columns), (10, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
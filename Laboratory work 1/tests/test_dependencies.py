@@ -0,0 +1,105 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, CYCLE_ERROR
+from calculator import FormulaCalculator
+from dependencies import DependencyGraph
+from formula import Range
+
+
+class DependencyGraphTest(unittest.TestCase):
+    def test_levels_of_a_diamond(self):
+        graph = DependencyGraph()
+        graph.set_precedents((0, 1), [(0, 0)])
+        graph.set_precedents((0, 2), [(0, 0)])
+        graph.set_precedents((0, 3), [(0, 1), (0, 2)])
+        graph.set_precedents((1, 0), [])
+        levels, blocked = graph.evaluation_levels({(0, 1), (0, 2), (0, 3), (1, 0)})
+        self.assertEqual([set(level) for level in levels], [{(0, 1), (0, 2), (1, 0)}, {(0, 3)}])
+        self.assertEqual(blocked, set())
+        self.assertEqual(graph.affected([(0, 0)]), {(0, 1), (0, 2), (0, 3)})
+
+
+    def test_new_references_replace_the_old_ones(self):
+        graph = DependencyGraph()
+        graph.set_precedents((0, 1), [(0, 0)])
+        graph.set_precedents((0, 1), [(5, 5)])
+        self.assertEqual(graph.dependents_of((0, 0)), set())
+        self.assertEqual(graph.dependents_of((5, 5)), {(0, 1)})
+        graph.remove((0, 1))
+        self.assertEqual(graph.dependents, {})
+
+
+    def test_range_dependents(self):
+        graph = DependencyGraph()
+        graph.set_precedents((5, 0), [], [Range(0, 0, 2, 1)])
+        self.assertEqual(graph.dependents_of((2, 1)), {(5, 0)})
+        self.assertEqual(graph.dependents_of((3, 0)), set())
+        self.assertEqual(graph.dependents_of((0, 2)), set())
+
+
+    def test_cycle_over_several_cells_is_found(self):
+        graph = DependencyGraph()
+        graph.set_precedents((0, 0), [(0, 1)])
+        graph.set_precedents((0, 1), [(0, 2)])
+        graph.set_precedents((0, 2), [(0, 0)])
+        graph.set_precedents((0, 3), [(0, 0)])
+        cells = {(0, 0), (0, 1), (0, 2), (0, 3)}
+        cycle = graph.find_cycle(cells)
+        self.assertEqual(cycle[0], cycle[-1])
+        self.assertEqual(set(cycle), {(0, 0), (0, 1), (0, 2)})
+        self.assertEqual(graph.evaluation_levels(cells), ([], cells))
+
+
+class IncrementalRecalculationTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(10, 6)
+        self.calculator = FormulaCalculator(self.grid)
+        self.grid.set_value(0, 0, 1.0)
+
+
+    def set_formula(self, row: int, col: int, formula: str):
+        self.grid.set_cell(row, col, Cell(formula=formula))
+        self.calculator.set_formula(row, col, formula)
+
+
+    def test_only_dependents_are_recalculated_in_order(self):
+        self.set_formula(0, 1, "=A1*2")
+        self.set_formula(0, 2, "=A1+1")
+        self.set_formula(0, 3, "=B1+C1")
+        self.set_formula(1, 0, "=7")
+        self.set_formula(2, 0, "=SUM(A1:A2)")
+        self.calculator.recalculate_all()
+        self.grid.set_value(0, 0, 10.0)
+        updated, errors = self.calculator.recalculate([(0, 0)])
+        self.assertEqual(errors, {})
+        self.assertEqual(set(updated), {(0, 1), (0, 2), (0, 3), (2, 0)})
+        self.assertLess(updated.index((0, 1)), updated.index((0, 3)))
+        self.assertEqual(self.grid.get_value(0, 3), 31.0)
+        self.assertEqual(self.grid.get_value(2, 0), 17.0)
+
+
+    def test_cycle_and_its_dependents_become_cycle_errors(self):
+        self.set_formula(3, 0, "=B4")
+        self.set_formula(3, 1, "=C4")
+        self.set_formula(3, 2, "=A4")
+        self.set_formula(3, 3, "=A4+1")
+        self.set_formula(4, 0, "=A1+1")
+        _, errors = self.calculator.recalculate_all()
+        self.assertEqual(set(errors), {(3, 0), (3, 1), (3, 2), (3, 3)})
+        self.assertIn("->", errors[(3, 3)])
+        self.assertEqual(self.grid.get_value(3, 3).code, CYCLE_ERROR)
+        self.assertEqual(self.grid.get_value(4, 0), 2.0)
+
+        # Breaking the cycle clears the errors
+        self.set_formula(3, 2, "=A1")
+        _, errors = self.calculator.recalculate([(3, 2)])
+        self.assertEqual(errors, {})
+        self.assertEqual(self.grid.get_value(3, 3), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
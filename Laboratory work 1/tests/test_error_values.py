@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, CellError, CYCLE_ERROR, DIV_ZERO_ERROR, REF_ERROR, VALUE_ERROR
+from calculator import FormulaCalculator
+
+
+class ErrorValueTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(10, 4)
+        self.calculator = FormulaCalculator(self.grid)
+
+
+    def set_formula(self, row: int, col: int, formula: str):
+        self.grid.set_cell(row, col, Cell(formula=formula))
+        self.calculator.set_formula(row, col, formula)
+
+
+    def test_error_propagates_to_dependents(self):
+        self.set_formula(0, 0, "=1/0")
+        self.set_formula(0, 1, "=A1+1")
+        updated, errors = self.calculator.recalculate([(0, 0)])
+        self.assertEqual(set(updated), {(0, 0), (0, 1)})
+        self.assertEqual(set(errors), {(0, 0), (0, 1)})
+        self.assertEqual(self.grid.get_value(0, 1), CellError(DIV_ZERO_ERROR))
+
+
+    def test_invalid_formula_evaluates_to_a_value_error(self):
+        value = self.calculator.evaluate('A1+"x"', 0, 0)
+        self.assertIs(value.__class__, CellError)
+        self.assertEqual(value.code, VALUE_ERROR)
+
+
+    def test_cycle_is_an_error_value(self):
+        self.set_formula(1, 2, "=D2")
+        self.set_formula(1, 3, "=C2")
+        _, errors = self.calculator.recalculate([(1, 2)])
+        self.assertEqual(set(errors), {(1, 2), (1, 3)})
+        self.assertEqual(self.grid.get_value(1, 2).code, CYCLE_ERROR)
+
+
+    def test_deleted_reference_becomes_a_ref_error(self):
+        self.grid.set_value(0, 0, 5.0)
+        self.set_formula(1, 0, "=A1*2")
+        self.calculator.delete_rows(0)
+        self.assertEqual(self.grid.get_cell(0, 0).formula, "=#REF! * 2")
+        self.calculator.recalculate([(0, 0)])
+        self.assertEqual(self.grid.get_value(0, 0).code, REF_ERROR)
+
+
+    def test_column_wise_evaluation_matches_one_cell_at_a_time(self):
+        rows = self.calculator.vector_threshold * 2
+        # Every third input is text, which is an error for scalar arguments
+        for formula in ("=COUNT(A1, 1)", "=SUM(A1, B1)", "=MAX(A1:B1, 2)", "=A1 * 2 + B1", "=-inc(A1)"):
+            grid = Grid(rows, 3)
+            for row in range(rows):
+                grid.set_value(row, 0, "text" if row % 3 == 0 else float(row))
+                grid.set_value(row, 1, float(row))
+            calculator = FormulaCalculator(grid)
+            calculator.recalculate(calculator.fill_formula(0, 2, rows - 1, 2, formula))
+            single = FormulaCalculator(grid)
+            for row in range(rows):
+                with self.subTest(formula=formula, row=row):
+                    self.assertEqual(grid.get_value(row, 2), single.evaluate(grid.get_cell(row, 2).formula[1:], row, 2))
+
+
+    def test_error_codes_restore_from_files(self):
+        self.assertEqual(CellError.restore(DIV_ZERO_ERROR), CellError(DIV_ZERO_ERROR))
+        self.assertEqual(CellError.restore("plain text"), "plain text")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+from calculator import FormulaCalculator
+
+
+def cells(grid: Grid):
+    """The contents of a grid as comparable tuples (Cell has no equality)"""
+    return [(row, col, cell.value, cell.formula) for row, col, cell in grid.iter_cells(ordered=True)]
+
+
+def sample_grid() -> Grid:
+    grid = Grid(20, 3)
+    for row in range(20):
+        grid.set_value(row, 0, float(row))
+        grid.set_cell(row, 1, Cell(value=row * 2.0, formula=f"=A{row + 1}*2"))
+    grid.set_cell(0, 2, Cell(value=380.0, formula="=SUM(B1:B20)"))
+    return grid
+
+
+class ForkTest(unittest.TestCase):
+    def test_fork_changes_leave_the_base_untouched(self):
+        grid = sample_grid()
+        before = cells(grid)
+        fork = grid.fork()
+        fork.set_value(1, 0, 100.0)
+        fork.clear_cell(2, 0)
+        fork.set_result(3, 1, -1.0)
+        fork.clear_row(4)
+        fork.set_value(19, 2, "new")
+
+        self.assertEqual(cells(grid), before)
+        self.assertEqual(fork.get_value(1, 0), 100.0)
+        self.assertIsNone(fork.get_value(2, 0))
+        self.assertEqual(fork.get_value(3, 1), -1.0)
+        self.assertEqual(fork.get_cell(3, 1).formula, "=A4*2")
+        self.assertIsNone(fork.get_value(4, 1))
+        self.assertEqual(fork.get_value(19, 2), "new")
+        self.assertEqual(fork.range_values(0, 0, 2, 0), [0.0, 100.0])
+
+
+    def test_fork_row_shift_detaches_from_the_base(self):
+        grid = sample_grid()
+        before = cells(grid)
+        fork = grid.fork()
+        fork.insert_rows(0, 2)
+        self.assertEqual(cells(grid), before)
+        self.assertEqual(fork.get_value(2, 0), 0.0)
+        self.assertIsNone(fork.get_value(0, 0))
+
+
+    def test_forked_calculator_recalculates_in_isolation(self):
+        calculator = FormulaCalculator(sample_grid())
+        calculator.rebuild_dependencies()
+        calculator.recalculate_all()
+        before = cells(calculator.grid)
+
+        what_if = calculator.fork()
+        what_if.grid.set_value(0, 0, 50.0)
+        what_if.recalculate([(0, 0)])
+        self.assertEqual(what_if.grid.get_value(0, 1), 100.0)
+        self.assertEqual(what_if.grid.get_value(0, 2), 480.0)
+
+        what_if.grid.set_cell(5, 1, Cell(formula="=A6*3"))
+        what_if.set_formula(5, 1, "=A6*3")
+        what_if.recalculate([(5, 1)])
+        self.assertEqual(what_if.grid.get_value(5, 1), 15.0)
+        self.assertEqual(what_if.grid.get_value(0, 2), 485.0)
+
+        self.assertEqual(cells(calculator.grid), before)
+        calculator.grid.set_value(5, 0, 6.0)
+        changed, _ = calculator.recalculate([(5, 0)])
+        self.assertIn((5, 1), changed)
+        self.assertEqual(calculator.grid.get_value(5, 1), 12.0)
+
+
+class SnapshotTest(unittest.TestCase):
+    def test_snapshot_keeps_the_state_it_was_taken_in(self):
+        grid = sample_grid()
+        snapshot = grid.snapshot()
+        before = cells(snapshot)
+        grid.set_value(0, 0, 9.0)
+        grid.set_result(1, 1, -5.0)
+        grid.clear_cell(2, 0)
+        grid.clear_row(3)
+        grid.set_value(25, 0, "new row")
+
+        self.assertEqual(cells(snapshot), before)
+        self.assertEqual(grid.get_value(0, 0), 9.0)
+        self.assertEqual(grid.get_value(1, 1), -5.0)
+        grid.release_snapshot()
+        grid.set_value(0, 0, 10.0)
+        self.assertEqual(snapshot.get_value(0, 0), 0.0)
+
+
+    def test_fork_snapshot_is_a_copy(self):
+        fork = sample_grid().fork()
+        fork.set_value(0, 0, 7.0)
+        snapshot = fork.snapshot()
+        fork.set_value(0, 0, 8.0)
+        fork.set_result(1, 1, -1.0)
+        self.assertEqual(snapshot.get_value(0, 0), 7.0)
+        self.assertEqual(snapshot.get_value(1, 1), 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, CellError, DIV_ZERO_ERROR, VALUE_ERROR
+from calculator import FormulaCalculator
+from formula import parse_formula, format_formula
+
+
+class FormulaCompilerTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(5, 5)
+        self.grid.set_value(0, 0, 3.0)
+        self.grid.set_value(0, 1, 4.0)
+        self.calculator = FormulaCalculator(self.grid)
+
+
+    def test_operator_precedence(self):
+        cases = {
+            "2+3*4": 14.0,
+            "(2+3)*4": 20.0,
+            "10-4-3": 3.0,
+            "2*3^2": 18.0,
+            "2^3^2": 512.0,
+            "-2^2": -4.0,
+            "(-2)^2": 4.0,
+            "2^-1": 0.5,
+            "--2": 2.0,
+            "7 mod 3 + 7 div 2": 4.0,
+            "7 % 3 * 7 // 2": 3.0,
+            "A1+B1*2": 11.0,
+            "-A1^2": -9.0,
+            "(A1+B1)/(B1-A1)": 7.0,
+            "dec(A1)*2": 4.0,
+            "inc(a1) + b1": 8.0,
+        }
+        for formula, expected in cases.items():
+            with self.subTest(formula=formula):
+                self.assertEqual(self.calculator.evaluate(formula, 4, 4), expected)
+
+
+    def test_formatting_keeps_only_the_needed_parentheses(self):
+        cases = {
+            "2+(3*4)": "2 + 3 * 4",
+            "(2-3)-4": "2 - 3 - 4",
+            "2-(3-4)": "2 - (3 - 4)",
+            "2/(3*4)": "2 / (3 * 4)",
+            "(2^3)^2": "(2^3)^2",
+            "-(A1^2)": "-A1^2",
+            "(-A1)^2": "(-A1)^2",
+            "7 % (b1 // 2)": "7 mod (B1 div 2)",
+            "average(A1:A3, 2e3)": "AVG(A1:A3, 2000)",
+        }
+        for formula, expected in cases.items():
+            with self.subTest(formula=formula):
+                formatted = format_formula(parse_formula(formula))
+                self.assertEqual(formatted, expected)
+                self.assertEqual(self.calculator.evaluate(formatted, 4, 4), self.calculator.evaluate(formula, 4, 4))
+
+
+    def test_invalid_formulas(self):
+        for formula in ("2+", "(2", "foo(1)", "A1:B2", "inc(A1:A2)", "2 $ 3", ""):
+            with self.subTest(formula=formula):
+                with self.assertRaises(ValueError):
+                    parse_formula(formula)
+                self.assertEqual(self.calculator.evaluate(formula, 4, 4).code, VALUE_ERROR)
+
+
+    def test_division_by_zero_is_an_error_value(self):
+        for formula in ("1/0", "5 mod 0", "5 div (A1-3)"):
+            with self.subTest(formula=formula):
+                self.assertEqual(self.calculator.evaluate(formula, 4, 4), CellError(DIV_ZERO_ERROR))
+
+
+    def test_formula_is_compiled_once_for_every_cell_it_is_copied_to(self):
+        self.grid.set_value(1, 0, 5.0)
+        self.assertEqual(self.calculator.evaluate("A1*2", 0, 2), 6.0)
+        self.assertEqual(self.calculator.evaluate("A2*2", 1, 2), 10.0)
+        self.assertEqual(self.calculator.compile.cache_info().misses, 1)
+        # The compiled formula reads the grid when it runs, not when it is compiled
+        self.grid.set_value(1, 0, 6.0)
+        self.assertEqual(self.calculator.evaluate("A2*2", 1, 2), 12.0)
+        self.assertEqual(self.calculator.compile.cache_info().misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+from calculator import FormulaCalculator
+from formula import relative_key, absolute_formula
+
+
+class FormulaTemplateTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(10, 4)
+        for row in range(10):
+            self.grid.set_value(row, 0, float(row))
+        self.calculator = FormulaCalculator(self.grid)
+
+
+    def test_relative_key_round_trip(self):
+        key = relative_key("A1*B1", 0, 2)
+        self.assertEqual(key, "R[0]C[-2]*R[0]C[-1]")
+        self.assertEqual(relative_key("A4*B4", 3, 2), key)
+        self.assertEqual(absolute_formula(key, 3, 2), "A4*B4")
+        self.assertEqual(absolute_formula(relative_key("A2", 1, 1), 0, 1), "A1")
+        self.assertEqual(absolute_formula(relative_key("A2", 1, 1), 0, 0), "#REF!")
+
+
+    def test_filled_cells_share_one_template(self):
+        cells = self.calculator.fill_formula(0, 1, 9, 1, "=A1*2")
+        self.assertEqual(self.grid.get_cell(9, 1).formula, "=A10*2")
+        self.assertEqual(len({id(self.calculator.cell_templates[cell]) for cell in cells}), 1)
+        self.calculator.recalculate_all()
+        self.assertEqual([self.grid.get_value(row, 1) for row in range(10)], [row * 2.0 for row in range(10)])
+
+
+    def test_changed_formula_text_gets_a_new_template(self):
+        self.assertEqual(self.calculator.evaluate("A2*2", 1, 1), 2.0)
+        first = self.calculator.template_for("A2*2", 1, 1)
+        self.assertIs(self.calculator.template_for("A2*2", 1, 1), first)
+        self.assertEqual(self.calculator.evaluate("A2+5", 1, 1), 6.0)
+        self.assertIsNot(self.calculator.template_for("A2+5", 1, 1), first)
+
+
+    def test_cleared_formula_forgets_its_template(self):
+        self.grid.set_cell(2, 2, Cell(formula="=A3*3"))
+        self.calculator.set_formula(2, 2, "=A3*3")
+        self.assertIn((2, 2), self.calculator.formula_templates)
+        self.grid.set_value(2, 2, 1.0)
+        self.calculator.clear_formula(2, 2)
+        self.assertNotIn((2, 2), self.calculator.formula_templates)
+        self.assertNotIn((2, 2), self.calculator.cell_templates)
+
+
+if __name__ == "__main__":
+    unittest.main()
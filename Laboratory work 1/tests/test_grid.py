@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, EMPTY_CELL
+
+
+class SparseGridTest(unittest.TestCase):
+    def setUp(self):
+        # Only the cells that are set take memory, whatever the size of the sheet
+        self.grid = Grid(1000000, 1000)
+
+
+    def test_empty_cells_are_one_shared_immutable_cell(self):
+        self.assertIs(self.grid.get_cell(999999, 999), EMPTY_CELL)
+        self.assertIsNone(self.grid.get_value(5, 5))
+        with self.assertRaises(AttributeError):
+            self.grid.get_cell(0, 0).value = 1.0
+        self.assertEqual(len(self.grid), 0)
+
+
+    def test_values_and_formulas(self):
+        self.grid.set_value(3, 4, 2.5)
+        formula = Cell(value=5.0, formula="=E4*2")
+        self.grid.set_cell(3, 5, formula)
+        self.assertEqual(self.grid.get_value(3, 4), 2.5)
+        self.assertIsNone(self.grid.get_cell(3, 4).formula)
+        self.assertIs(self.grid.get_cell(3, 5), formula)
+        self.assertEqual(self.grid.get_value(3, 5), 5.0)
+        self.grid.set_result(3, 5, 6.0)
+        self.assertEqual(formula.value, 6.0)
+        # A result is only stored in a formula cell
+        self.grid.set_result(3, 4, 7.0)
+        self.assertEqual(self.grid.get_value(3, 4), 2.5)
+        self.assertEqual(len(self.grid), 2)
+
+
+    def test_clearing(self):
+        for row in range(3):
+            for column in range(3):
+                self.grid.set_value(row, column, float(row * 3 + column))
+        self.grid.set_value(0, 0, None)
+        self.grid.clear_cell(1, 1)
+        self.grid.clear_row(2)
+        self.grid.clear_column(2)
+        self.assertEqual([(row, column) for row, column, _ in self.grid.iter_cells(ordered=True)],
+                         [(0, 1), (1, 0)])
+        self.grid.clear()
+        self.assertEqual(len(self.grid), 0)
+
+
+    def test_bulk_reads(self):
+        self.grid.set_value(10, 1, 1.0)
+        self.grid.set_value(10, 3, "text")
+        self.grid.set_value(2, 2, 3.0)
+        self.grid.set_cell(11, 2, Cell(value=4.0, formula="=1+3"))
+        self.grid.set_cell(12, 2, Cell(formula="=B1"))
+        self.assertEqual(sorted(map(str, self.grid.range_values(0, 1, 999999, 2))), ["1.0", "3.0", "4.0"])
+        self.assertEqual(self.grid.range_values(0, 0, 9, 0), [])
+        self.assertEqual(self.grid.column_values([2, 3, 11, 12], 2), [3.0, None, 4.0, None])
+        self.assertEqual(list(self.grid.iter_rows()), [(2, {2: 3.0}), (10, {1: 1.0, 3: "text"}),
+                                                        (11, {2: 4.0}), (12, {2: None})])
+        self.assertEqual([(row, column) for row, column, _ in self.grid.iter_formula_cells()], [(11, 2), (12, 2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
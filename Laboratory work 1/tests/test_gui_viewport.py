@@ -0,0 +1,70 @@
+import os
+import sys
+import tkinter as tk
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid
+from calculator import FormulaCalculator
+from gui import ExcelGUI
+
+
+class ScrollCommandTest(unittest.TestCase):
+    def test_scrollbar_commands(self):
+        scroll = ExcelGUI._scroll_command
+        # start 10, 5 rows visible out of 100
+        self.assertEqual(scroll(None, 10, 5, 100, ("moveto", "0.5")), 50)
+        self.assertEqual(scroll(None, 10, 5, 100, ("scroll", "-3", "units")), 7)
+        # A page keeps one row of the previous page in view
+        self.assertEqual(scroll(None, 10, 5, 100, ("scroll", "2", "pages")), 18)
+
+
+class ViewportTest(unittest.TestCase):
+    """Builds the window, so it needs a display; skipped where Tk cannot start"""
+
+
+    def setUp(self):
+        try:
+            self.root = tk.Tk()
+        except tk.TclError as e:
+            self.skipTest(f"Tk is not available: {e}")
+        self.root.withdraw()
+        self.grid = Grid(100000, 200)
+        for row in range(0, 100000, 1000):
+            self.grid.set_value(row, 0, float(row))
+        self.gui = ExcelGUI(self.root, self.grid, FormulaCalculator(self.grid))
+        self.gui._resize_pool(8 * self.gui.cell_width, 10 * self.gui.cell_height)
+
+
+    def tearDown(self):
+        self.gui.saver.shutdown()
+        self.gui.background.shutdown()
+        self.gui.recalc_engine.shutdown()
+        self.root.destroy()
+
+
+    def test_pool_is_sized_by_the_viewport_not_the_sheet(self):
+        # One extra row and column for the partially visible cells
+        self.assertEqual((self.gui.visible_rows, self.gui.visible_cols), (11, 9))
+        self.assertEqual(sum(len(widgets) for widgets in self.gui.cell_widgets), 11 * 9)
+
+
+    def test_scrolling_rebinds_the_pooled_widgets(self):
+        widgets = [widget for row_widgets in self.gui.cell_widgets for widget in row_widgets]
+        self.gui._on_vertical_scroll("moveto", "0.05")
+        self.assertEqual(self.gui.top_row, 5000)
+        self.assertEqual(self.gui.cell_widgets[0][0].get(), "5000.0")
+        self.assertEqual(self.gui.cell_widgets[1][0].get(), "")
+        self.assertEqual([widget for row_widgets in self.gui.cell_widgets for widget in row_widgets], widgets)
+        self.assertIsNone(self.gui._widget_for(0, 0))
+        self.assertIs(self.gui._widget_for(5001, 2), self.gui.cell_widgets[1][2])
+
+        self.gui._on_vertical_scroll("scroll", "1", "pages")
+        self.assertEqual(self.gui.top_row, 5000 + self.gui.visible_rows - 1)
+        self.gui._on_horizontal_scroll("scroll", "-3", "units")
+        self.assertEqual(self.gui.left_col, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, REF_ERROR
+from calculator import FormulaCalculator
+from dependencies import DependencyGraph
+from formula import Range
+
+
+def shifted_model(cells: dict, axis: int, index: int, delta: int) -> dict:
+    """What a dict of cells looks like after inserting (delta > 0) or deleting rows/columns at `index`"""
+    result = {}
+    for (row, column), value in cells.items():
+        position = (row, column)[axis]
+        if delta < 0 and index <= position < index - delta:
+            continue
+        if position >= index:
+            position += delta
+        result[(position, column) if axis == 0 else (row, position)] = value
+    return result
+
+
+def shift(grid: Grid, axis: int, index: int, delta: int):
+    name = ("insert_" if delta > 0 else "delete_") + ("rows" if axis == 0 else "columns")
+    getattr(grid, name)(index, abs(delta))
+
+
+def contents(grid: Grid) -> dict:
+    return {(row, column): cell.value for row, column, cell in grid.iter_cells()}
+
+
+class ReferenceRewritingTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(10, 5)
+        self.calculator = FormulaCalculator(self.grid)
+        for row in range(5):
+            self.grid.set_value(row, 0, float(row + 1))
+        self.set_formula(0, 1, "=A5*2")
+        self.set_formula(1, 1, "=SUM(A1:A5)")
+        self.set_formula(3, 2, "=B1+A4")
+        self.set_formula(6, 0, "=A2")
+        self.calculator.recalculate_all()
+
+
+    def set_formula(self, row: int, col: int, formula: str):
+        self.grid.set_cell(row, col, Cell(formula=formula))
+        self.calculator.set_formula(row, col, formula)
+
+
+    def apply(self, changed):
+        self.calculator.recalculate(changed)
+        return {(row, col): (cell.formula, cell.value) for row, col, cell in self.grid.iter_formula_cells()}
+
+
+    def test_inserted_rows_move_references_and_grow_ranges(self):
+        changed = self.calculator.insert_rows(2, 2)
+        self.assertEqual(changed, {(0, 1), (1, 1), (5, 2)})
+        self.assertEqual(self.apply(changed), {
+            (0, 1): ("=A7 * 2", 10.0),
+            (1, 1): ("=SUM(A1:A7)", 15.0),
+            (5, 2): ("=B1 + A6", 14.0),
+            # Only moved: A2 is above the inserted rows
+            (8, 0): ("=A2", 2.0),
+        })
+
+
+    def test_deleted_rows_shrink_ranges(self):
+        self.set_formula(8, 0, "=A3+1")
+        self.calculator.recalculate([(8, 0)])
+        formulas = self.apply(self.calculator.delete_rows(2, 2))
+        self.assertEqual(formulas.pop((6, 0))[1].code, REF_ERROR)
+        self.assertEqual(self.grid.get_cell(6, 0).formula, "=#REF! + 1")
+        self.assertEqual(formulas, {
+            (0, 1): ("=A3 * 2", 10.0),
+            (1, 1): ("=SUM(A1:A3)", 8.0),
+            (4, 0): ("=A2", 2.0),
+        })
+
+
+    def test_deleted_references_become_ref_errors(self):
+        formulas = self.apply(self.calculator.delete_columns(0))
+        self.assertEqual({cell: formula for cell, (formula, _) in formulas.items()},
+                         {(0, 0): "=#REF! * 2", (1, 0): "=SUM(#REF!)", (3, 1): "=A1 + #REF!"})
+        for _, value in formulas.values():
+            self.assertEqual(value.code, REF_ERROR)
+
+
+    def test_inserted_columns_keep_cross_column_references(self):
+        self.apply(self.calculator.insert_columns(1, 3))
+        self.assertEqual(self.grid.get_cell(3, 5).formula, "=E1 + A4")
+        self.grid.set_value(4, 0, 50.0)
+        self.apply(self.calculator.recalculate([(4, 0)])[0])
+        self.assertEqual(self.grid.get_value(3, 5), 104.0)
+
+
+class OffsetMapTest(unittest.TestCase):
+    """Random edits of a Grid, its snapshots and forks checked against a plain dict of cells"""
+
+
+    def test_against_a_dict_model(self):
+        for seed in range(40):
+            rnd = random.Random(seed)
+            grid = Grid(30, 30)
+            model = {}
+            snapshots = []
+            for step in range(100):
+                operation = rnd.random()
+                if operation < 0.45:
+                    row, column, value = rnd.randrange(30), rnd.randrange(30), rnd.choice([None, step, "x"])
+                    grid.set_value(row, column, value)
+                    if value is None:
+                        model.pop((row, column), None)
+                    else:
+                        model[(row, column)] = value
+                elif operation < 0.85:
+                    axis, index, count = rnd.randrange(2), rnd.randrange(30), rnd.randrange(1, 4)
+                    delta = rnd.choice([count, -count])
+                    shift(grid, axis, index, delta)
+                    model = shifted_model(model, axis, index, delta)
+                else:
+                    snapshots.append((grid.snapshot(), dict(model)))
+                with self.subTest(seed=seed, step=step):
+                    self.assertEqual(contents(grid), model)
+                    self.assertEqual(len(grid), len(model))
+                    row1, row2 = sorted(rnd.randrange(35) for _ in range(2))
+                    column1, column2 = sorted(rnd.randrange(35) for _ in range(2))
+                    self.assertEqual(sorted(map(str, grid.range_values(row1, column1, row2, column2))),
+                                     sorted(str(value) for (row, column), value in model.items()
+                                            if row1 <= row <= row2 and column1 <= column <= column2))
+            for snapshot, expected in snapshots:
+                self.assertEqual(contents(snapshot), expected)
+
+
+    def test_fork_shifts_independently(self):
+        grid = Grid(20, 20)
+        for row in range(0, 20, 3):
+            for column in range(0, 20, 4):
+                grid.set_value(row, column, row * 100 + column)
+        grid.insert_rows(5, 2)
+        expected = contents(grid)
+        fork = grid.fork()
+        fork_expected = dict(expected)
+        for axis, index, delta in ((0, 3, -2), (1, 0, 1), (0, 10, 4), (1, 7, -3)):
+            shift(fork, axis, index, delta)
+            fork_expected = shifted_model(fork_expected, axis, index, delta)
+        self.assertEqual(contents(fork), fork_expected)
+        self.assertEqual(contents(grid), expected)
+
+
+class ShiftIndexTest(unittest.TestCase):
+    """DependencyGraph's row/column index checked against a scan of every formula"""
+
+
+    def test_against_brute_force(self):
+        rnd = random.Random(7)
+        graph = DependencyGraph()
+        for _ in range(300):
+            cell = (rnd.randrange(2000), rnd.randrange(40))
+            references = [(rnd.randrange(2000), rnd.randrange(40)) for _ in range(rnd.randrange(3))]
+            ranges = []
+            if rnd.random() < 0.3:
+                row, column = rnd.randrange(2000), rnd.randrange(40)
+                ranges.append(Range(row, column, row + rnd.randrange(500), column + rnd.randrange(5)))
+            graph.set_precedents(cell, references, ranges)
+        for cell in rnd.sample(sorted(graph.precedents), 50):
+            graph.remove(cell)
+
+        for axis, index in ((0, 0), (0, 255), (0, 256), (0, 1500), (0, 5000), (1, 0), (1, 17), (1, 39)):
+            with self.subTest(axis=axis, index=index):
+                self.assertEqual(graph.formulas_from(axis, index),
+                                 {cell for cell in graph.precedents if cell[axis] >= index})
+                readers = {cell for cell, references in graph.precedents.items()
+                           if any(reference[axis] >= index for reference in references)}
+                readers |= {cell for cell, ranges in graph.range_precedents.items()
+                            if any((rng.row2, rng.column2)[axis] >= index for rng in ranges)}
+                self.assertEqual(graph.readers_from(axis, index), readers)
+
+
+if __name__ == "__main__":
+    unittest.main()
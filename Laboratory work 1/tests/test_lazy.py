@@ -0,0 +1,113 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, CYCLE_ERROR
+from calculator import FormulaCalculator
+from lazy import LazyEvaluator
+from binary_storage import BinaryGridStorage
+
+
+class LazyEvaluatorTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(20, 4)
+        self.grid.set_value(0, 0, 2.0)
+        # A chain A1 -> B1 -> C1 and an unrelated formula, none computed yet
+        self.grid.set_cell(0, 1, Cell(formula="=A1*10"))
+        self.grid.set_cell(0, 2, Cell(formula="=B1+1"))
+        self.grid.set_cell(5, 0, Cell(formula="=7"))
+        # A loaded value is trusted and not recomputed
+        self.grid.set_cell(6, 0, Cell(value=99.0, formula="=1"))
+        self.lazy = LazyEvaluator(FormulaCalculator(self.grid))
+        self.lazy.reset()
+
+
+    def test_only_formulas_without_a_value_start_stale(self):
+        self.assertEqual(self.lazy.stale, {(0, 1), (0, 2), (5, 0)})
+        self.assertEqual(self.lazy.get_value(6, 0), 99.0)
+
+
+    def test_reading_a_cell_computes_only_what_it_needs(self):
+        self.assertEqual(self.lazy.get_value(0, 2), 21.0)
+        self.assertEqual(self.grid.get_value(0, 1), 20.0)
+        self.assertEqual(self.lazy.stale, {(5, 0)})
+        self.assertIsNone(self.grid.get_value(5, 0))
+        # Memoized: a second read computes nothing
+        self.assertEqual(self.lazy.ensure([(0, 2)]), ([], {}))
+
+
+    def test_change_invalidates_dependents(self):
+        self.lazy.ensure_all()
+        self.assertEqual(self.lazy.stale, set())
+        self.grid.set_value(0, 0, 3.0)
+        self.assertEqual(self.lazy.invalidate([(0, 0)]), {(0, 1), (0, 2)})
+        self.assertTrue(self.lazy.is_stale(0, 2))
+        self.assertEqual(self.lazy.get_value(0, 2), 31.0)
+
+
+    def test_stale_marks_follow_inserted_and_deleted_rows(self):
+        self.lazy.shift(0, 3, 2)
+        self.assertEqual(self.lazy.stale, {(0, 1), (0, 2), (7, 0)})
+        self.lazy.shift(0, 6, -4)
+        self.assertEqual(self.lazy.stale, {(0, 1), (0, 2)})
+
+
+    def test_cycle_is_reported(self):
+        self.grid.set_cell(2, 0, Cell(formula="=B3"))
+        self.grid.set_cell(2, 1, Cell(formula="=A3"))
+        self.lazy.reset()
+        _, errors = self.lazy.ensure([(2, 0)])
+        self.assertEqual(set(errors), {(2, 0), (2, 1)})
+        self.assertEqual(self.grid.get_value(2, 1).code, CYCLE_ERROR)
+        self.assertNotIn((2, 0), self.lazy.stale)
+
+
+class LazyBinaryLoadTest(unittest.TestCase):
+    """Opening a .lwb file decodes row blocks only when they are read"""
+
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "table.lwb")
+        grid = Grid(2000, 3)
+        for row in range(2000):
+            grid.set_value(row, 0, float(row))
+            grid.set_cell(row, 1, Cell(value=row * 2.0, formula=f"=A{row + 1}*2"))
+        grid.set_cell(0, 2, Cell(formula="=SUM(B1:B2000)"))
+        BinaryGridStorage.save_full(self.path, grid, block_rows=256)
+        self.grid = BinaryGridStorage.open(self.path)
+
+
+    def tearDown(self):
+        self.grid.close()
+        self.directory.cleanup()
+
+
+    def test_blocks_are_loaded_on_demand(self):
+        self.assertEqual(len(self.grid._pending), 8)
+        self.assertEqual(self.grid.get_value(1500, 1), 3000.0)
+        self.assertTrue(self.grid.is_loaded(1500))
+        self.assertFalse(self.grid.is_loaded(0))
+        self.assertEqual(len(self.grid._pending), 7)
+
+        self.assertEqual(self.grid.range_values(300, 0, 600, 0), [float(row) for row in range(300, 601)])
+        self.assertEqual(len(self.grid._pending), 5)
+        self.assertEqual(len(self.grid), 4001)
+        self.assertEqual(self.grid._pending, set())
+
+
+    def test_stored_results_are_trusted_after_opening(self):
+        lazy = LazyEvaluator(FormulaCalculator(self.grid))
+        lazy.reset()
+        # Only the formula saved without a value is computed when it is read
+        self.assertEqual(lazy.stale, {(0, 2)})
+        self.assertEqual(lazy.get_value(1000, 1), 2000.0)
+        self.assertEqual(lazy.ensure_all(), ([(0, 2)], {}))
+        self.assertEqual(self.grid.get_value(0, 2), float(sum(range(2000)) * 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+from calculator import FormulaCalculator
+from lazy import LazyEvaluator
+from profiling import RecalcProfiler
+
+
+class RecalcProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(100, 3)
+        for row in range(50):
+            self.grid.set_value(row, 0, float(row))
+            self.grid.set_cell(row, 1, Cell(formula=f"=A{row + 1} * 2"))
+        self.grid.set_cell(0, 2, Cell(formula="=SUM(B1:B50)"))
+        self.calculator = FormulaCalculator(self.grid)
+        self.calculator.rebuild_dependencies()
+
+
+    def test_profiling_is_off_by_default(self):
+        self.assertIsNone(self.calculator.profiler)
+        self.calculator.recalculate_all()
+        self.assertIsNone(self.calculator.disable_profiling())
+
+
+    def test_every_evaluation_and_pass_is_recorded(self):
+        profiler = self.calculator.enable_profiling()
+        self.assertIs(self.calculator.enable_profiling(), profiler)
+        self.calculator.recalculate_all()
+        self.grid.set_value(3, 0, 100.0)
+        self.calculator.recalculate([(3, 0)])
+
+        self.assertEqual(len(profiler.cells), 51)
+        self.assertEqual(profiler.cells[(3, 1)][0], 2)
+        self.assertEqual(profiler.cells[(10, 1)][0], 1)
+        self.assertEqual([(item.kind, item.cells) for item in profiler.passes],
+                         [("recalculate", 51), ("recalculate", 2)])
+        self.assertEqual(profiler.template_hits + profiler.template_misses, 53)
+
+        report = profiler.report(count=3, grid=self.grid)
+        self.assertIn("53 evaluations of 51 cells", report)
+        self.assertIn("2 passes", report)
+        self.assertEqual(len(profiler.hottest(3)), 3)
+
+        self.assertIs(self.calculator.disable_profiling(), profiler)
+        self.calculator.recalculate_all()
+        self.assertEqual(len(profiler.passes), 2)
+
+
+    def test_lazy_evaluation_is_profiled(self):
+        profiler = self.calculator.enable_profiling()
+        lazy = LazyEvaluator(self.calculator)
+        lazy.reset()
+        lazy.get_value(5, 1)
+        self.assertEqual(list(profiler.cells), [(5, 1)])
+        self.assertEqual([(item.kind, item.cells) for item in profiler.passes], [("lazy", 1)])
+
+
+    def test_batches_share_their_time(self):
+        profiler = RecalcProfiler(max_passes=2)
+        profiler.record_batch([(0, 0), (1, 0)], 1.0)
+        profiler.record_batch([(0, 0)], 0.5)
+        self.assertEqual(profiler.cells, {(0, 0): [2, 1.0], (1, 0): [1, 0.5]})
+        self.assertEqual(profiler.hottest(1), [((0, 0), 2, 1.0)])
+        for index in range(3):
+            profiler.record_pass("engine", index, 0.1)
+        self.assertEqual([item.cells for item in profiler.passes], [1, 2])
+        self.assertEqual(profiler.compile_cache(), (0, 0))
+        self.assertIn("no lookups", profiler.report())
+        profiler.reset()
+        self.assertEqual(profiler.cells, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, DIV_ZERO_ERROR, VALUE_ERROR
+from calculator import FormulaCalculator
+
+
+class RangeAggregateTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = Grid(200000, 4)
+        for row in range(100000):
+            self.grid.set_value(row, 0, float(row + 1))
+        # Text is skipped inside ranges, numeric text is read as a number
+        self.grid.set_value(5, 1, "text")
+        self.grid.set_value(6, 1, 2.0)
+        self.grid.set_value(7, 1, "3")
+        self.calculator = FormulaCalculator(self.grid)
+
+
+    def test_aggregates(self):
+        cases = {
+            "SUM(A1:A100000)": 5000050000.0,
+            "AVG(A1:A10)": 5.5,
+            "average(a1:a10)": 5.5,
+            "MIN(A1:B10)": 1.0,
+            "MAX(B1:B10)": 3.0,
+            "COUNT(A1:B10)": 12.0,
+            "SUM(B6:B8)": 5.0,
+            "SUM(A10:A1)": 55.0,
+            "SUM(A1:A3, 10, B7) * 2": 36.0,
+            # Over empty cells
+            "SUM(C1:C10)": 0.0,
+            "MIN(C1:C10)": 0.0,
+            "COUNT(C1:C10)": 0.0,
+        }
+        for formula, expected in cases.items():
+            with self.subTest(formula=formula):
+                self.assertEqual(self.calculator.evaluate(formula, 150000, 3), expected)
+
+
+    def test_errors(self):
+        self.assertEqual(self.calculator.evaluate("AVG(C1:C10)", 0, 3).code, DIV_ZERO_ERROR)
+        # A single text cell passed as an argument is not skipped
+        self.assertEqual(self.calculator.evaluate("SUM(B6)", 0, 3).code, VALUE_ERROR)
+
+
+    def test_range_change_recalculates_the_aggregate(self):
+        self.grid.set_cell(0, 3, Cell(formula="=SUM(A1:A100000)"))
+        self.calculator.set_formula(0, 3, "=SUM(A1:A100000)")
+        self.calculator.recalculate_all()
+        self.grid.set_value(49999, 0, 0.0)
+        updated, _ = self.calculator.recalculate([(49999, 0)])
+        self.assertEqual(updated, [(0, 3)])
+        self.assertEqual(self.grid.get_value(0, 3), 5000050000.0 - 50000.0)
+        # A cell outside the range changes nothing
+        self.assertEqual(self.calculator.recalculate([(100000, 0)]), ([], {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+from calculator import FormulaCalculator
+from recalc import RecalcEngine
+
+
+def levelled_grid(rows: int) -> Grid:
+    """Three dependency levels over `rows` rows, with some errors and a range"""
+    grid = Grid(rows + 1, 4)
+    for row in range(rows):
+        grid.set_value(row, 0, "text" if row % 50 == 7 else float(row))
+        grid.set_cell(row, 1, Cell(formula=f"=A{row + 1} * 2"))
+        grid.set_cell(row, 2, Cell(formula=f"=B{row + 1} / (A{row + 1} mod 4) + SUM(A1:A{row + 1})"))
+    grid.set_cell(rows, 3, Cell(formula=f"=MAX(C1:C{rows})"))
+    return grid
+
+
+def recalculated(engine_kind=None, workers: int = 1):
+    """Values and errors of a levelled grid recalculated inline, or on an engine of the given pool kind"""
+    grid = levelled_grid(300)
+    calculator = FormulaCalculator(grid)
+    calculator.rebuild_dependencies()
+    if engine_kind is None:
+        updated, errors = calculator.recalculate_all()
+    else:
+        engine = RecalcEngine(calculator, workers=workers, kind=engine_kind, min_parallel_level=10)
+        try:
+            updated, errors = engine.recalculate_all()
+        finally:
+            engine.shutdown()
+    values = {(row, col): str(cell.value) for row, col, cell in grid.iter_formula_cells()}
+    return sorted(updated), errors, values
+
+
+class RecalcEngineTest(unittest.TestCase):
+    def test_pools_agree_with_inline_recalculation(self):
+        expected = recalculated()
+        self.assertTrue(expected[1])
+        for kind, workers in (("thread", 1), ("thread", 2), ("process", 2)):
+            with self.subTest(kind=kind, workers=workers):
+                self.assertEqual(recalculated(kind, workers), expected)
+
+
+    def test_unknown_pool_kind(self):
+        with self.assertRaises(ValueError):
+            RecalcEngine(FormulaCalculator(Grid()), kind="fiber")
+
+
+    def test_engine_defaults_to_inline_evaluation(self):
+        engine = RecalcEngine(FormulaCalculator(levelled_grid(10)))
+        self.assertEqual(engine.workers, 1)
+        engine.calculator.rebuild_dependencies()
+        engine.recalculate_all()
+        self.assertIsNone(engine._executor)
+
+
+if __name__ == "__main__":
+    unittest.main()
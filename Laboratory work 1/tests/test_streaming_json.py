@@ -0,0 +1,57 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell
+from storage import GridStorage
+
+
+class StreamingJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "table.json")
+        self.grid = Grid(100, 3)
+        for row in range(100):
+            self.grid.set_value(row, 0, float(row))
+            self.grid.set_cell(row, 1, Cell(value=row * 2.0, formula=f"=A{row + 1}*2"))
+        GridStorage.save_to_json(self.path, self.grid)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_row_ordered_file_stops_after_the_visible_rows(self):
+        loader = GridStorage.open_json_streaming(self.path, stop_row=9)
+        self.assertTrue(loader.row_ordered)
+        self.assertFalse(loader.done)
+        self.assertEqual(max(row for row, _, _ in loader.grid.iter_cells()), 9)
+
+        loader.load_rest_in_background(lock=threading.RLock(), batch_cells=7).join()
+        self.assertTrue(loader.done)
+        self.assertIsNone(loader.error)
+        self.assertEqual(len(list(loader.grid.iter_cells())), 200)
+        self.assertEqual(loader.grid.get_cell(99, 1).formula, "=A100*2")
+
+
+    def test_file_in_any_other_order_is_read_at_once(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        del data["order"]
+        data["cells"] = dict(reversed(list(data["cells"].items())))
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+        loader = GridStorage.open_json_streaming(self.path, stop_row=9)
+        self.assertFalse(loader.row_ordered)
+        self.assertTrue(loader.done)
+        self.assertEqual(len(list(loader.grid.iter_cells())), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from models import Grid, Cell, REF_ERROR, CYCLE_ERROR
+from workbook import Workbook, WorkbookStorage, WORKBOOK_EXTENSION
+
+
+class WorkbookTest(unittest.TestCase):
+    def setUp(self):
+        self.workbook = Workbook()
+        data = self.workbook.add_sheet("Data", Grid(10, 3))
+        for row in range(5):
+            data.set_value(row, 0, float(row + 1))
+        self.workbook.add_sheet("Summary", Grid(10, 3))
+        self.set_formula("Summary", 0, 0, "=SUM(Data!A1:A5)")
+        self.set_formula("Summary", 1, 0, "=Data!A5 * 2")
+        self.set_formula("Summary", 2, 0, "=A1 + A2")
+        self.set_formula("Data", 0, 1, "=A1 + 100")
+        self.workbook.recalculate_sheet("Data")
+        self.workbook.recalculate_sheet("Summary")
+
+
+    def set_formula(self, sheet: str, row: int, col: int, formula: str):
+        self.workbook.grid(sheet).set_cell(row, col, Cell(formula=formula))
+        self.workbook.calculator(sheet).set_formula(row, col, formula)
+
+
+    def value(self, sheet: str, row: int, col: int):
+        return self.workbook.grid(sheet).get_value(row, col)
+
+
+    def formula(self, sheet: str, row: int, col: int) -> str:
+        return self.workbook.grid(sheet).get_cell(row, col).formula
+
+
+    def test_cross_sheet_references(self):
+        self.assertEqual([self.value("Summary", row, 0) for row in range(3)], [15.0, 10.0, 25.0])
+        self.assertEqual(self.workbook.references("Summary"), {"Data"})
+        self.assertEqual(self.workbook.referrers("Data"), ["Summary"])
+
+
+    def test_change_reaches_other_sheets(self):
+        self.workbook.grid("Data").set_value(4, 0, 50.0)
+        results = self.workbook.recalculate("Data", [(4, 0)])
+        self.assertEqual(results["Data"], ([], {}))
+        self.assertEqual(set(results["Summary"][0]), {(0, 0), (1, 0), (2, 0)})
+        self.assertEqual([self.value("Summary", row, 0) for row in range(3)], [60.0, 100.0, 160.0])
+
+
+    def test_inserted_rows_rewrite_references_on_other_sheets(self):
+        changed = self.workbook.insert_rows("Data", 2, 3)
+        self.assertEqual(self.formula("Summary", 0, 0), "=SUM(Data!A1:A8)")
+        self.assertEqual(self.formula("Summary", 1, 0), "=Data!A8 * 2")
+        # Local references of the other sheet are left alone
+        self.assertEqual(self.formula("Summary", 2, 0), "=A1 + A2")
+        self.assertEqual(changed["Summary"], {(0, 0), (1, 0)})
+        for sheet, cells in changed.items():
+            self.workbook.recalculate(sheet, cells)
+        self.assertEqual(self.value("Summary", 2, 0), 25.0)
+
+
+    def test_deleted_rows_become_ref_errors_on_other_sheets(self):
+        for sheet, cells in self.workbook.delete_rows("Data", 3, 2).items():
+            self.workbook.recalculate(sheet, cells)
+        self.assertEqual(self.formula("Summary", 0, 0), "=SUM(Data!A1:A3)")
+        self.assertEqual(self.value("Summary", 0, 0), 6.0)
+        self.assertEqual(self.formula("Summary", 1, 0), "=#REF! * 2")
+        self.assertEqual(self.value("Summary", 2, 0).code, REF_ERROR)
+
+
+    def test_removed_sheet_and_sheet_cycles(self):
+        # Summary!A3 reads Data!A5 through A1 and A2
+        self.set_formula("Data", 4, 0, "=Summary!A3")
+        results = self.workbook.recalculate("Data", [(4, 0)])
+        self.assertEqual(self.value("Data", 4, 0).code, CYCLE_ERROR)
+        self.assertEqual(self.value("Summary", 2, 0).code, CYCLE_ERROR)
+        self.assertIn((4, 0), results["Data"][1])
+
+        self.workbook.remove_sheet("Data")
+        self.assertEqual(self.value("Summary", 0, 0).code, REF_ERROR)
+        with self.assertRaises(ValueError):
+            self.workbook.add_sheet("Summary")
+        with self.assertRaises(ValueError):
+            self.workbook.add_sheet("1st sheet")
+
+
+class WorkbookStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "book" + WORKBOOK_EXTENSION)
+        workbook = Workbook()
+        data = workbook.add_sheet("Data", Grid(10, 2))
+        data.set_value(0, 0, 4.0)
+        data.set_value(1, 0, "text")
+        workbook.add_sheet("Report", Grid(5, 2))
+        workbook.add_sheet("Notes", Grid(5, 2)).set_value(0, 0, "unrelated")
+        workbook.grid("Report").set_cell(0, 0, Cell(formula="=Data!A1 * 3"))
+        workbook.calculator("Report").set_formula(0, 0, "=Data!A1 * 3")
+        workbook.recalculate_sheet("Report")
+        WorkbookStorage.save(self.path, workbook)
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_round_trip(self):
+        workbook = WorkbookStorage.open(self.path)
+        self.assertEqual(workbook.names(), ["Data", "Report", "Notes"])
+        self.assertEqual(workbook.loaded_sheets(), [])
+        self.assertEqual(workbook.grid("Report").get_value(0, 0), 12.0)
+        self.assertEqual(workbook.grid("Report").get_cell(0, 0).formula, "=Data!A1 * 3")
+        self.assertEqual(workbook.grid("Data").get_value(1, 0), "text")
+        self.assertEqual((workbook.grid("Data").rows, workbook.grid("Data").columns), (10, 2))
+
+
+    def test_sheets_are_loaded_when_a_change_needs_them(self):
+        workbook = WorkbookStorage.open(self.path)
+        workbook.grid("Data").set_value(0, 0, 5.0)
+        workbook.recalculate("Data", [(0, 0)])
+        self.assertEqual(workbook.grid("Report").get_value(0, 0), 15.0)
+        self.assertFalse(workbook.is_loaded("Notes"))
+
+        # A sheet that was never loaded is copied into the new file as it was
+        copy = os.path.join(self.directory.name, "copy" + WORKBOOK_EXTENSION)
+        WorkbookStorage.save(copy, workbook)
+        reopened = WorkbookStorage.open(copy)
+        self.assertEqual(reopened.grid("Notes").get_value(0, 0), "unrelated")
+        self.assertEqual(reopened.grid("Report").get_value(0, 0), 15.0)
+        self.assertEqual(reopened.references("Report"), {"Data"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Memory of parsed scientists: the parser dicts against a ScientistStore.
+
+Synthetic scientists are generated with the vocabularies of a real faculty list (a few
+departments, branches and degrees, unique names), or read from `--xml` with the SAX parser.
+
+    python benchmarks/memory_benchmark.py --count 1000000
+    python benchmarks/memory_benchmark.py --xml resources/example.xml
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.sax_parser import SAXParser
+from parsers.scientist_store import ScientistStore
+from parsers.indexed_dataset import IndexedDataset
+
+
+DEPARTMENTS = ["Computer Science", "Mathematics", "Physics", "Chemistry", "Biology", "History", "Philology"]
+BRANCHES = ["Algebra", "Geometry", "Optics", "Genetics", "Poetry", "Databases", "Networks", "Archaeology"]
+DEGREES = ["Candidate of Sciences", "Doctor of Sciences", "Doctor of Physics", "PhD", "Master"]
+
+
+def scientists(count):
+    """
+    Yield `count` scientist dicts as a parser builds them: every string is a fresh object.
+    """
+    rnd = random.Random(1)
+    for index in range(count):
+        start = rnd.randint(1950, 2015)
+        yield {
+            "Name": f"Scientist {index}",
+            "Faculty": {"Department": "".join(rnd.choice(DEPARTMENTS)), "Branch": "".join(rnd.choice(BRANCHES))},
+            "ScientificDegree": "".join(rnd.choice(DEGREES)),
+            "TeachingFromDates": f"{start}-{start + rnd.randint(1, 30)}",
+        }
+
+
+def measure(build):
+    """
+    Build a structure and return it with the memory it holds and the seconds it took.
+    It is built twice, as tracing allocations slows the build down severalfold.
+    """
+    start = time.perf_counter()
+    build()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--xml", help="measure the scientists of an XML file instead")
+    args = parser.parse_args()
+
+    if args.xml:
+        records = lambda: SAXParser().iter_parse(args.xml)
+    else:
+        records = lambda: scientists(args.count)
+    # Imports and parser tables allocated on first use are not part of the measurements
+    for _ in records():
+        break
+
+    dicts, dicts_size, dicts_seconds = measure(lambda: list(records()))
+    count = len(dicts)
+    del dicts
+    store, store_size, store_seconds = measure(lambda: ScientistStore(records()))
+    _, index_size, index_seconds = measure(lambda: IndexedDataset(store))
+
+    print(f"{count:,} scientists")
+    print(f"{'':>16} {'MB':>8} {'bytes/record':>13} {'build, s':>9}")
+    for name, size, seconds in (("dicts", dicts_size, dicts_seconds), ("ScientistStore", store_size, store_seconds),
+                                ("+ IndexedDataset", index_size, index_seconds)):
+        print(f"{name:>16} {size / 1e6:>8.1f} {size / count:>13.0f} {seconds:>9.2f}")
+    print(f"the dicts take {dicts_size / store_size:.1f}x the memory of the store")
+
+
+if __name__ == "__main__":
+    main()
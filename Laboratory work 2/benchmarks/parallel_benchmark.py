@@ -0,0 +1,74 @@
+"""
+Speedup of ParallelParser against its number of workers, next to the one-process parsers.
+
+A file of `--count` synthetic scientists is written to a temporary directory, unless an
+existing file is given with `--xml`.
+
+    python benchmarks/parallel_benchmark.py --count 500000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from memory_benchmark import scientists
+
+from parsers.sax_parser import SAXParser
+from parsers.linq_parser import LINQParser
+from parsers.parallel_parser import ParallelParser, CHUNK_SIZE
+
+
+def write_xml(path, count):
+    """
+    Write `count` synthetic scientists as a flat XML file.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<Scientists>\n')
+        for scientist in scientists(count):
+            faculty = scientist["Faculty"]
+            f.write(f"    <Scientist>\n        <Name>{scientist['Name']}</Name>\n"
+                    f"        <Faculty>\n            <Department>{faculty['Department']}</Department>\n"
+                    f"            <Branch>{faculty['Branch']}</Branch>\n        </Faculty>\n"
+                    f"        <ScientificDegree>{scientist['ScientificDegree']}</ScientificDegree>\n"
+                    f"        <TeachingFromDates>{scientist['TeachingFromDates']}</TeachingFromDates>\n"
+                    f"    </Scientist>\n")
+        f.write('</Scientists>\n')
+
+
+def timed(parse, path):
+    start = time.perf_counter()
+    result = parse(path)
+    return len(result), time.perf_counter() - start
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=300000)
+    parser.add_argument("--xml", help="parse an existing file instead")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, cpus}))
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    path = args.xml
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "scientists.xml")
+        write_xml(path, args.count)
+    print(f"{os.path.getsize(path) / 1e6:.1f} MB, {cpus} CPU(s), chunks of {args.chunk_size / 1e6:.1f} MB")
+
+    count, sax_seconds = timed(SAXParser().parse, path)
+    print(f"{'':>12} {'s':>8} {'speedup':>8}")
+    print(f"{'SAX':>12} {sax_seconds:>8.2f} {1:>8.2f}")
+    _, seconds = timed(LINQParser().parse, path)
+    print(f"{'LINQ':>12} {seconds:>8.2f} {sax_seconds / seconds:>8.2f}")
+    for workers in args.workers:
+        parsed, seconds = timed(ParallelParser(workers, args.chunk_size).parse, path)
+        assert parsed == count, f"{parsed} scientists parsed in parallel, {count} by SAX"
+        print(f"{f'{workers} worker(s)':>12} {seconds:>8.2f} {sax_seconds / seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
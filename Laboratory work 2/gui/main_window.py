@@ -1,14 +1,24 @@
 import os
+import pickle
+from itertools import islice
 
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from parsers.sax_parser import SAXParser
 from parsers.dom_parser import DOMParser
 from parsers.linq_parser import LINQParser
+from parsers.parallel_parser import ParallelParser
+from parsers.indexed_dataset import IndexedDataset
 from transformers.xsl_transformer import XSLTransformer
+from utils.parse_cache import ParseCache
 from pathlib import Path
 
 
+# Records taken from a stream per event loop step, and records shown in the results at most
+STREAM_BATCH = 500
+DISPLAY_LIMIT = 1000
+
+
 class MainWindow:
     """
     The main GUI window for the Scientist Personnel Analyzer application.
@@ -21,6 +31,16 @@ class MainWindow:
         self.parser_strategy = None
         self.xml_data = None
         self.filtered_data = None
+        # In streaming mode the file is read again for every search instead of being kept
+        self.xml_path = None
+        self.stream = None
+        # Parsed files are kept on disk, so opening an unchanged file again skips parsing;
+        # without a safe cache directory every file is parsed
+        try:
+            self.parse_cache = ParseCache()
+        except OSError as e:
+            messagebox.showwarning("Cache Disabled", f"Parsed files will not be cached:\n{e}")
+            self.parse_cache = None
 
         self.create_widgets()
 
@@ -44,11 +64,15 @@ class MainWindow:
         parser_frame.pack(fill="x", padx=10, pady=5)
 
         self.parser_var = tk.StringVar()
-        parser_options = ["SAX", "DOM", "LINQ"]
+        parser_options = ["SAX", "DOM", "LINQ", "Parallel"]
         self.parser_combobox = ttk.Combobox(parser_frame, textvariable=self.parser_var, values=parser_options, state="readonly")
         self.parser_combobox.set("Select Parser")
         self.parser_combobox.pack(side="left", padx=5, pady=5)
 
+        self.stream_var = tk.BooleanVar()
+        stream_check = ttk.Checkbutton(parser_frame, text="Stream large files", variable=self.stream_var)
+        stream_check.pack(side="left", padx=5, pady=5)
+
         # Frame for search parameters
         search_frame = ttk.LabelFrame(self.root, text="Search Parameters")
         search_frame.pack(fill="x", padx=10, pady=5)
@@ -83,6 +107,9 @@ class MainWindow:
         result_frame = ttk.LabelFrame(self.root, text="Search Results")
         result_frame.pack(fill="both", expand=True, padx=10, pady=5)
 
+        self.status_label = ttk.Label(result_frame, text="")
+        self.status_label.pack(fill="x", padx=5)
+
         self.result_text = tk.Text(result_frame, wrap="word")
         self.result_text.pack(fill="both", expand=True, padx=5, pady=5)
 
@@ -105,17 +132,53 @@ class MainWindow:
             self.parser_strategy = DOMParser()
         elif parser_choice == "LINQ":
             self.parser_strategy = LINQParser()
+        elif parser_choice == "Parallel":
+            self.parser_strategy = ParallelParser()
         else:
             messagebox.showerror("Parser Selection Error", "Please select a valid XML parser.")
             return
 
+        self.stop_stream()
+        if self.stream_var.get():
+            # Nothing is kept: the records are counted and the first ones shown as they are read
+            self.xml_path = file_path
+            self.xml_data = self.filtered_data = None
+            self.start_stream(self.parser_strategy.iter_parse(file_path), keep=False,
+                              title=f"{parser_choice} stream of '{os.path.basename(file_path)}'")
+            return
+
         try:
-            self.xml_data = self.parser_strategy.parse(file_path)
-            self.filtered_data = self.xml_data
-            self.display_results(self.filtered_data)
-            messagebox.showinfo("Success", f"XML file '{os.path.basename(file_path)}' loaded successfully using {parser_choice} parser.")
+            data = self.parse_cache.get(file_path) if self.parse_cache is not None else None
+            source = "from the cache"
+            if data is None:
+                signature = self.parse_cache.signature(file_path) if self.parse_cache is not None else None
+                # Indexed once, so that every search only touches the matching records
+                data = IndexedDataset(self.parser_strategy.parse(file_path))
+                if self.parse_cache is not None:
+                    self.cache_parsed(file_path, data, signature)
+                source = f"using {parser_choice} parser"
         except Exception as e:
+            # No file is loaded now: with xml_path left set, searches would stream the broken file
+            self.xml_path = self.xml_data = self.filtered_data = None
+            self.display_results([])
             messagebox.showerror("Parsing Error", f"An error occurred while parsing the XML file:\n{e}")
+            return
+
+        self.xml_path = file_path
+        self.xml_data = self.filtered_data = data
+        self.display_results(self.filtered_data)
+        messagebox.showinfo("Success", f"XML file '{os.path.basename(file_path)}' loaded successfully {source}.")
+
+
+    def cache_parsed(self, file_path, data, signature):
+        """
+        Cache the data just parsed; a failed write (a full disk, no permission) only
+        means the file is parsed again next time.
+        """
+        try:
+            self.parse_cache.put(file_path, data, signature)
+        except (OSError, pickle.PicklingError):
+            pass
 
 
     def update_search_fields(self):
@@ -143,7 +206,8 @@ class MainWindow:
         """
         Perform search on the XML data based on user input.
         """
-        if not self.xml_data:
+        streaming = self.xml_data is None and self.xml_path is not None
+        if not self.xml_data and not streaming:
             messagebox.showwarning("No Data", "Please load an XML file first.")
             return
 
@@ -158,6 +222,12 @@ class MainWindow:
             messagebox.showwarning("No Criteria", "Please enter at least one search criterion.")
             return
 
+        if streaming:
+            # Matches are kept for the export, the rest of the file is not
+            records = self.parser_strategy.iter_search(self.parser_strategy.iter_parse(self.xml_path), criteria)
+            self.start_stream(records, keep=True, title="Search")
+            return
+
         try:
             # Filter data based on criteria
             self.filtered_data = self.parser_strategy.search(self.xml_data, criteria)
@@ -167,25 +237,84 @@ class MainWindow:
             messagebox.showerror("Search Error", f"An error occurred during the search:\n{e}")
 
 
+    def start_stream(self, records, keep, title):
+        """
+        Consume a stream of scientists a batch per event loop step, so the window stays
+        responsive; the first DISPLAY_LIMIT records are shown and, if `keep`, all are kept.
+        """
+        self.stop_stream()
+        self.result_text.delete(1.0, tk.END)
+        self.stream = {"records": records, "keep": keep, "title": title, "count": 0}
+        if keep:
+            self.filtered_data = []
+        self.root.after(1, self.continue_stream)
+
+
+    def continue_stream(self):
+        """
+        Take the next batch of a running stream.
+        """
+        stream = self.stream
+        if stream is None:
+            return
+        try:
+            batch = list(islice(stream["records"], STREAM_BATCH))
+        except Exception as e:
+            self.stream = None
+            messagebox.showerror("Parsing Error", f"An error occurred while parsing the XML file:\n{e}")
+            return
+        for scientist in batch:
+            if stream["count"] < DISPLAY_LIMIT:
+                self.display_scientist(scientist)
+            stream["count"] += 1
+        if stream["keep"]:
+            self.filtered_data.extend(batch)
+        if batch:
+            self.status_label.config(text=f"{stream['title']}: {stream['count']:,} record(s) so far...")
+            self.root.after(1, self.continue_stream)
+            return
+        self.stream = None
+        shown = f", the first {DISPLAY_LIMIT:,} are shown" if stream["count"] > DISPLAY_LIMIT else ""
+        self.status_label.config(text=f"{stream['title']}: {stream['count']:,} record(s){shown}")
+
+
+    def stop_stream(self):
+        """
+        Abandon the stream being consumed, if any.
+        """
+        if self.stream is not None:
+            self.stream["records"].close()
+            self.stream = None
+        self.status_label.config(text="")
+
+
     def display_results(self, data):
         """
         Display the search results in the text widget.
         """
         self.result_text.delete(1.0, tk.END)
         for scientist in data:
-            self.result_text.insert(tk.END, f"Name: {scientist.get('Name')}\n")
-            faculty = scientist.get('Faculty', {})
-            self.result_text.insert(tk.END, f"  Department: {faculty.get('Department')}\n")
-            self.result_text.insert(tk.END, f"  Branch: {faculty.get('Branch')}\n")
-            self.result_text.insert(tk.END, f"Scientific Degree: {scientist.get('ScientificDegree')}\n")
-            self.result_text.insert(tk.END, f"Teaching From Dates: {scientist.get('TeachingFromDates')}\n")
-            self.result_text.insert(tk.END, "-"*40 + "\n")
+            self.display_scientist(scientist)
+
+
+    def display_scientist(self, scientist):
+        """
+        Append one scientist to the results.
+        """
+        self.result_text.insert(tk.END, f"Name: {scientist.get('Name')}\n")
+        faculty = scientist.get('Faculty', {})
+        self.result_text.insert(tk.END, f"  Department: {faculty.get('Department')}\n")
+        self.result_text.insert(tk.END, f"  Branch: {faculty.get('Branch')}\n")
+        self.result_text.insert(tk.END, f"Scientific Degree: {scientist.get('ScientificDegree')}\n")
+        self.result_text.insert(tk.END, f"Teaching From Dates: {scientist.get('TeachingFromDates')}\n")
+        self.result_text.insert(tk.END, "-"*40 + "\n")
 
 
     def clear_search(self):
         """
         Clear all search parameters and results.
         """
+        self.stop_stream()
         for var in self.attribute_vars.values():
             var.set(False)
         self.update_search_fields()
@@ -197,7 +326,11 @@ class MainWindow:
         """
         Export the filtered XML data as an HTML file using XSLT.
         """
-        if not self.filtered_data:
+        data = self.filtered_data
+        if data is None and self.xml_data is None and self.xml_path is not None:
+            # Streaming mode without a search: export the whole file as it is read
+            data = self.parser_strategy.iter_parse(self.xml_path)
+        elif not data:
             messagebox.showwarning("No Data", "There is no data to export.")
             return
 
@@ -211,7 +344,7 @@ class MainWindow:
         try:
             xsl_path = Path(__file__).parent.parent / "resources" / "transform.xsl"
             transformer = XSLTransformer(xsl_path) 
-            transformer.transform_to_html(self.filtered_data, file_path)
+            transformer.transform_to_html(data, file_path)
             messagebox.showinfo("Export Successful", f"Results exported successfully to '{os.path.basename(file_path)}'.")
         except Exception as e:
             messagebox.showerror("Export Error", f"An error occurred during export:\n{e}")
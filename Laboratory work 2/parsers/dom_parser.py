@@ -1,5 +1,7 @@
 import xml.dom.minidom
+import xml.dom.pulldom
 from parsers.parser_interface import ParserStrategy
+from parsers.scientist_store import ScientistStore
 
 
 class DOMParser(ParserStrategy):
@@ -9,40 +11,34 @@ class DOMParser(ParserStrategy):
 
     def parse(self, file_path):
         dom = xml.dom.minidom.parse(file_path)
-        scientists = []
-        for sci in dom.getElementsByTagName("Scientist"):
-            scientist = {}
-            scientist["Name"] = sci.getElementsByTagName("Name")[0].firstChild.nodeValue
-            faculty = {}
-            faculty["Department"] = sci.getElementsByTagName("Department")[0].firstChild.nodeValue
-            faculty["Branch"] = sci.getElementsByTagName("Branch")[0].firstChild.nodeValue
-            scientist["Faculty"] = faculty
-            scientist["ScientificDegree"] = sci.getElementsByTagName("ScientificDegree")[0].firstChild.nodeValue
-            scientist["TeachingFromDates"] = sci.getElementsByTagName("TeachingFromDates")[0].firstChild.nodeValue
-            scientists.append(scientist)
-        return scientists
+        return ScientistStore(self._scientist(sci) for sci in dom.getElementsByTagName("Scientist"))
 
 
-    def search(self, data, criteria):
+    def iter_parse(self, file_path):
         """
-        Search through the data using the given criteria.
+        Stream the file with pulldom: only the current Scientist element is expanded
+        into a DOM subtree, which is detached from the document once it was read.
         """
-        filtered = []
-        for scientist in data:
-            match = True
-            for key, value in criteria.items():
-                if key == "Faculty/Department":
-                    if scientist.get("Faculty", {}).get("Department", "").lower() != value.lower():
-                        match = False
-                        break
-                elif key == "Faculty/Branch":
-                    if scientist.get("Faculty", {}).get("Branch", "").lower() != value.lower():
-                        match = False
-                        break
-                else:
-                    if scientist.get(key, "").lower() != value.lower():
-                        match = False
-                        break
-            if match:
-                filtered.append(scientist)
-        return filtered
+        events = xml.dom.pulldom.parse(file_path)
+        for event, node in events:
+            if event == xml.dom.pulldom.START_ELEMENT and node.tagName == "Scientist":
+                events.expandNode(node)
+                # Text may arrive split across buffer boundaries
+                node.normalize()
+                yield self._scientist(node)
+                if node.parentNode is not None:
+                    node.parentNode.removeChild(node)
+                node.unlink()
+
+
+    @staticmethod
+    def _scientist(sci):
+        scientist = {}
+        scientist["Name"] = sci.getElementsByTagName("Name")[0].firstChild.nodeValue
+        faculty = {}
+        faculty["Department"] = sci.getElementsByTagName("Department")[0].firstChild.nodeValue
+        faculty["Branch"] = sci.getElementsByTagName("Branch")[0].firstChild.nodeValue
+        scientist["Faculty"] = faculty
+        scientist["ScientificDegree"] = sci.getElementsByTagName("ScientificDegree")[0].firstChild.nodeValue
+        scientist["TeachingFromDates"] = sci.getElementsByTagName("TeachingFromDates")[0].firstChild.nodeValue
+        return scientist
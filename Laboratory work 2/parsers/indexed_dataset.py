@@ -0,0 +1,158 @@
+import zlib
+from array import array
+from collections.abc import Sequence
+
+from parsers.parser_interface import field_value, matches
+from parsers.scientist_store import ScientistStore, StringColumn
+
+
+# Criteria keys answered from an index; any other key is checked on the candidates
+INDEXED_FIELDS = ("Name", "Faculty/Department", "Faculty/Branch", "ScientificDegree")
+
+
+class FieldIndex:
+    """
+    A case-folded hash index of one field. The distinct keys are numbered and found through
+    an open-addressing table of crc32 hashes (str hashes change between processes); the
+    positions of the records holding each key are stored contiguously, in document order.
+    Everything is kept in arrays and a StringColumn, so an index pickles and loads as a few
+    blocks of memory.
+    """
+
+
+    def __init__(self, values):
+        """
+        Index a column of values, one per record.
+        """
+        # key id of every record; ids are numbered in the order the keys are first seen
+        self.record_keys = array('I')
+        ids = {}
+        # Every distinct value is folded only once
+        folded = {}
+        for value in values:
+            key_id = folded.get(value)
+            if key_id is None:
+                key_id = folded[value] = ids.setdefault((value or "").casefold(), len(ids))
+            self.record_keys.append(key_id)
+        del folded
+
+        # starts[key_id]:starts[key_id + 1] are the positions of the records holding a key
+        self.starts = array('I', [0]) * (len(ids) + 1)
+        for key_id in self.record_keys:
+            self.starts[key_id + 1] += 1
+        for key_id in range(len(ids)):
+            self.starts[key_id + 1] += self.starts[key_id]
+        self.positions = array('I', [0]) * len(self.record_keys)
+        filled = self.starts[:-1]
+        for position, key_id in enumerate(self.record_keys):
+            self.positions[filled[key_id]] = position
+            filled[key_id] += 1
+
+        self.keys = StringColumn(ids)
+        # At most half of the slots are used, so probes stay short
+        self.slots = array('i', [-1]) * (1 << max(3, (2 * len(ids)).bit_length()))
+        mask = len(self.slots) - 1
+        for key_id, key in enumerate(ids):
+            slot = key_hash(key) & mask
+            while self.slots[slot] != -1:
+                slot = (slot + 1) & mask
+            self.slots[slot] = key_id
+
+
+    def lookup(self, key):
+        """
+        The id of a folded key, or None if no record holds it.
+        """
+        mask = len(self.slots) - 1
+        slot = key_hash(key) & mask
+        while True:
+            key_id = self.slots[slot]
+            if key_id == -1:
+                return None
+            if self.keys[key_id] == key:
+                return key_id
+            slot = (slot + 1) & mask
+
+
+    def count(self, key_id):
+        return self.starts[key_id + 1] - self.starts[key_id]
+
+
+    def postings(self, key_id):
+        """
+        The positions of the records holding a key, in document order.
+        """
+        return self.positions[self.starts[key_id]:self.starts[key_id + 1]]
+
+
+def key_hash(key):
+    return zlib.crc32(key.encode("utf-8"))
+
+
+class IndexedDataset:
+    """
+    Parsed scientists with case-folded hash indexes on the name, department, branch and
+    degree, built once after parsing. A posting list holds the positions of the records
+    sharing a value, in document order, so a query costs the size of its smallest
+    posting list instead of a scan of the whole dataset.
+    """
+
+
+    def __init__(self, scientists):
+        """
+        Index the scientists returned by a parser (a list or a ScientistStore).
+        """
+        self.scientists = scientists if isinstance(scientists, Sequence) else list(scientists)
+        self.indexes = {field: FieldIndex(self._column(field)) for field in INDEXED_FIELDS}
+
+
+    def _column(self, field):
+        if isinstance(self.scientists, ScientistStore):
+            return self.scientists.column(field.split("/")[-1])
+        return (field_value(scientist, field) for scientist in self.scientists)
+
+
+    def __len__(self):
+        return len(self.scientists)
+
+
+    def __iter__(self):
+        return iter(self.scientists)
+
+
+    def __getitem__(self, position):
+        return self.scientists[position]
+
+
+    def search(self, criteria):
+        """
+        Return the scientists matching every criterion (case-insensitive equality), in
+        document order. The posting lists of the indexed criteria are intersected starting
+        from the smallest one; the other criteria are checked on what remains.
+        """
+        indexed = []
+        rest = {}
+        for key, value in criteria.items():
+            index = self.indexes.get(key)
+            if index is None:
+                rest[key] = value
+                continue
+            key_id = index.lookup((value or "").casefold())
+            if key_id is None:
+                return []
+            indexed.append((index, key_id))
+        if not indexed:
+            return [scientist for scientist in self.scientists if matches(scientist, rest)]
+
+        indexed.sort(key=lambda item: item[0].count(item[1]))
+        index, key_id = indexed[0]
+        candidates = index.postings(key_id)
+        for index, key_id in indexed[1:]:
+            record_keys = index.record_keys
+            candidates = [position for position in candidates if record_keys[position] == key_id]
+            if not candidates:
+                return []
+        found = [self.scientists[position] for position in candidates]
+        if rest:
+            found = [scientist for scientist in found if matches(scientist, rest)]
+        return found
@@ -1,5 +1,6 @@
 import xml.etree.ElementTree as ET
 from parsers.parser_interface import ParserStrategy
+from parsers.scientist_store import ScientistStore
 
 
 class LINQParser(ParserStrategy):
@@ -10,31 +11,30 @@ class LINQParser(ParserStrategy):
     def parse(self, file_path):
         tree = ET.parse(file_path)
         root = tree.getroot()
-        scientists = []
-        for sci in root.findall('Scientist'):
-            scientist = {}
-            scientist["Name"] = sci.find('Name').text
-            faculty = {}
-            faculty["Department"] = sci.find('Faculty/Department').text
-            faculty["Branch"] = sci.find('Faculty/Branch').text
-            scientist["Faculty"] = faculty
-            scientist["ScientificDegree"] = sci.find('ScientificDegree').text
-            scientist["TeachingFromDates"] = sci.find('TeachingFromDates').text
-            scientists.append(scientist)
-        return scientists
+        return ScientistStore(self._scientist(sci) for sci in root.findall('Scientist'))
 
 
-    def search(self, data, criteria):
+    def iter_parse(self, file_path):
         """
-        Search through the data using the given criteria.
+        Stream the file with iterparse: every Scientist element is queried once it is
+        complete, then the root is cleared so that parsed elements do not pile up.
         """
-        # Using list comprehensions for LINQ-like querying
-        filtered = data
-        for key, value in criteria.items():
-            if key == "Faculty/Department":
-                filtered = [s for s in filtered if s.get("Faculty", {}).get("Department", "").lower() == value.lower()]
-            elif key == "Faculty/Branch":
-                filtered = [s for s in filtered if s.get("Faculty", {}).get("Branch", "").lower() == value.lower()]
-            else:
-                filtered = [s for s in filtered if s.get(key, "").lower() == value.lower()]
-        return filtered
+        events = ET.iterparse(file_path, events=("start", "end"))
+        _, root = next(events)
+        for event, elem in events:
+            if event == "end" and elem.tag == "Scientist":
+                yield self._scientist(elem)
+                root.clear()
+
+
+    @staticmethod
+    def _scientist(sci):
+        scientist = {}
+        scientist["Name"] = sci.find('Name').text
+        faculty = {}
+        faculty["Department"] = sci.find('Faculty/Department').text
+        faculty["Branch"] = sci.find('Faculty/Branch').text
+        scientist["Faculty"] = faculty
+        scientist["ScientificDegree"] = sci.find('ScientificDegree').text
+        scientist["TeachingFromDates"] = sci.find('TeachingFromDates').text
+        return scientist
@@ -0,0 +1,168 @@
+import mmap
+import os
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from parsers.parser_interface import ParserStrategy
+from parsers.linq_parser import LINQParser
+from parsers.scientist_store import ScientistStore
+
+
+# Approximate size of the byte range parsed by one task
+CHUNK_SIZE = 8 * 1024 * 1024
+
+START_TAG = b"<Scientist"
+END_TAG = b"</Scientist>"
+# Bytes that may follow START_TAG in a Scientist start tag (and not in "<Scientists>")
+TAG_END_BYTES = b"> \t\r\n/"
+
+
+def find_start_tag(mm, position, end=None):
+    """
+    The offset of the next Scientist start tag from `position`, or -1.
+    """
+    end = len(mm) if end is None else end
+    while True:
+        found = mm.find(START_TAG, position, end)
+        if found == -1 or found + len(START_TAG) >= end:
+            return -1
+        if mm[found + len(START_TAG)] in TAG_END_BYTES:
+            return found
+        position = found + 1
+
+
+def root_start_end(mm):
+    """
+    The offset just past the root start tag, skipping the declaration, comments and a
+    doctype before it, or -1.
+    """
+    position = 0
+    while True:
+        position = mm.find(b"<", position)
+        if position == -1:
+            return -1
+        if mm[position:position + 2] == b"<?":
+            position = mm.find(b"?>", position)
+        elif mm[position:position + 4] == b"<!--":
+            position = mm.find(b"-->", position)
+        elif mm[position:position + 2] == b"<!":
+            # A doctype, which may have an internal subset in brackets
+            close = mm.find(b">", position)
+            bracket = mm.find(b"[", position, close)
+            position = mm.find(b"]", bracket) if bracket != -1 else close
+        else:
+            close = mm.find(b">", position)
+            return close + 1 if close != -1 else -1
+        if position == -1:
+            return -1
+
+
+def chunk_ranges(mm, chunk_size=CHUNK_SIZE):
+    """
+    Split a file of flat Scientist elements into byte ranges that start on a Scientist
+    start tag. Returns the prolog before the first scientist (declaration and root start
+    tag), the ranges and the epilogue after the last one, or None if there is no scientist.
+    """
+    root_end = root_start_end(mm)
+    first = find_start_tag(mm, root_end) if root_end != -1 else -1
+    last = mm.rfind(END_TAG)
+    if first == -1 or last < first:
+        return None
+    end = last + len(END_TAG)
+    ranges = []
+    start = first
+    while start < end:
+        following = find_start_tag(mm, start + chunk_size, end) if start + chunk_size < end else -1
+        if following == -1:
+            ranges.append((start, end))
+            break
+        ranges.append((start, following))
+        start = following
+    return mm[:first], ranges, mm[end:]
+
+
+def parse_chunk(file_path, start, end, prolog, epilogue):
+    """
+    Parse the scientists in a byte range of the file (run in a worker process). The range is
+    wrapped in the prolog and epilogue of the file so that it reads as a whole document.
+    """
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    root = ET.fromstring(prolog + data + epilogue)
+    # The same selection as LINQParser.parse, which parses files that cannot be split
+    return ScientistStore(LINQParser._scientist(sci) for sci in root.findall('Scientist'))
+
+
+class ParallelParser(ParserStrategy):
+    """
+    Parses large files of flat Scientist elements on several cores: the file is scanned
+    through mmap for Scientist start tags, split into byte ranges of about `chunk_size`
+    and every range is parsed in a process pool. Results are merged in document order.
+    Files that cannot be split are parsed in this process.
+    """
+
+
+    def __init__(self, workers=None, chunk_size=CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+
+    def tasks(self, file_path):
+        """
+        The arguments of parse_chunk for every range of the file, or None if it cannot be split.
+        """
+        if os.path.getsize(file_path) == 0:
+            return None
+        with open(file_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                chunks = chunk_ranges(mm, self.chunk_size)
+        if chunks is None:
+            return None
+        prolog, ranges, epilogue = chunks
+        return [(file_path, start, end, prolog, epilogue) for start, end in ranges]
+
+
+    def parse(self, file_path):
+        store = ScientistStore()
+        for chunk in self.iter_chunks(file_path):
+            store.extend_store(chunk)
+        return store
+
+
+    def iter_parse(self, file_path):
+        """
+        Yield the scientists chunk by chunk; at most two chunks per worker are parsed ahead.
+        """
+        for chunk in self.iter_chunks(file_path):
+            yield from chunk
+
+
+    def iter_chunks(self, file_path):
+        """
+        Yield a ScientistStore for every range of the file, in document order.
+        """
+        tasks = self.tasks(file_path)
+        if tasks is None:
+            yield LINQParser().parse(file_path)
+            return
+        if self.workers == 1 or len(tasks) == 1:
+            for task in tasks:
+                yield parse_chunk(*task)
+            return
+        executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            pending = deque()
+            for task in tasks:
+                pending.append(executor.submit(parse_chunk, *task))
+                if len(pending) >= 2 * self.workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        except BaseException:
+            # Closed early (e.g. a stopped stream) or failed: drop the queued chunks
+            # instead of waiting for them to be parsed
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        executor.shutdown()
@@ -10,14 +10,59 @@ class ParserStrategy(ABC):
     @abstractmethod
     def parse(self, file_path):
         """
-        Parse the XML file and return the data in a structured format.
+        Parse the XML file and return the scientists as a ScientistStore, a compact
+        sequence of read-only dict-like records.
         """
         pass
 
 
     @abstractmethod
-    def search(self, data, criteria):
+    def iter_parse(self, file_path):
         """
-        Search the parsed data based on the given criteria.
+        Yield the scientists of the XML file one at a time. Records already yielded are
+        not kept, so memory stays bounded whatever the size of the file.
         """
         pass
+
+
+    def search(self, data, criteria):
+        """
+        Search the parsed data based on the given criteria. An IndexedDataset answers
+        from its indexes; any other sequence of scientists is scanned.
+        """
+        # Imported here: indexed_dataset itself imports this module
+        from parsers.indexed_dataset import IndexedDataset
+        if isinstance(data, IndexedDataset):
+            return data.search(criteria)
+        return list(self.iter_search(data, criteria))
+
+
+    def iter_search(self, scientists, criteria):
+        """
+        Yield the scientists matching every criterion. `scientists` can be the stream
+        returned by iter_parse, so a file can be searched without loading it.
+        """
+        for scientist in scientists:
+            if matches(scientist, criteria):
+                yield scientist
+
+
+def field_value(scientist, key):
+    """
+    The value of a criteria key for a scientist ("Faculty/Department" reads the nested faculty).
+    """
+    if key == "Faculty/Department":
+        return scientist.get("Faculty", {}).get("Department", "")
+    if key == "Faculty/Branch":
+        return scientist.get("Faculty", {}).get("Branch", "")
+    return scientist.get(key, "")
+
+
+def matches(scientist, criteria):
+    """
+    Check a scientist against the criteria (case-insensitive equality of every field).
+    """
+    for key, value in criteria.items():
+        if (field_value(scientist, key) or "").casefold() != value.casefold():
+            return False
+    return True
@@ -1,44 +1,53 @@
 import xml.sax
 from parsers.parser_interface import ParserStrategy
+from parsers.scientist_store import ScientistStore
+
+
+# Size of the pieces fed to the incremental SAX parser by iter_parse
+FEED_SIZE = 64 * 1024
+
+SCIENTIST_FIELDS = {"Name", "ScientificDegree", "TeachingFromDates"}
+FACULTY_FIELDS = {"Department", "Branch"}
 
 
 class SAXHandler(xml.sax.ContentHandler):
     """
     Custom SAX handler to parse scientist data.
+    Completed scientists are appended to `scientists` (a list by default, which a
+    streaming reader empties as it goes, or a ScientistStore).
     """
-    def __init__(self):
+    def __init__(self, scientists=None):
         self.current_element = ""
         self.current_scientist = {}
         self.faculty = {}
-        self.scientists = []
+        self.scientists = scientists if scientists is not None else []
+        # Text of the current field, which SAX may deliver in several pieces
+        self.text = []
 
 
     def startElement(self, tag, attributes):
         self.current_element = tag
+        self.text = []
         if tag == "Scientist":
             self.current_scientist = {}
             self.faculty = {}
 
 
     def endElement(self, tag):
-        if tag == "Faculty":
+        if tag in SCIENTIST_FIELDS:
+            self.current_scientist[tag] = "".join(self.text).strip()
+        elif tag in FACULTY_FIELDS:
+            self.faculty[tag] = "".join(self.text).strip()
+        elif tag == "Faculty":
             self.current_scientist["Faculty"] = self.faculty
-        if tag == "Scientist":
+        elif tag == "Scientist":
             self.scientists.append(self.current_scientist)
         self.current_element = ""
 
 
     def characters(self, content):
-        if self.current_element == "Name":
-            self.current_scientist["Name"] = content.strip()
-        elif self.current_element == "Department":
-            self.faculty["Department"] = content.strip()
-        elif self.current_element == "Branch":
-            self.faculty["Branch"] = content.strip()
-        elif self.current_element == "ScientificDegree":
-            self.current_scientist["ScientificDegree"] = content.strip()
-        elif self.current_element == "TeachingFromDates":
-            self.current_scientist["TeachingFromDates"] = content.strip()
+        if self.current_element in SCIENTIST_FIELDS or self.current_element in FACULTY_FIELDS:
+            self.text.append(content)
 
 
 class SAXParser(ParserStrategy):
@@ -48,31 +57,26 @@ class SAXParser(ParserStrategy):
 
 
     def parse(self, file_path):
-        handler = SAXHandler()
+        handler = SAXHandler(ScientistStore())
         xml.sax.parse(file_path, handler)
         return handler.scientists
 
 
-    def search(self, data, criteria):
+    def iter_parse(self, file_path):
         """
-        Search through the data using the given criteria.
+        Feed the file to an incremental SAX parser piece by piece and yield the
+        scientists completed by each piece, so at most one piece worth is held.
         """
-        filtered = []
-        for scientist in data:
-            match = True
-            for key, value in criteria.items():
-                if key == "Faculty/Department":
-                    if scientist.get("Faculty", {}).get("Department", "").lower() != value.lower():
-                        match = False
-                        break
-                elif key == "Faculty/Branch":
-                    if scientist.get("Faculty", {}).get("Branch", "").lower() != value.lower():
-                        match = False
-                        break
-                else:
-                    if scientist.get(key, "").lower() != value.lower():
-                        match = False
-                        break
-            if match:
-                filtered.append(scientist)
-        return filtered
+        handler = SAXHandler()
+        parser = xml.sax.make_parser()
+        parser.setContentHandler(handler)
+        with open(file_path, 'rb') as f:
+            while True:
+                data = f.read(FEED_SIZE)
+                if not data:
+                    break
+                parser.feed(data)
+                completed, handler.scientists = handler.scientists, []
+                yield from completed
+        parser.close()
+        yield from handler.scientists
@@ -0,0 +1,226 @@
+from array import array
+from collections.abc import Mapping, Sequence
+
+
+# Fields taken from small vocabularies, stored as codes into a list of distinct values
+CODED_FIELDS = ("Department", "Branch", "ScientificDegree", "TeachingFromDates")
+SCIENTIST_KEYS = ("Name", "Faculty", "ScientificDegree", "TeachingFromDates")
+# Strings appended to a StringColumn are joined in chunks of this many
+STRING_CHUNK = 4096
+
+
+class StringColumn(Sequence):
+    """
+    A column of strings kept as one string and the offsets of its items, which takes a few
+    bytes per item instead of a string object each and pickles as a single block.
+    A None item is stored as an empty string with its position kept in `missing`, so that
+    it reads back as None.
+    """
+
+
+    def __init__(self, values=()):
+        self.text = ""
+        self.offsets = array('Q', [0])
+        self.missing = set()
+        # Appended strings not yet joined to the text, joined in chunks while they come
+        self.chunks = []
+        self.pending = []
+        for value in values:
+            self.append(value)
+
+
+    def append(self, value):
+        if value is None:
+            self.missing.add(len(self))
+            value = ""
+        self.pending.append(value)
+        self.offsets.append(self.offsets[-1] + len(value))
+        if len(self.pending) >= STRING_CHUNK:
+            self.chunks.append("".join(self.pending))
+            self.pending = []
+
+
+    def flush(self):
+        if self.chunks or self.pending:
+            self.text = "".join([self.text] + self.chunks + self.pending)
+            self.chunks = []
+            self.pending = []
+
+
+    def extend_column(self, other):
+        """
+        Append every string of another column, copying its text in one piece.
+        """
+        other.flush()
+        self.chunks.append("".join(self.pending))
+        self.chunks.append(other.text)
+        self.pending = []
+        self.missing.update(position + len(self) for position in other.missing)
+        base = self.offsets[-1]
+        self.offsets.extend(offset + base for offset in other.offsets[1:])
+
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("string column index out of range")
+        if position in self.missing:
+            return None
+        self.flush()
+        return self.text[self.offsets[position]:self.offsets[position + 1]]
+
+
+    def __iter__(self):
+        self.flush()
+        text, offsets, missing = self.text, self.offsets, self.missing
+        for position in range(len(self)):
+            yield None if position in missing else text[offsets[position]:offsets[position + 1]]
+
+
+    def __getstate__(self):
+        self.flush()
+        return self.__dict__
+
+
+class Vocabulary:
+    """
+    The distinct values of a column; every value is stored once and referred to by its code.
+    """
+
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ScientistStore(Sequence):
+    """
+    Columnar storage of parsed scientists: names are kept in a StringColumn and every other
+    field as 4-byte codes into its vocabulary, instead of two dicts and five strings per record.
+    Indexing and iteration give ScientistView objects that read like the parser dicts.
+    """
+
+
+    def __init__(self, scientists=()):
+        """
+        Store the scientists (dicts in the parser format) of any iterable.
+        """
+        self.names = StringColumn()
+        self.vocabularies = {field: Vocabulary() for field in CODED_FIELDS}
+        self.codes = {field: array('I') for field in CODED_FIELDS}
+        self.extend(scientists)
+
+
+    def append(self, scientist):
+        """
+        Add a scientist given as a dict in the parser format.
+        """
+        faculty = scientist.get("Faculty", {})
+        self.names.append(scientist.get("Name"))
+        self.codes["Department"].append(self.vocabularies["Department"].encode(faculty.get("Department")))
+        self.codes["Branch"].append(self.vocabularies["Branch"].encode(faculty.get("Branch")))
+        for field in ("ScientificDegree", "TeachingFromDates"):
+            self.codes[field].append(self.vocabularies[field].encode(scientist.get(field)))
+
+
+    def extend(self, scientists):
+        for scientist in scientists:
+            self.append(scientist)
+
+
+    def extend_store(self, other):
+        """
+        Append the scientists of another store, translating its codes to this store's vocabularies.
+        """
+        self.names.extend_column(other.names)
+        for field in CODED_FIELDS:
+            vocabulary = self.vocabularies[field]
+            translated = [vocabulary.encode(value) for value in other.vocabularies[field].values]
+            self.codes[field].extend(translated[code] for code in other.codes[field])
+
+
+    def __len__(self):
+        return len(self.names)
+
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [ScientistView(self, index) for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("scientist index out of range")
+        return ScientistView(self, position)
+
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield ScientistView(self, position)
+
+
+    def value(self, position, field):
+        """
+        The value of a field ("Name" or one of CODED_FIELDS) of one scientist.
+        """
+        if field == "Name":
+            return self.names[position]
+        return self.vocabularies[field].values[self.codes[field][position]]
+
+
+    def column(self, field):
+        """
+        Iterate over the values of a field for every scientist, without building views.
+        """
+        if field == "Name":
+            return iter(self.names)
+        values = self.vocabularies[field].values
+        return (values[code] for code in self.codes[field])
+
+
+class ScientistView(Mapping):
+    """
+    A read-only dict-like view of one stored scientist, with the keys and the nested
+    "Faculty" dict of the parser format; it compares equal to the dict it was made from.
+    """
+    __slots__ = ('store', 'position')
+
+
+    def __init__(self, store, position):
+        self.store = store
+        self.position = position
+
+
+    def __getitem__(self, key):
+        if key == "Faculty":
+            return {"Department": self.store.value(self.position, "Department"),
+                    "Branch": self.store.value(self.position, "Branch")}
+        if key in SCIENTIST_KEYS:
+            return self.store.value(self.position, key)
+        raise KeyError(key)
+
+
+    def __iter__(self):
+        return iter(SCIENTIST_KEYS)
+
+
+    def __len__(self):
+        return len(SCIENTIST_KEYS)
+
+
+    def __repr__(self):
+        return repr(dict(self))
@@ -0,0 +1,71 @@
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.indexed_dataset import FieldIndex, IndexedDataset
+from parsers.parser_interface import matches
+from parsers.scientist_store import ScientistStore
+
+
+def scientist(number):
+    return {"Name": f"Scientist {number % 40}",
+            "Faculty": {"Department": ["Physics", "Chemistry", "Mathematics"][number % 3],
+                        "Branch": ["Optics", "Algebra"][number % 2]},
+            "ScientificDegree": ["PhD", "Doctor of Sciences"][number % 5 == 0],
+            "TeachingFromDates": str(1900 + number % 7)}
+
+
+class FieldIndexTest(unittest.TestCase):
+    def test_postings_are_in_document_order(self):
+        index = FieldIndex(["b", "A", None, "a", "B", "c"])
+        self.assertEqual(list(index.postings(index.lookup("a"))), [1, 3])
+        self.assertEqual(list(index.postings(index.lookup("b"))), [0, 4])
+        self.assertEqual(list(index.postings(index.lookup(""))), [2])
+        self.assertEqual(index.count(index.lookup("c")), 1)
+        self.assertIsNone(index.lookup("d"))
+
+
+    def test_many_keys_are_all_found(self):
+        keys = [f"key {number}" for number in range(5000)]
+        index = FieldIndex(keys)
+        for position, key in enumerate(keys):
+            self.assertEqual(list(index.postings(index.lookup(key))), [position])
+
+
+class IndexedDatasetTest(unittest.TestCase):
+    def setUp(self):
+        self.scientists = [scientist(number) for number in range(300)]
+        self.datasets = {"list": IndexedDataset(self.scientists),
+                         "store": IndexedDataset(ScientistStore(self.scientists))}
+
+
+    def test_search_matches_a_scan(self):
+        criteria_list = [
+            {"Name": "scientist 3"},
+            {"Faculty/Department": "PHYSICS", "Faculty/Branch": "optics"},
+            {"Faculty/Department": "Chemistry", "ScientificDegree": "Doctor of Sciences"},
+            {"TeachingFromDates": "1903"},
+            {"Name": "Scientist 3", "TeachingFromDates": "1905"},
+            {"Name": "nobody"},
+            {"Faculty/Department": "Physics", "Faculty/Branch": "Algebra", "Name": "Scientist 2"},
+        ]
+        for criteria in criteria_list:
+            expected = [found for found in self.scientists if matches(found, criteria)]
+            for kind, dataset in self.datasets.items():
+                with self.subTest(criteria=criteria, dataset=kind):
+                    self.assertEqual(list(dataset.search(criteria)), expected)
+
+
+    def test_dataset_survives_pickling(self):
+        for kind, dataset in self.datasets.items():
+            with self.subTest(dataset=kind):
+                copy = pickle.loads(pickle.dumps(dataset, protocol=pickle.HIGHEST_PROTOCOL))
+                self.assertEqual(list(copy.search({"Faculty/Branch": "optics"})),
+                                 list(dataset.search({"Faculty/Branch": "optics"})))
+
+
+if __name__ == "__main__":
+    unittest.main()
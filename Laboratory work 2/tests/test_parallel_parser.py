@@ -0,0 +1,87 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.linq_parser import LINQParser
+from parsers.parallel_parser import ParallelParser, chunk_ranges, root_start_end
+
+
+SCIENTIST = ("<Scientist><Name>{number}</Name><Faculty><Department>Physics</Department>"
+             "<Branch>Optics</Branch></Faculty><ScientificDegree>PhD</ScientificDegree>"
+             "<TeachingFromDates>1909-1955</TeachingFromDates></Scientist>\n")
+
+
+def document(count, prolog=""):
+    return (f'<?xml version="1.0"?>\n{prolog}<Scientists>\n'
+            + "".join(SCIENTIST.format(number=number) for number in range(count)) + "</Scientists>\n").encode()
+
+
+class ChunkRangesTest(unittest.TestCase):
+    def test_ranges_start_on_scientist_tags_and_cover_every_record(self):
+        data = document(50)
+        prolog, ranges, epilogue = chunk_ranges(data, chunk_size=1000)
+        self.assertGreater(len(ranges), 2)
+        self.assertTrue(prolog.endswith(b"<Scientists>\n"))
+        self.assertEqual(epilogue, b"\n</Scientists>\n")
+        for (start, end), (following, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, following)
+        self.assertTrue(all(data[start:start + 11] == b"<Scientist>" for start, _ in ranges))
+        self.assertEqual(sum(data[start:end].count(b"</Scientist>") for start, end in ranges), 50)
+
+
+    def test_prolog_markup_is_skipped(self):
+        prolog = ("<!-- <Scientist> in a comment -->\n"
+                  "<!DOCTYPE Scientists [<!ELEMENT Scientist ANY> <!-- <Scientist> -->]>\n")
+        data = document(3, prolog)
+        self.assertEqual(data[root_start_end(data) - len(b"<Scientists>"):root_start_end(data)], b"<Scientists>")
+        prolog_bytes, ranges, _ = chunk_ranges(data, chunk_size=10)
+        self.assertEqual(len(ranges), 3)
+        self.assertTrue(prolog_bytes.endswith(b"<Scientists>\n"))
+
+
+    def test_file_without_scientists_cannot_be_split(self):
+        self.assertIsNone(chunk_ranges(b'<?xml version="1.0"?>\n<Scientists></Scientists>\n'))
+
+
+class ParallelParserTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "scientists.xml")
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def write(self, data):
+        with open(self.path, "wb") as f:
+            f.write(data)
+
+
+    def test_parse_agrees_with_a_single_process(self):
+        self.write(document(200))
+        expected = list(LINQParser().parse(self.path))
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                self.assertEqual(list(ParallelParser(workers=workers, chunk_size=2000).parse(self.path)), expected)
+
+
+    def test_file_that_cannot_be_split_is_parsed_whole(self):
+        self.write(b'<?xml version="1.0"?>\n<Scientists></Scientists>\n')
+        self.assertEqual(len(ParallelParser(workers=2).parse(self.path)), 0)
+
+
+    def test_closed_stream_ends(self):
+        self.write(document(2000))
+        stream = ParallelParser(workers=2, chunk_size=20000).iter_parse(self.path)
+        self.assertEqual(next(stream)["Name"], "0")
+        stream.close()
+        with self.assertRaises(StopIteration):
+            next(stream)
+
+
+if __name__ == "__main__":
+    unittest.main()
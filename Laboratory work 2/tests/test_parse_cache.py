@@ -0,0 +1,154 @@
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.linq_parser import LINQParser
+from parsers.indexed_dataset import IndexedDataset
+from utils.parse_cache import ParseCache, CACHE_EXTENSION, CACHE_MAGIC
+
+
+class FailsToLoad:
+    """
+    Unpickles by calling int() on a string that is not a number, i.e. raises ValueError.
+    """
+
+
+    def __reduce__(self):
+        return int, ("not a number",)
+
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Scientists>
+    <Scientist>
+        <Name>{name}</Name>
+        <Faculty><Department>Physics</Department><Branch>Optics</Branch></Faculty>
+        <ScientificDegree>PhD</ScientificDegree>
+        <TeachingFromDates>1909-1955</TeachingFromDates>
+    </Scientist>
+</Scientists>
+"""
+
+
+class ParseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_directory = os.path.join(self.directory.name, "cache")
+        self.cache = ParseCache(self.cache_directory)
+        self.path = os.path.join(self.directory.name, "scientists.xml")
+        self.write("Albert Einstein")
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def write(self, name, mtime=None):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(XML.format(name=name))
+        if mtime is not None:
+            os.utime(self.path, ns=(mtime, mtime))
+
+
+    def parse_and_put(self, cache=None):
+        cache = cache or self.cache
+        signature = cache.signature(self.path)
+        data = IndexedDataset(LINQParser().parse(self.path))
+        cache.put(self.path, data, signature)
+        return data
+
+
+    def entries(self):
+        return [name for name in os.listdir(self.cache_directory) if name.endswith(CACHE_EXTENSION)]
+
+
+    def test_unchanged_file_is_served_from_the_cache(self):
+        self.assertIsNone(self.cache.get(self.path))
+        self.parse_and_put()
+        cached = self.cache.get(self.path)
+        self.assertIsInstance(cached, IndexedDataset)
+        self.assertEqual([scientist["Name"] for scientist in cached.search({"Name": "albert einstein"})],
+                         ["Albert Einstein"])
+
+
+    def test_changed_file_invalidates_its_entry(self):
+        self.parse_and_put()
+        self.write("Marie Curie")
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(self.entries(), [])
+
+
+    def test_content_check_catches_a_change_that_keeps_size_and_time(self):
+        cache = ParseCache(self.cache_directory, verify_content=True)
+        mtime = os.stat(self.path).st_mtime_ns
+        self.parse_and_put(cache)
+        # The same length and modification time, different content
+        self.write("Albert Einsteim", mtime=mtime)
+        self.assertIsNotNone(self.cache.get(self.path))
+        self.assertIsNone(cache.get(self.path))
+
+
+    def test_file_changed_while_parsing_is_not_served(self):
+        signature = self.cache.signature(self.path)
+        self.write("Marie Curie")
+        self.cache.put(self.path, IndexedDataset(LINQParser().parse(self.path)), signature)
+        self.assertIsNone(self.cache.get(self.path))
+
+
+    def test_unreadable_entry_is_dropped(self):
+        self.parse_and_put()
+        with open(self.cache.entry_path(self.path), "wb") as f:
+            f.write(b"not a cache entry")
+        self.assertIsNone(self.cache.get(self.path))
+        self.assertEqual(self.entries(), [])
+
+
+    def test_corrupt_entries_are_dropped(self):
+        signature = pickle.dumps(self.cache.signature(self.path))
+        corrupt = {
+            "truncated": CACHE_MAGIC + signature[:-3],
+            "signature of the wrong type": CACHE_MAGIC + pickle.dumps(["path", "size"]),
+            "data that raises when unpickled": CACHE_MAGIC + signature + pickle.dumps([FailsToLoad()]),
+            "truncated data": CACHE_MAGIC + signature + pickle.dumps(list(range(100)))[:-20],
+        }
+        for kind, content in corrupt.items():
+            with self.subTest(kind=kind):
+                self.parse_and_put()
+                with open(self.cache.entry_path(self.path), "wb") as f:
+                    f.write(content)
+                self.assertIsNone(self.cache.get(self.path))
+                self.assertEqual(self.entries(), [])
+
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.parse_and_put()
+        entry_size = self.cache.size()
+        other = os.path.join(self.directory.name, "other.xml")
+        with open(other, "w", encoding="utf-8") as f:
+            f.write(XML.format(name="Marie Curie"))
+        small = ParseCache(self.cache_directory, max_bytes=entry_size + entry_size // 2)
+        small.put(other, IndexedDataset(LINQParser().parse(other)), small.signature(other))
+        self.assertIsNone(small.get(self.path))
+        self.assertIsNotNone(small.get(other))
+
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions")
+    def test_directory_writable_by_others_is_refused(self):
+        os.chmod(self.cache_directory, 0o777)
+        with self.assertRaises(PermissionError):
+            ParseCache(self.cache_directory)
+
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions")
+    def test_symlinked_directory_is_refused(self):
+        link = os.path.join(self.directory.name, "link")
+        os.symlink(self.cache_directory, link)
+        with self.assertRaises(PermissionError):
+            ParseCache(link)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.sax_parser import SAXParser
+from parsers.dom_parser import DOMParser
+from parsers.linq_parser import LINQParser
+from parsers.parallel_parser import ParallelParser
+from parsers.indexed_dataset import IndexedDataset
+
+
+DEPARTMENTS = ["Physics", "Chemistry", "Mathematics"]
+BRANCHES = ["Optics", "Algebra", "Radioactivity", "Geometry"]
+DEGREES = ["Doctor of Physics", "PhD", "Candidate of Sciences"]
+
+CRITERIA = [
+    {"Name": "Scientist 7"},
+    {"Name": "scientist 7"},
+    {"Faculty/Department": "physics"},
+    {"Faculty/Department": "Chemistry", "Faculty/Branch": "algebra"},
+    {"Faculty/Department": "Chemistry", "ScientificDegree": "phd", "TeachingFromDates": "1907-1950"},
+    {"TeachingFromDates": "1900-1943"},
+    {"Name": "Nobody"},
+    {"Faculty/Branch": "Optics", "Name": "Scientist 8"},
+    {"Name": "Żaneta Łęcka"},
+]
+
+
+def scientist_xml(number):
+    """
+    A Scientist element with values repeated across the records, as in a faculty list.
+    """
+    name = "Żaneta Łęcka" if number == 3 else f"Scientist {number}"
+    return (f"<Scientist><Name>{name}</Name><Faculty>"
+            f"<Department>{DEPARTMENTS[number % len(DEPARTMENTS)]}</Department>"
+            f"<Branch>{BRANCHES[number % len(BRANCHES)]}</Branch></Faculty>"
+            f"<ScientificDegree>{DEGREES[number % len(DEGREES)]}</ScientificDegree>"
+            f"<TeachingFromDates>{1900 + number % 10}-{1943 + number % 10}</TeachingFromDates>"
+            f"</Scientist>\n")
+
+
+def as_dicts(scientists):
+    return [{"Name": scientist.get("Name"), "Faculty": dict(scientist.get("Faculty", {})),
+             "ScientificDegree": scientist.get("ScientificDegree"),
+             "TeachingFromDates": scientist.get("TeachingFromDates")} for scientist in scientists]
+
+
+class ParserAgreementTest(unittest.TestCase):
+    """
+    Every parser, whole-file or streaming, must read the same scientists and find the
+    same ones for a search, indexed or not.
+    """
+
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, "scientists.xml")
+        with open(cls.path, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write("<!-- a <Scientist> in a comment is not a record -->\n<Scientists>\n")
+            for number in range(60):
+                f.write(scientist_xml(number))
+            f.write("</Scientists>\n")
+        cls.parsers = {"SAX": SAXParser(), "DOM": DOMParser(), "LINQ": LINQParser(),
+                       "Parallel": ParallelParser(workers=2, chunk_size=500)}
+        cls.expected = as_dicts(LINQParser().parse(cls.path))
+
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+
+    def test_file_is_split_into_several_chunks(self):
+        self.assertGreater(len(self.parsers["Parallel"].tasks(self.path)), 2)
+
+
+    def test_parse_and_iter_parse_agree(self):
+        self.assertEqual(len(self.expected), 60)
+        self.assertEqual(self.expected[3]["Name"], "Żaneta Łęcka")
+        for name, parser in self.parsers.items():
+            with self.subTest(parser=name):
+                self.assertEqual(as_dicts(parser.parse(self.path)), self.expected)
+                self.assertEqual(as_dicts(parser.iter_parse(self.path)), self.expected)
+
+
+    def test_searches_agree(self):
+        for criteria in CRITERIA:
+            expected = None
+            for name, parser in self.parsers.items():
+                data = parser.parse(self.path)
+                results = {
+                    "search": parser.search(data, criteria),
+                    "indexed search": parser.search(IndexedDataset(data), criteria),
+                    "list search": parser.search(list(data), criteria),
+                    "stream search": parser.iter_search(parser.iter_parse(self.path), criteria),
+                }
+                for kind, found in results.items():
+                    with self.subTest(parser=name, criteria=criteria, kind=kind):
+                        found = as_dicts(found)
+                        if expected is None:
+                            expected = found
+                        self.assertEqual(found, expected)
+            self.assertEqual(expected == [], criteria == {"Name": "Nobody"}, criteria)
+
+
+    def test_closed_stream_stops_the_parser(self):
+        for name, parser in self.parsers.items():
+            with self.subTest(parser=name):
+                stream = parser.iter_parse(self.path)
+                self.assertEqual(as_dicts([next(stream)]), self.expected[:1])
+                stream.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
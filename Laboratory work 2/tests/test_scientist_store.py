@@ -0,0 +1,74 @@
+import os
+import pickle
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from parsers.scientist_store import ScientistStore, StringColumn, STRING_CHUNK
+
+
+def scientist(name, department="Physics", branch="Optics", degree="PhD", dates="1909-1955"):
+    return {"Name": name, "Faculty": {"Department": department, "Branch": branch},
+            "ScientificDegree": degree, "TeachingFromDates": dates}
+
+
+class StringColumnTest(unittest.TestCase):
+    def test_items_read_back_across_chunks(self):
+        values = [f"name {number}" if number % 9 else None for number in range(STRING_CHUNK * 2 + 5)]
+        column = StringColumn(values)
+        self.assertEqual(len(column), len(values))
+        self.assertEqual(list(column), values)
+        self.assertEqual(column[-1], values[-1])
+        self.assertIsNone(column[0])
+        self.assertEqual(column[1:3], values[1:3])
+        with self.assertRaises(IndexError):
+            column[len(values)]
+
+
+    def test_extend_column_keeps_pending_items(self):
+        column = StringColumn(["a", None, "bb"])
+        column.extend_column(StringColumn(["ccc", "", None, "d"]))
+        column.append("e")
+        self.assertEqual(list(column), ["a", None, "bb", "ccc", "", None, "d", "e"])
+
+
+class ScientistStoreTest(unittest.TestCase):
+    def test_views_equal_the_parsed_dicts(self):
+        scientists = [scientist("Albert Einstein"), scientist("Marie Curie", "Chemistry", "Radioactivity")]
+        store = ScientistStore(scientists)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(list(store), scientists)
+        self.assertEqual(store[-1], scientists[-1])
+        self.assertEqual(store[1]["Faculty"]["Branch"], "Radioactivity")
+        self.assertEqual(store[0].get("Missing", "default"), "default")
+        self.assertEqual(len(store.vocabularies["ScientificDegree"].values), 1)
+
+
+    def test_missing_values_read_back_as_none(self):
+        scientists = [scientist(None, branch=None), scientist("", degree=None)]
+        store = ScientistStore(scientists)
+        self.assertEqual(list(store), scientists)
+        self.assertIsNone(store[0]["Name"])
+        self.assertEqual(store[1]["Name"], "")
+        copy = pickle.loads(pickle.dumps(store, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(list(copy), scientists)
+
+
+    def test_extend_store_translates_codes(self):
+        first = ScientistStore([scientist("A", "Physics"), scientist("B", "Chemistry")])
+        second = ScientistStore([scientist("C", "Biology"), scientist("D", "Physics")])
+        first.extend_store(second)
+        self.assertEqual([view["Name"] for view in first], ["A", "B", "C", "D"])
+        self.assertEqual(list(first.column("Department")), ["Physics", "Chemistry", "Biology", "Physics"])
+        self.assertEqual(first.vocabularies["Department"].values, ["Physics", "Chemistry", "Biology"])
+
+
+    def test_store_survives_pickling(self):
+        store = ScientistStore(scientist(f"Scientist {number}", dates=str(number % 3)) for number in range(100))
+        copy = pickle.loads(pickle.dumps(store, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(list(copy), list(store))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+
+def default_cache_directory():
+    """
+    The per-user cache directory (XDG_CACHE_HOME or ~/.cache, LOCALAPPDATA on Windows).
+    Entries are unpickled, so the cache must never live in a directory others can write to.
+    """
+    base = os.environ.get("LOCALAPPDATA") if os.name == "nt" else os.environ.get("XDG_CACHE_HOME")
+    return os.path.join(base or os.path.join(os.path.expanduser("~"), ".cache"), "laboratory-work-2")
+
+
+# Where parsed files are cached between sessions, and the default size of the cache
+CACHE_DIRECTORY = default_cache_directory()
+CACHE_SIZE = 512 * 1024 * 1024
+
+CACHE_EXTENSION = ".cache"
+CACHE_MAGIC = b"SCIENTISTS-CACHE-2\n"
+HASH_BLOCK = 1024 * 1024
+
+
+class ParseCache:
+    """
+    A persistent cache of parsed and indexed XML files. An entry is keyed by the path of
+    its file and stores the size and modification time it was parsed at (and the SHA-256
+    of the content if `verify_content` is set); an entry that no longer matches its file
+    is dropped on lookup. Entries are pickled, so loading one takes a fraction of parsing
+    the file. When the cache grows over `max_bytes` the least recently used are removed.
+    """
+
+
+    def __init__(self, directory=CACHE_DIRECTORY, max_bytes=CACHE_SIZE, verify_content=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.verify_content = verify_content
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        self.check_directory()
+
+
+    def check_directory(self):
+        """
+        Refuse a cache directory that is a symlink, is owned by another user or is writable
+        by the group or others: whoever can write an entry can run code when it is loaded.
+        """
+        stat = os.lstat(self.directory)
+        if os.path.islink(self.directory) or not os.path.isdir(self.directory):
+            raise PermissionError(f"The cache directory '{self.directory}' is not a plain directory.")
+        if hasattr(os, "getuid") and stat.st_uid != os.getuid():
+            raise PermissionError(f"The cache directory '{self.directory}' belongs to another user.")
+        if os.name != "nt" and stat.st_mode & 0o022:
+            raise PermissionError(f"The cache directory '{self.directory}' is writable by other users.")
+
+
+    def signature(self, file_path, content=None):
+        """
+        What identifies the current content of a file: its absolute path, size, modification
+        time and, if `content` (by default verify_content), a hash. Take it before parsing,
+        so that a file changed while it is parsed is not cached under its new signature.
+        """
+        stat = os.stat(file_path)
+        signature = {"path": os.path.abspath(file_path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+        if self.verify_content if content is None else content:
+            signature["sha256"] = self.content_hash(file_path)
+        return signature
+
+
+    def is_current(self, signature, file_path):
+        """
+        Check a cached signature against the file; the content is only hashed when the
+        size and the modification time still match.
+        """
+        current = self.signature(file_path, content=False)
+        if any(signature.get(key) != value for key, value in current.items()):
+            return False
+        return not self.verify_content or signature.get("sha256") == self.content_hash(file_path)
+
+
+    @staticmethod
+    def content_hash(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+    def entry_path(self, file_path):
+        name = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name + CACHE_EXTENSION)
+
+
+    def get(self, file_path):
+        """
+        Return the cached data of a file, or None if it is not cached or changed since.
+        """
+        entry = self.entry_path(file_path)
+        data = None
+        try:
+            with open(entry, 'rb') as f:
+                if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    raise pickle.UnpicklingError("not a cache entry")
+                if self.is_current(pickle.load(f), file_path):
+                    data = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # An unreadable entry (written by an older version, truncated or tampered with,
+            # which makes unpickling raise almost anything) is dropped and parsed again
+            pass
+        if data is None:
+            # Removed once closed, which Windows requires
+            self.remove(file_path)
+            return None
+        # Mark the entry as recently used
+        os.utime(entry)
+        return data
+
+
+    def put(self, file_path, data, signature):
+        """
+        Cache the data parsed from a file with the signature taken before parsing it,
+        then evict the least recently used entries over the size limit.
+        """
+        entry = self.entry_path(file_path)
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(CACHE_MAGIC)
+                pickle.dump(signature, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, entry)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict(keep=entry)
+
+
+    def remove(self, file_path):
+        try:
+            os.remove(self.entry_path(file_path))
+        except FileNotFoundError:
+            pass
+
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used entries until the cache fits in max_bytes;
+        `keep` is never removed, even if it alone is larger.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(CACHE_EXTENSION):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+    def size(self):
+        """
+        The total size of the cached entries in bytes.
+        """
+        return sum(os.path.getsize(os.path.join(self.directory, name))
+                   for name in os.listdir(self.directory) if name.endswith(CACHE_EXTENSION))